@@ -0,0 +1,52 @@
+"""Benchmark for the rule-based detail extraction fast path.
+
+Runs the local extractor over a corpus of listing descriptions and reports
+how many would skip the LLM at the configured confidence threshold, plus
+the per-description cost of the rules.
+
+    python -m backend.benchmarks.extract_fast_path [--corpus PATH] [--threshold X] [--verbose]
+"""
+import argparse
+import time
+from pathlib import Path
+
+from backend.services.detail_extractor import extract_details_locally
+from backend.utils.settings import EXTRACT_MIN_CONFIDENCE
+
+DEFAULT_CORPUS = Path(__file__).parent / "data" / "descriptions.txt"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rule-based extraction fast path")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--threshold", type=float, default=EXTRACT_MIN_CONFIDENCE)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--verbose", action="store_true", help="print each description and its result")
+    args = parser.parse_args()
+
+    descriptions = [line.strip() for line in args.corpus.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+    fast = 0
+    for description in descriptions:
+        result = extract_details_locally(description)
+        answered = result.confidence >= args.threshold
+        fast += answered
+        if args.verbose:
+            path = "rules" if answered else "llm"
+            print(f"[{path:5}] {result.confidence:.3f}  {description}\n        {result.details}")
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        for description in descriptions:
+            extract_details_locally(description)
+    per_call_us = (time.perf_counter() - started) / (args.repeat * len(descriptions)) * 1e6
+
+    print(f"Descriptions:  {len(descriptions)}")
+    print(f"Threshold:     {args.threshold:.2f}")
+    print(f"Rules path:    {fast} ({fast / len(descriptions):.0%})")
+    print(f"LLM path:      {len(descriptions) - fast}")
+    print(f"Rules cost:    {per_call_us:8.1f} µs/description")
+
+
+if __name__ == "__main__":
+    main()
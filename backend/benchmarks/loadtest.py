@@ -0,0 +1,185 @@
+"""Fixed-rate load test for the Car Match API.
+
+Drives the app open-loop at a fixed request rate, spread round-robin over
+the selected endpoints, and reports p50/p95/p99 latency, throughput and
+errors per endpoint together with event-loop lag.
+
+By default the app is driven in-process (``backend.main:app`` over an ASGI
+transport) with ``LLM_PROVIDER=fake``, so the numbers measure the app's own
+overhead and capacity; the fake model's latency is tuned with the
+``FAKE_LLM_*`` variables. Event-loop lag is then the server's own loop.
+Pass ``--url`` to drive a running server instead (lag is measured on the
+client loop in that case).
+
+    LLM_PROVIDER=fake FAKE_LLM_LATENCY_MS=300 \\
+        python -m backend.benchmarks.loadtest --rps 50 --duration 30
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import defaultdict
+
+import httpx
+
+ENDPOINTS = ("price", "compare", "extract")
+
+SAMPLE_CARS = [
+    {"make": "Honda", "model": "Civic", "year": "2019", "mileage": "42000", "mileage_unit": "miles",
+     "transmission": "CVT", "location": "Toronto, Canada", "raw_description": "2019 Honda Civic EX, one owner"},
+    {"make": "Toyota", "model": "Camry", "year": "2020", "mileage": "31000", "mileage_unit": "miles",
+     "transmission": "Automatic", "location": "Dallas, USA", "raw_description": "2020 Toyota Camry SE, clean title"},
+    {"make": "Volkswagen", "model": "Golf", "year": "2017", "mileage": "88000", "mileage_unit": "km",
+     "transmission": "Manual", "location": "Berlin, Germany", "raw_description": "2017 VW Golf GTI, full service history"},
+    {"make": "Maruti Suzuki", "model": "Swift", "year": "2021", "mileage": "25000", "mileage_unit": "km",
+     "transmission": "Manual", "location": "Pune, India", "raw_description": "2021 Swift VXi, first owner"},
+]
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def build_request(endpoint: str, sequence: int, unique: bool) -> dict:
+    """Return httpx request kwargs for one call to an endpoint"""
+    car = dict(SAMPLE_CARS[sequence % len(SAMPLE_CARS)])
+    other = dict(SAMPLE_CARS[(sequence + 1) % len(SAMPLE_CARS)])
+    if unique:
+        # Vary the description so caches and request coalescing do not kick in
+        car["raw_description"] += f" (listing {sequence})"
+        other["raw_description"] += f" (listing {sequence})"
+
+    if endpoint == "price":
+        return {"method": "POST", "url": "/api/price/estimate", "json": {"car_details": car}}
+    if endpoint == "compare":
+        return {"method": "POST", "url": "/api/compare/", "json": {"car1": car, "car2": other}}
+    return {
+        "method": "POST",
+        "url": "/api/compare/extract-details",
+        "params": {"description": f"{car['year']} {car['make']} {car['model']} {car['mileage']} {car['mileage_unit']} {car['location']}"
+                                  + (f" #{sequence}" if unique else "")}
+    }
+
+
+async def monitor_loop_lag(samples: list, stop: asyncio.Event, interval: float = 0.01) -> None:
+    """Record how late the event loop wakes up from a fixed short sleep"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - started - interval))
+
+
+async def run_load(client: httpx.AsyncClient, endpoints: list, rps: float, duration: float, unique: bool) -> dict:
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    lag_samples = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(monitor_loop_lag(lag_samples, stop))
+
+    async def fire(endpoint: str, sequence: int) -> None:
+        started = time.perf_counter()
+        try:
+            response = await client.request(**build_request(endpoint, sequence, unique))
+            if response.status_code >= 400:
+                errors[endpoint] += 1
+                return
+        except Exception:
+            errors[endpoint] += 1
+            return
+        latencies[endpoint].append(time.perf_counter() - started)
+
+    total = int(rps * duration)
+    schedule = itertools.cycle(endpoints)
+    tasks = []
+    start = time.perf_counter()
+
+    # Open loop: requests go out on schedule whether or not earlier ones finished
+    for sequence in range(total):
+        delay = start + sequence / rps - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(fire(next(schedule), sequence)))
+
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await lag_task
+
+    report = {"target_rps": rps, "requests": total, "elapsed_s": round(elapsed, 3), "endpoints": {}}
+    for endpoint in endpoints:
+        values = latencies[endpoint]
+        report["endpoints"][endpoint] = {
+            "completed": len(values),
+            "errors": errors[endpoint],
+            "throughput_rps": round(len(values) / elapsed, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 1),
+            "p95_ms": round(percentile(values, 95) * 1000, 1),
+            "p99_ms": round(percentile(values, 99) * 1000, 1),
+            "max_ms": round(max(values, default=0.0) * 1000, 1)
+        }
+    report["event_loop_lag"] = {
+        "p50_ms": round(percentile(lag_samples, 50) * 1000, 2),
+        "p99_ms": round(percentile(lag_samples, 99) * 1000, 2),
+        "max_ms": round(max(lag_samples, default=0.0) * 1000, 2)
+    }
+    return report
+
+
+def print_report(report: dict) -> None:
+    print(f"Target {report['target_rps']} rps, {report['requests']} requests in {report['elapsed_s']}s")
+    print(f"{'endpoint':<10}{'ok':>8}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for endpoint, stats in report["endpoints"].items():
+        print(f"{endpoint:<10}{stats['completed']:>8}{stats['errors']:>8}{stats['throughput_rps']:>9}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['max_ms']:>10}")
+    lag = report["event_loop_lag"]
+    print(f"Event loop lag: p50 {lag['p50_ms']} ms, p99 {lag['p99_ms']} ms, max {lag['max_ms']} ms")
+
+
+async def main_async(args) -> dict:
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(",") if endpoint.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        raise SystemExit(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    timeout = httpx.Timeout(args.timeout)
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=timeout)
+    else:
+        # Import late so LLM_PROVIDER is set before the services are built
+        from backend.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=timeout)
+
+    async with client:
+        return await run_load(client, endpoints, args.rps, args.duration, not args.repeat_payloads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fixed-rate load test for the Car Match API")
+    parser.add_argument("--rps", type=float, default=20.0, help="Total request rate across endpoints")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to generate load for")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Comma-separated: price,compare,extract")
+    parser.add_argument("--url", help="Base URL of a running server (default: drive backend.main:app in-process)")
+    parser.add_argument("--repeat-payloads", action="store_true", help="Reuse identical payloads so caches can hit")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request client timeout in seconds")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    if not args.url:
+        os.environ.setdefault("LLM_PROVIDER", "fake")
+
+    report = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
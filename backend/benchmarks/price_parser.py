@@ -0,0 +1,243 @@
+"""Micro-benchmark for price response parsing.
+
+Compares the single-pass parser in ``backend.services.price_parser`` with the
+original multi-pass regex extraction over a corpus of recorded LLM responses,
+checks that both produce identical fields and reports the speedup.
+
+    python -m backend.benchmarks.price_parser [--corpus PATH] [--repeat N]
+"""
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+
+from backend.services.price_parser import parse_price_response
+
+DEFAULT_CORPUS = Path(__file__).parent / "data" / "price_responses.jsonl"
+
+
+def legacy_extract_price_range(text: str) -> dict:
+    """Original _extract_price_range, minus the debug prints"""
+    try:
+        min_patterns = [
+            r'Minimum Value:\s*(C\$[\d,]+)',
+            r'Minimum Value:\s*(A\$[\d,]+)',
+            r'Minimum Value:\s*([₹$€£¥][\d,]+)'
+        ]
+        max_patterns = [
+            r'Maximum Value:\s*(C\$[\d,]+)',
+            r'Maximum Value:\s*(A\$[\d,]+)',
+            r'Maximum Value:\s*([₹$€£¥][\d,]+)'
+        ]
+
+        min_price_str = None
+        max_price_str = None
+
+        for pattern in min_patterns:
+            min_match = re.search(pattern, text, re.IGNORECASE)
+            if min_match:
+                min_price_str = min_match.group(1).strip()
+                break
+
+        for pattern in max_patterns:
+            max_match = re.search(pattern, text, re.IGNORECASE)
+            if max_match:
+                max_price_str = max_match.group(1).strip()
+                break
+
+        if min_price_str and max_price_str:
+            min_numeric = float(re.sub(r'[₹$€£¥CA,\s]', '', min_price_str))
+            max_numeric = float(re.sub(r'[₹$€£¥CA,\s]', '', max_price_str))
+
+            if min_price_str.startswith('C$'):
+                currency = 'C$'
+            elif min_price_str.startswith('A$'):
+                currency = 'A$'
+            elif min_price_str.startswith('₹'):
+                currency = '₹'
+            elif min_price_str.startswith('€'):
+                currency = '€'
+            elif min_price_str.startswith('£'):
+                currency = '£'
+            elif min_price_str.startswith('¥'):
+                currency = '¥'
+            else:
+                currency = '$'
+
+            return {
+                "min": min_numeric,
+                "max": max_numeric,
+                "min_display": min_price_str,
+                "max_display": max_price_str,
+                "currency_detected": currency
+            }
+
+        currency_patterns = [
+            (r'C\$[\d,]+', 'C$'),
+            (r'A\$[\d,]+', 'A$'),
+            (r'₹[\d,]+', '₹'),
+            (r'€[\d,]+', '€'),
+            (r'£[\d,]+', '£'),
+            (r'¥[\d,]+', '¥'),
+            (r'\$[\d,]+', '$'),
+        ]
+
+        all_prices = []
+        detected_currency = '$'
+
+        for pattern, currency in currency_patterns:
+            matches = re.findall(pattern, text)
+            if matches:
+                detected_currency = currency
+                for match in matches:
+                    if currency in ['C$', 'A$']:
+                        numeric_str = re.sub(r'[CA$,\s]', '', match)
+                    else:
+                        numeric_str = re.sub(r'[₹$€£¥,\s]', '', match)
+
+                    try:
+                        numeric_value = float(numeric_str)
+                        if numeric_value > 0:
+                            all_prices.append({"text": match, "value": numeric_value})
+                    except ValueError:
+                        continue
+
+                if all_prices:
+                    break
+
+        if len(all_prices) >= 2:
+            all_prices.sort(key=lambda x: x["value"])
+            return {
+                "min": all_prices[0]["value"],
+                "max": all_prices[-1]["value"],
+                "min_display": all_prices[0]["text"],
+                "max_display": all_prices[-1]["text"],
+                "currency_detected": detected_currency
+            }
+        elif len(all_prices) == 1:
+            price = all_prices[0]
+            return {
+                "min": price["value"],
+                "max": price["value"],
+                "min_display": price["text"],
+                "max_display": price["text"],
+                "currency_detected": detected_currency
+            }
+
+    except Exception:
+        pass
+
+    return {"min": 0, "max": 0, "min_display": "", "max_display": "", "currency_detected": "$"}
+
+
+def legacy_extract_estimated_price(text: str) -> str:
+    """Original _extract_estimated_price"""
+    likely_patterns = [
+        r'Most Likely Price:\s*(C\$[\d,]+)',
+        r'Most Likely Price:\s*(A\$[\d,]+)',
+        r'Most Likely Price:\s*([₹$€£¥][\d,]+)'
+    ]
+    for pattern in likely_patterns:
+        likely_match = re.search(pattern, text, re.IGNORECASE)
+        if likely_match:
+            return likely_match.group(1).strip()
+
+    price_patterns = [r'(C\$[\d,]+)', r'(A\$[\d,]+)', r'([₹€£¥][\d,]+)', r'(\$[\d,]+)']
+    for pattern in price_patterns:
+        match = re.search(pattern, text)
+        if match:
+            return match.group(1).strip()
+
+    return "Price estimate included in analysis"
+
+
+def legacy_extract_factors(text: str) -> dict:
+    """Original _extract_factors"""
+    factors = {}
+
+    factors_section_match = re.search(r'\*\*KEY PRICING FACTORS:\*\*(.*?)(?:\*\*|$)', text, re.DOTALL | re.IGNORECASE)
+    if factors_section_match:
+        factors_text = factors_section_match.group(1)
+        factor_lines = re.findall(r'-\s*([^:]+):\s*([^\n\r-]+)', factors_text)
+        for factor_name, factor_desc in factor_lines:
+            clean_name = factor_name.strip()
+            clean_desc = factor_desc.strip()
+            clean_name = clean_name.replace(' Impact', '').replace(' Assessment', '').replace(' Factors', '')
+            if clean_name and clean_desc and len(clean_desc) > 10:
+                factors[clean_name] = clean_desc
+
+    if not factors:
+        factor_keywords = [
+            ('mileage', r'mileage[^.]*\.'),
+            ('condition', r'condition[^.]*\.'),
+            ('market demand', r'market\s+demand[^.]*\.'),
+            ('location', r'location[^.]*\.'),
+            ('depreciation', r'depreciation[^.]*\.'),
+            ('features', r'features[^.]*\.')
+        ]
+        for keyword, pattern in factor_keywords:
+            match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+            if match:
+                description = match.group(0).strip()
+                if len(description) > 20:
+                    factors[keyword.title()] = description[:150]
+
+    return factors if factors else {"analysis": "Detailed factors included in market analysis"}
+
+
+def legacy_parse(text: str) -> tuple:
+    return legacy_extract_price_range(text), legacy_extract_estimated_price(text), legacy_extract_factors(text)
+
+
+def single_pass_parse(text: str) -> tuple:
+    result = parse_price_response(text)
+    return result.price_range, result.estimated_price, result.factors
+
+
+def load_corpus(path: Path) -> list:
+    with open(path, encoding="utf-8") as corpus:
+        return [json.loads(line)["response"] for line in corpus if line.strip()]
+
+
+def time_parser(parse, texts: list, repeat: int) -> float:
+    """Return the best per-response time in microseconds over `repeat` runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            parse(text)
+        best = min(best, time.perf_counter() - start)
+    return best / len(texts) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark price response parsing")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    texts = load_corpus(args.corpus)
+
+    mismatches = 0
+    for index, text in enumerate(texts):
+        expected, actual = legacy_parse(text), single_pass_parse(text)
+        if expected != actual:
+            mismatches += 1
+            print(f"Mismatch on response {index}:\n  legacy: {expected}\n  single: {actual}")
+
+    legacy_us = time_parser(legacy_parse, texts, args.repeat)
+    single_us = time_parser(single_pass_parse, texts, args.repeat)
+
+    print(f"Responses:    {len(texts)}")
+    print(f"Mismatches:   {mismatches}")
+    print(f"Legacy:       {legacy_us:8.1f} µs/response")
+    print(f"Single-pass:  {single_us:8.1f} µs/response")
+    print(f"Speedup:      {legacy_us / single_us:8.2f}x")
+
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
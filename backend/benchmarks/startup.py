@@ -0,0 +1,112 @@
+"""Cold-start benchmark for the Car Match API.
+
+Measures, in fresh interpreters, how long ``import backend.main`` takes and
+which heavy packages it pulls in, then starts uvicorn and reports the time
+from process launch to the first healthy ``/health`` response and to the
+first ready service health check (which waits for the services to exist).
+
+    python -m backend.benchmarks.startup [--runs N] [--preload lazy|startup|background]
+
+The server runs with ``LLM_PROVIDER=fake`` unless ``--real`` is given, so no
+API key is needed.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+HEAVY_PACKAGES = ("langchain", "langchain_core", "langchain_openai", "openai")
+
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import backend.main
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": [name for name in %r if name in sys.modules]}))
+""" % (HEAVY_PACKAGES,)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(client: httpx.Client, url: str, deadline: float) -> float:
+    """Poll url until it answers 200; return the monotonic time it did"""
+    while time.monotonic() < deadline:
+        try:
+            if client.get(url).status_code == 200:
+                return time.monotonic()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(f"{url} did not become healthy in time")
+
+
+def measure_import(env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure_server(env: dict, timeout: float) -> dict:
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    launched = time.monotonic()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env
+    )
+    try:
+        with httpx.Client(timeout=timeout) as client:
+            deadline = launched + timeout
+            healthy = wait_for(client, f"{base}/health", deadline)
+            ready = wait_for(client, f"{base}/api/price/health", deadline)
+            wait_for(client, f"{base}/api/compare/health", deadline)
+            services = time.monotonic()
+    finally:
+        server.terminate()
+        server.wait()
+    return {"healthy": healthy - launched, "first_service": ready - launched, "all_services": services - launched}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API cold start")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--preload", choices=["lazy", "startup", "background"], default=None,
+                        help="SERVICE_PRELOAD for the server (defaults to the configured value)")
+    parser.add_argument("--real", action="store_true", help="use the configured LLM provider instead of fake")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if not args.real:
+        env["LLM_PROVIDER"] = "fake"
+    if args.preload:
+        env["SERVICE_PRELOAD"] = args.preload
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+
+    imports = [measure_import(env) for _ in range(args.runs)]
+    servers = [measure_server(env, args.timeout) for _ in range(args.runs)]
+
+    def median_ms(values) -> float:
+        return statistics.median(values) * 1000
+
+    print(f"Runs:                      {args.runs}")
+    print(f"Import backend.main:       {median_ms([run['seconds'] for run in imports]):8.1f} ms (median)")
+    print(f"Heavy packages imported:   {', '.join(imports[0]['loaded']) or 'none'}")
+    print(f"Launch to /health:         {median_ms([run['healthy'] for run in servers]):8.1f} ms (median)")
+    print(f"Launch to first service:   {median_ms([run['first_service'] for run in servers]):8.1f} ms (median)")
+    print(f"Launch to all services:    {median_ms([run['all_services'] for run in servers]):8.1f} ms (median)")
+
+
+if __name__ == "__main__":
+    main()
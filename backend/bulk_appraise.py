@@ -0,0 +1,388 @@
+"""Offline bulk appraisal of a car inventory.
+
+Streams a CSV or JSONL file of CarDetails rows through PriceEstimationService
+with bounded concurrency and appends one JSON line per priced row to the
+output as soon as it completes:
+
+    {"row": 17, "id": "STK-1042", "result": {...PriceEstimateResponse...}}
+
+Progress is checkpointed next to the output (``<output>.checkpoint.json``), so
+rerunning the same command after a crash or Ctrl-C skips rows that were
+already priced. Rows that fail, including estimates without a usable price,
+are appended to ``<output>.errors.jsonl`` and retried on the next run. Throughput, ETA and token spend go to stderr.
+
+    python -m backend.bulk_appraise inventory.csv --output prices.jsonl --concurrency 16
+
+CSV columns and JSONL keys are the CarDetails fields; a row without
+``raw_description`` gets one built from make, model and year. An ``id``
+column (see ``--id-field``) is copied to the output.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from typing import Iterator, Optional, Set, Tuple, Union
+
+from pydantic import ValidationError
+
+from backend.models.schemas import CarDetails, PriceEstimateResponse
+from backend.utils.log import setup_logging, shutdown_logging
+
+# Provider rate limits surface as Overloaded; rows wait and retry this many times
+MAX_OVERLOAD_RETRIES = 5
+
+# Estimates without a usable price are asked for again this many times
+MAX_UNUSABLE_RETRIES = 2
+
+
+class UnusableEstimate(Exception):
+    """The service answered, but without a price worth writing to the output"""
+
+
+def unusable_reason(result: PriceEstimateResponse) -> Optional[str]:
+    """Why an estimate cannot go to the output, or None when it is usable"""
+    if "error" in result.factors:
+        return f"estimate reported an error: {result.factors['error']}"
+    try:
+        max_price = float(result.price_range.get("max") or 0)
+    except (TypeError, ValueError):
+        max_price = 0
+    if max_price <= 0:
+        return "estimate has no price range"
+    return None
+
+
+def count_rows(path: str, csv_input: bool) -> int:
+    """Fast line count for the ETA (approximate for CSV with quoted newlines)"""
+    lines = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            lines += chunk.count(b"\n")
+    return max(0, lines - 1) if csv_input else lines
+
+
+def read_rows(path: str, csv_input: bool) -> Iterator[Tuple[int, Union[dict, Exception, None]]]:
+    """Yield (row number, fields) lazily.
+
+    Blank JSONL lines yield None and malformed ones the decoding error, so
+    row numbers always match line numbers.
+    """
+    with open(path, newline="" if csv_input else None, encoding="utf-8") as f:
+        if csv_input:
+            for number, row in enumerate(csv.DictReader(f)):
+                yield number, {key: value for key, value in row.items() if key and value not in (None, "")}
+        else:
+            for number, line in enumerate(f):
+                if not line.strip():
+                    yield number, None
+                    continue
+                try:
+                    yield number, json.loads(line)
+                except ValueError as e:
+                    yield number, e
+
+
+def to_car(fields: dict) -> CarDetails:
+    if not fields.get("raw_description"):
+        fields = dict(fields, raw_description=" ".join(
+            str(fields[key]) for key in ("year", "make", "model") if fields.get(key)
+        ))
+    return CarDetails(**{key: str(value) for key, value in fields.items() if key in CarDetails.model_fields})
+
+
+class Checkpoint:
+    """Which rows are done, stored as a watermark plus the completed rows above it.
+
+    Rows finish out of order, so everything below ``watermark`` is settled
+    (priced, or failed and listed in ``retry``) and ``done`` holds the rows
+    above it. ``output_bytes`` is the output size when the checkpoint was
+    written; lines appended after it are recovered by rescanning that tail.
+    """
+
+    def __init__(self, path: str, input_path: str):
+        self.path = path
+        self.input_path = os.path.abspath(input_path)
+        self.input_size = os.path.getsize(input_path)
+        self.watermark = 0
+        self.done: Set[int] = set()
+        self.failed: Set[int] = set()
+        self.retry: Set[int] = set()
+        self.output_bytes = 0
+        self.stats = {"priced": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state["input_size"] != self.input_size:
+            raise SystemExit(
+                f"{self.path} was written for a different version of the input; use --restart to start over"
+            )
+        self.watermark = state["watermark"]
+        self.done = set(state["done"])
+        self.retry = set(state["retry"])
+        self.output_bytes = state["output_bytes"]
+        self.stats.update(state["stats"])
+        return True
+
+    def is_done(self, row: int) -> bool:
+        if row < self.watermark:
+            return row not in self.retry
+        return row in self.done
+
+    def mark(self, row: int, ok: bool) -> None:
+        if row < self.watermark:
+            # A retried row: settled either way, retried again only if it failed again
+            if ok:
+                self.retry.discard(row)
+            return
+        (self.done if ok else self.failed).add(row)
+        self._advance()
+
+    def _advance(self) -> None:
+        while self.watermark in self.done or self.watermark in self.failed:
+            if self.watermark in self.failed:
+                self.failed.discard(self.watermark)
+                self.retry.add(self.watermark)
+            self.done.discard(self.watermark)
+            self.watermark += 1
+
+    def save(self, output_bytes: int) -> None:
+        self.output_bytes = output_bytes
+        state = {
+            "input": self.input_path,
+            "input_size": self.input_size,
+            "watermark": self.watermark,
+            "done": sorted(self.done),
+            # Rows that failed this run stay retryable even above the watermark
+            "retry": sorted(self.retry | self.failed),
+            "output_bytes": output_bytes,
+            "stats": self.stats
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+
+def recover_output_tail(output_path: str, checkpoint: Checkpoint) -> None:
+    """Credit rows written after the last checkpoint and drop a torn last line"""
+    if not os.path.exists(output_path):
+        checkpoint.output_bytes = 0
+        return
+    with open(output_path, "r+b") as f:
+        f.seek(checkpoint.output_bytes)
+        offset = checkpoint.output_bytes
+        for line in iter(f.readline, b""):
+            if not line.endswith(b"\n"):
+                f.truncate(offset)
+                break
+            offset += len(line)
+            checkpoint.mark(json.loads(line)["row"], ok=True)
+            checkpoint.stats["priced"] += 1
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+class Progress:
+    """Periodic throughput / ETA / token spend line on stderr"""
+
+    def __init__(self, total: int, already_done: int, interval: float):
+        self.total = total
+        self.already_done = already_done
+        self.interval = interval
+        self.started = time.monotonic()
+        self.last_report = 0.0
+        self.completed = 0
+        self.failed = 0
+
+    def report(self, stats: dict, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+
+        elapsed = max(now - self.started, 1e-9)
+        rate = self.completed / elapsed
+        remaining = max(0, self.total - self.already_done - self.completed - self.failed)
+        eta = format_duration(remaining / rate) if rate else "?"
+        tokens = stats["prompt_tokens"] + stats["completion_tokens"]
+        print(
+            f"{self.already_done + self.completed:,}/{self.total:,} rows | {rate:.1f} rows/s | ETA {eta} | "
+            f"{tokens:,} tokens | ${stats['cost_usd']:.2f} | {self.failed} failed",
+            file=sys.stderr, flush=True
+        )
+
+
+async def estimate_with_retries(service, car: CarDetails):
+    """Price one car; wait out provider overload and re-ask for unusable estimates.
+
+    Returns the response, or the exception that failed the row; an estimate
+    without a usable price is returned as UnusableEstimate.
+    """
+    from backend.services.admission import Overloaded
+
+    overloads = unusable = 0
+    while True:
+        result = (await service.estimate_prices([car]))[0]
+        if isinstance(result, Overloaded):
+            if overloads == MAX_OVERLOAD_RETRIES:
+                return result
+            overloads += 1
+            await asyncio.sleep(result.retry_after)
+        elif isinstance(result, BaseException):
+            return result
+        else:
+            reason = unusable_reason(result)
+            if reason is None:
+                return result
+            if unusable == MAX_UNUSABLE_RETRIES:
+                return UnusableEstimate(reason)
+            unusable += 1
+
+
+async def run(args) -> int:
+    from backend.services.http_pool import close_http_client
+    from backend.services.persistent_cache import close_store
+    from backend.services.providers import get_price_service
+    from backend.utils.metrics import usage_totals
+
+    csv_input = args.format == "csv" if args.format else args.input.lower().endswith(".csv")
+    checkpoint_path = f"{args.output}.checkpoint.json"
+    errors_path = f"{args.output}.errors.jsonl"
+
+    checkpoint = Checkpoint(checkpoint_path, args.input)
+    if args.restart:
+        for path in (args.output, checkpoint_path, errors_path):
+            if os.path.exists(path):
+                os.remove(path)
+    elif checkpoint.load() or os.path.exists(args.output):
+        recover_output_tail(args.output, checkpoint)
+        print(f"Resuming: {checkpoint.stats['priced']:,} rows already priced", file=sys.stderr)
+
+    service = get_price_service()
+    progress = Progress(count_rows(args.input, csv_input), checkpoint.stats["priced"], args.progress_every)
+    usage_before = usage_totals("price")
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * 2)
+    output = open(args.output, "ab")
+    errors = open(errors_path, "a", encoding="utf-8")
+    last_checkpoint = time.monotonic()
+    since_checkpoint = 0
+
+    def spend() -> dict:
+        """Fold this run's new token usage into the checkpoint's running totals"""
+        usage = usage_totals("price")
+        for key in ("prompt_tokens", "completion_tokens", "cost_usd"):
+            checkpoint.stats[key] += usage[key] - usage_before[key]
+            usage_before[key] = usage[key]
+        return checkpoint.stats
+
+    def save_checkpoint() -> None:
+        nonlocal last_checkpoint, since_checkpoint
+        spend()
+        output.flush()
+        checkpoint.save(output.tell())
+        last_checkpoint, since_checkpoint = time.monotonic(), 0
+
+    def write_result(row: int, fields: dict, result: Union[PriceEstimateResponse, BaseException]) -> None:
+        nonlocal since_checkpoint
+        record = {"row": row}
+        if fields.get(args.id_field) is not None:
+            record["id"] = fields[args.id_field]
+
+        if isinstance(result, BaseException):
+            record["error"] = f"{type(result).__name__}: {result}"
+            errors.write(json.dumps(record, ensure_ascii=False) + "\n")
+            errors.flush()
+            checkpoint.mark(row, ok=False)
+            progress.failed += 1
+        else:
+            record["result"] = result.model_dump()
+            output.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+            checkpoint.mark(row, ok=True)
+            checkpoint.stats["priced"] += 1
+            progress.completed += 1
+
+        since_checkpoint += 1
+        if since_checkpoint >= args.checkpoint_every or time.monotonic() - last_checkpoint >= 10:
+            save_checkpoint()
+        progress.report(spend())
+
+    async def worker() -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            row, fields = item
+            try:
+                result = await estimate_with_retries(service, to_car(fields))
+            except ValidationError as e:
+                result = e
+            write_result(row, fields, result)
+
+    workers = [asyncio.create_task(worker()) for _ in range(args.concurrency)]
+    try:
+        for row, fields in read_rows(args.input, csv_input):
+            if checkpoint.is_done(row):
+                continue
+            if fields is None:
+                checkpoint.mark(row, ok=True)
+            elif isinstance(fields, Exception):
+                write_result(row, {}, fields)
+            else:
+                await queue.put((row, fields))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+        save_checkpoint()
+        output.close()
+        errors.close()
+        progress.report(checkpoint.stats, force=True)
+        await close_http_client()
+        await asyncio.to_thread(close_store)
+
+    print(
+        f"Done: {checkpoint.stats['priced']:,} rows priced, {progress.failed} failed this run "
+        f"(see {errors_path}), ${checkpoint.stats['cost_usd']:.2f} spent in total",
+        file=sys.stderr
+    )
+    return 1 if progress.failed else 0
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Price a CSV/JSONL car inventory offline")
+    parser.add_argument("input", help="CSV or JSONL file of CarDetails rows")
+    parser.add_argument("--output", required=True, help="JSONL file results are appended to")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="input format (default: from the file extension)")
+    parser.add_argument("--concurrency", type=int, default=8, help="estimates in flight at once")
+    parser.add_argument("--id-field", default="id", help="input field copied to each output line")
+    parser.add_argument("--checkpoint-every", type=int, default=100, help="rows between checkpoints")
+    parser.add_argument("--progress-every", type=float, default=5.0, help="seconds between progress lines")
+    parser.add_argument("--restart", action="store_true", help="discard previous output and checkpoint")
+    args = parser.parse_args(argv)
+
+    # Service logs share stderr with the progress lines; stdout stays free
+    setup_logging(sys.stderr)
+    try:
+        return asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("Interrupted; rerun the same command to resume", file=sys.stderr)
+        return 130
+    finally:
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
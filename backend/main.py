@@ -1,19 +1,93 @@
+import asyncio
+import logging
 import os
-from fastapi import FastAPI
+import sys
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
 from backend.routes import compare, price
+from backend.services.admission import Overloaded, admission_stats
+from backend.services.persistent_cache import close_store
+from backend.services.providers import preload_services
+from backend.utils.compression import CompressionMiddleware
+from backend.utils.log import begin_request, log_stats, setup_logging, shutdown_logging
+from backend.utils.metrics import STAGE_SECONDS, prompt_cache_stats, render_metrics
+from backend.utils.profiling import ProfilingMiddleware, profiling_stats
+from backend.utils.responses import DefaultJSONResponse
+from backend.utils.settings import SERVICE_PRELOAD
 
-  # Updated import paths
+logger = logging.getLogger("backend.main")
 
-load_dotenv()
+async def _preload_in_background():
+    try:
+        await asyncio.to_thread(preload_services)
+    except Exception as e:
+        # The first request retries the construction and reports the error
+        logger.warning("Service preload failed: %s", e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the services according to SERVICE_PRELOAD"""
+    setup_logging()
+    preload = None
+    if SERVICE_PRELOAD == "startup":
+        preload_services()
+    elif SERVICE_PRELOAD == "background":
+        # Serve /health immediately; the first API call waits only if it beats the preload
+        preload = asyncio.create_task(_preload_in_background())
+    yield
+    if preload is not None and not preload.done():
+        await preload
+    http_pool = sys.modules.get("backend.services.http_pool")
+    if http_pool is not None:
+        await http_pool.close_http_client()
+    await asyncio.to_thread(close_store)
+    shutdown_logging()
 
 app = FastAPI(
     title="Car Match API",
     description="Backend API for car comparison and price estimation",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=DefaultJSONResponse
 )
 
+class RequestContextMiddleware:
+    """Give every request an ID for its log records and record its logging overhead.
+
+    Uses the client's X-Request-ID when present and echoes it in the response.
+    Time spent enqueueing log records is observed as the "log" stage metric;
+    Server-Timing reports it up to the start of the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")[:64]
+        context = begin_request(incoming or None)
+        request_id = context["request_id"].encode("latin-1")
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            if context["endpoint"] is not None:
+                STAGE_SECONDS.labels(context["endpoint"], "log").observe(context["log_seconds"])
+
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestContextMiddleware)
+app.add_middleware(CompressionMiddleware)
+
 # Updated CORS for production
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +102,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    """Shed requests fast with a hint on when to retry"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
 app.include_router(compare.router)
 app.include_router(price.router)
 
@@ -35,16 +118,49 @@ app.include_router(price.router)
 async def root():
     return {"message": "Car Match API is running!"}
 
+def pool_stats() -> dict:
+    # The pool module imports httpx; it is loaded with the first chat model
+    http_pool = sys.modules.get("backend.services.http_pool")
+    return http_pool.pool_stats() if http_pool else {"enabled": False}
+
+def llm_latency_stats() -> dict:
+    # Only report once the LLM client is loaded; importing it here would pull in langchain
+    llm_client = sys.modules.get("backend.services.llm_client")
+    return llm_client.latency_stats() if llm_client else {}
+
+def router_stats() -> dict:
+    model_router = sys.modules.get("backend.services.model_router")
+    return model_router.get_router().stats() if model_router else {}
+
+def near_duplicate_stats() -> dict:
+    near_duplicates = sys.modules.get("backend.services.near_duplicates")
+    return near_duplicates.get_near_duplicate_index().stats() if near_duplicates else {}
+
 @app.get("/health")
 async def health_check():
     return {
         "status": "healthy", 
         "service": "car-match-backend", 
-        "features": ["car-comparison", "price-estimation"]
+        "features": ["car-comparison", "price-estimation"],
+        "llm_pool": pool_stats(),
+        "admission": admission_stats(),
+        "llm_latency": llm_latency_stats(),
+        "model_router": router_stats(),
+        "prompt_cache": prompt_cache_stats(),
+        "near_duplicates": near_duplicate_stats(),
+        "logging": log_stats(),
+        "profiling": profiling_stats()
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics for request stages, LLM usage, caching and coalescing"""
+    pool_stats()  # refresh the connection pool gauges
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 if __name__ == "__main__":
-    import uvicorn, os
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", 8000)))
 
 
@@ -1,5 +1,8 @@
-from pydantic import BaseModel
-from typing import Optional, Dict, Any, Union
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, Literal, Union, List
+from backend.utils.prompts import COMPARISON_CATEGORIES
+
+CategoryKey = Literal[tuple(key for key, _ in COMPARISON_CATEGORIES)]
 
 class CarDetails(BaseModel):
     make: Optional[str] = None
@@ -19,6 +22,8 @@ class CarDetails(BaseModel):
 class CompareRequest(BaseModel):
     car1: CarDetails
     car2: CarDetails
+    # Only these categories, without the final recommendation; all of them when omitted
+    categories: Optional[List[CategoryKey]] = Field(default=None, min_length=1)
 
 class CompareResponse(BaseModel):
     comparison: str
@@ -34,3 +39,18 @@ class PriceEstimateResponse(BaseModel):
     price_range: Dict[str, Union[float, str]]  # Allow both numeric and string values
     factors: Dict[str, str]
     market_analysis: str
+
+class BatchPriceEstimateRequest(BaseModel):
+    items: List[CarDetails]
+    max_concurrency: Optional[int] = None
+
+class BatchPriceEstimateItem(BaseModel):
+    index: int
+    result: Optional[PriceEstimateResponse] = None
+    error: Optional[str] = None
+
+class BatchPriceEstimateResponse(BaseModel):
+    results: List[BatchPriceEstimateItem]
+    total: int
+    unique: int
+    failed: int
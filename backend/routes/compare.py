@@ -1,26 +1,101 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from backend.models.schemas import CompareRequest, CompareResponse
 
-from backend.services.car_comparison import CarComparisonService
+from backend.services.admission import Overloaded, admit, get_controller
+from backend.services.providers import get_comparison_service, loaded_service
+from backend.utils.log import set_endpoint
+from backend.utils.metrics import stage_timer
+from backend.utils.responses import dumps, json_response, select_fields
+from backend.utils.settings import COMPARISON_MODE
 
 router = APIRouter(prefix="/api/compare", tags=["Car Comparison"])
 
-comparison_service = CarComparisonService()
-
 @router.post("/", response_model=CompareResponse)
-async def compare_cars(request: CompareRequest):
-    """Compare two cars and return detailed analysis"""
+async def compare_cars(request: CompareRequest, fields: Optional[str] = None, slim: bool = False,
+                       comparison_service=Depends(get_comparison_service)):
+    """Compare two cars and return detailed analysis.
+    
+    ``fields`` (comma-separated) or ``slim=true`` (summary and recommendation only) trim the response.
+    """
+    include = select_fields(CompareResponse, fields, slim)
     try:
-        result = comparison_service.compare_cars(request)
-        return result
+        with stage_timer("compare", "total"):
+            async with admit("compare"):
+                result = await comparison_service.compare_cars(request)
+            return json_response(result, "compare", include=include)
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Comparison failed: {str(e)}")
 
+@router.post("/stream")
+async def stream_comparison(request: CompareRequest, comparison_service=Depends(get_comparison_service)):
+    """Stream a car comparison as server-sent events"""
+    set_endpoint("compare_stream")
+    # Admit before the response starts, so a shed request still gets a 503
+    controller = get_controller("compare_stream")
+    admitted_at = await controller.acquire() if controller else None
+    released = False
+    
+    def release():
+        nonlocal released
+        if controller and not released:
+            released = True
+            controller.release(admitted_at)
+    
+    async def event_stream():
+        try:
+            async for event, data in comparison_service.stream_comparison(request):
+                yield f"event: {event}\ndata: {dumps(data)}\n\n"
+        finally:
+            release()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Releases the slot if the stream ends without the generator cleaning up
+        background=BackgroundTask(release)
+    )
+
 @router.post("/extract-details")
-async def extract_car_details(description: str):
+async def extract_car_details(description: str, comparison_service=Depends(get_comparison_service)):
     """Extract structured details from car description"""
     try:
-        details = comparison_service.extract_car_details(description)
-        return {"details": details}
+        with stage_timer("extract", "total"):
+            async with admit("extract"):
+                details, source = await comparison_service.extract_car_details(description)
+            return json_response({"details": details, "source": source}, "extract")
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Detail extraction failed: {str(e)}")
+
+@router.get("/health")
+async def compare_health_check():
+    """Health check for car comparison service; stats only once the service is loaded"""
+    comparison_service = loaded_service("comparison")
+    if comparison_service is None:
+        return {
+            "status": "healthy",
+            "service": "car-comparison",
+            "message": "Car comparison service is not loaded yet",
+            "mode": COMPARISON_MODE,
+            "loaded": False
+        }
+    return {
+        "status": "healthy",
+        "service": "car-comparison",
+        "message": "Car comparison service is running",
+        "mode": COMPARISON_MODE,
+        "loaded": True,
+        "comparison_cache": comparison_service.comparison_cache.stats(),
+        "profile_cache": comparison_service.profile_cache.stats(),
+        "extract_cache": comparison_service.extract_cache.stats(),
+        "coalescing": comparison_service.flights.stats(),
+        "profile_coalescing": comparison_service.profile_flights.stats(),
+        "extract_coalescing": comparison_service.extract_flights.stats()
+    }
@@ -1,25 +1,98 @@
-from fastapi import APIRouter, HTTPException
-from backend.models.schemas import PriceEstimateRequest, PriceEstimateResponse
-from backend.services.price_estimation import PriceEstimationService
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from backend.models.schemas import (
+    BatchPriceEstimateItem,
+    BatchPriceEstimateRequest,
+    BatchPriceEstimateResponse,
+    PriceEstimateRequest,
+    PriceEstimateResponse
+)
+from backend.services.admission import Overloaded, admit
+from backend.services.providers import get_price_service, loaded_service
+from backend.utils.canonical import canonical_car_key
+from backend.utils.metrics import stage_timer
+from backend.utils.responses import json_response, select_fields
+from backend.utils.settings import BATCH_MAX_ITEMS
 
 router = APIRouter(prefix="/api/price", tags=["Price Estimation"])
 
-price_service = PriceEstimationService()
-
 @router.post("/estimate", response_model=PriceEstimateResponse)
-async def estimate_price(request: PriceEstimateRequest):
-    """Estimate car price based on provided details"""
+async def estimate_price(request: PriceEstimateRequest, fields: Optional[str] = None, slim: bool = False,
+                         price_service=Depends(get_price_service)):
+    """Estimate car price based on provided details.
+    
+    ``fields`` (comma-separated) or ``slim=true`` (no market_analysis text) trim the response.
+    """
+    include = select_fields(PriceEstimateResponse, fields, slim)
     try:
-        result = price_service.estimate_price(request)
-        return result
+        with stage_timer("price", "total"):
+            async with admit("price"):
+                result = await price_service.estimate_price(request)
+            return json_response(result, "price", include=include)
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Price estimation failed: {str(e)}")
 
+@router.post("/estimate/batch", response_model=BatchPriceEstimateResponse)
+async def estimate_prices(request: BatchPriceEstimateRequest, fields: Optional[str] = None, slim: bool = False,
+                          price_service=Depends(get_price_service)):
+    """Estimate prices for a list of cars in one request; ``fields``/``slim`` apply to each result"""
+    result_fields = select_fields(PriceEstimateResponse, fields, slim)
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(request.items)} items (limit {BATCH_MAX_ITEMS})"
+        )
+    
+    with stage_timer("price_batch", "total"):
+        try:
+            async with admit("price_batch"):
+                results = await price_service.estimate_prices(request.items, request.max_concurrency)
+        except Overloaded:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Batch price estimation failed: {str(e)}")
+        
+        # Every part is built here from validated results, so skip re-validation
+        items = []
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException):
+                items.append(BatchPriceEstimateItem.model_construct(
+                    index=index, result=None, error=f"Price estimation failed: {str(result)}"
+                ))
+            else:
+                items.append(BatchPriceEstimateItem.model_construct(index=index, result=result, error=None))
+        
+        include = None
+        if result_fields is not None:
+            item_fields = {"index": True, "error": True, "result": result_fields}
+            include = {"results": {"__all__": item_fields}, "total": True, "unique": True, "failed": True}
+        
+        return json_response(BatchPriceEstimateResponse.model_construct(
+            results=items,
+            total=len(items),
+            unique=len({canonical_car_key(car) for car in request.items}),
+            failed=sum(1 for item in items if item.error is not None)
+        ), "price_batch", include=include)
+
 @router.get("/health")
 async def price_health_check():
-    """Health check for price estimation service"""
+    """Health check for price estimation service; stats only once the service is loaded"""
+    price_service = loaded_service("price")
+    if price_service is None:
+        return {
+            "status": "healthy",
+            "service": "price-estimation",
+            "message": "Price estimation service is not loaded yet",
+            "loaded": False
+        }
     return {
         "status": "healthy", 
         "service": "price-estimation",
-        "message": "Price estimation service is running"
+        "message": "Price estimation service is running",
+        "loaded": True,
+        "cache": price_service.cache.stats(),
+        "coalescing": price_service.flights.stats(),
+        "local_model": price_service.local_model.stats() if price_service.local_model else None
     }
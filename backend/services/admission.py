@@ -0,0 +1,165 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+from backend.utils.metrics import ADMISSION_DECISIONS, stage_timer
+from backend.utils.settings import ADMISSION_ENABLED, ADMISSION_LIMITS
+
+
+class Overloaded(Exception):
+    """A request was shed; the route answers with ``status_code`` and ``Retry-After``"""
+
+    def __init__(self, status_code: int, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+
+
+class AdmissionController:
+    """Token bucket plus concurrency limit with a bounded FIFO wait queue.
+
+    The bucket refills at ``rate`` requests per second up to ``burst``
+    (``rate`` 0 disables it); a request over the rate is rejected with 429.
+    Admitted requests run ``max_concurrency`` at a time and up to
+    ``max_queue`` more wait for a slot, each for at most ``queue_timeout``
+    seconds; a full queue or an expired wait is rejected with 503.
+    """
+
+    def __init__(self, name: str, rate: float = 0.0, burst: int = 1, max_concurrency: int = 32,
+                 max_queue: int = 64, queue_timeout: float = 5.0):
+        self.name = name
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Smoothed time a request holds its slot, used to suggest Retry-After
+        self._service_seconds = 1.0
+        self.rejected = 0
+
+    def _take_token(self) -> float:
+        """Consume a token; return 0, or the seconds until one is available"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def _queue_wait_estimate(self) -> float:
+        return self._service_seconds * (len(self._waiters) + 1) / max(1, self.max_concurrency)
+
+    def _reject(self, status_code: int, retry_after: float, outcome: str, reason: str) -> Overloaded:
+        self.rejected += 1
+        ADMISSION_DECISIONS.labels(self.name, outcome).inc()
+        return Overloaded(status_code, retry_after, reason)
+
+    async def acquire(self) -> float:
+        """Wait for a slot or raise Overloaded; returns the admission time for release()"""
+        wait = self._take_token()
+        if wait:
+            raise self._reject(429, wait, "rejected_rate", f"Rate limit exceeded for {self.name}")
+
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            ADMISSION_DECISIONS.labels(self.name, "admitted").inc()
+            return time.monotonic()
+
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject(503, self._queue_wait_estimate(), "rejected_queue",
+                               f"Too many requests queued for {self.name}")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            with stage_timer(self.name, "admission"):
+                await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over as the wait ended; pass it on
+                self._release_slot()
+            else:
+                future.cancel()
+                try:
+                    self._waiters.remove(future)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._reject(503, self._queue_wait_estimate(), "timeout",
+                               f"Timed out waiting for {self.name} capacity") from None
+
+        ADMISSION_DECISIONS.labels(self.name, "queued").inc()
+        return time.monotonic()
+
+    def release(self, admitted_at: float) -> None:
+        self._service_seconds = 0.8 * self._service_seconds + 0.2 * (time.monotonic() - admitted_at)
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        # Hand the slot straight to the oldest live waiter, keeping FIFO order
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def admit(self):
+        admitted_at = await self.acquire()
+        try:
+            yield
+        finally:
+            self.release(admitted_at)
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "queued": len(self._waiters),
+            "rejected": self.rejected,
+            "rate": self.rate,
+            "burst": self.burst,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout
+        }
+
+
+_controllers: Dict[str, AdmissionController] = {}
+
+
+def get_controller(endpoint: str) -> Optional[AdmissionController]:
+    """Controller for an endpoint from ADMISSION_LIMITS, or None when admission is off"""
+    if not ADMISSION_ENABLED or endpoint not in ADMISSION_LIMITS:
+        return None
+    if endpoint not in _controllers:
+        _controllers[endpoint] = AdmissionController(endpoint, **ADMISSION_LIMITS[endpoint])
+    return _controllers[endpoint]
+
+
+@asynccontextmanager
+async def admit(endpoint: str):
+    """Hold an admission slot for ``endpoint`` for the duration of the block"""
+    controller = get_controller(endpoint)
+    if controller is None:
+        yield
+        return
+    async with controller.admit():
+        yield
+
+
+def admission_stats() -> dict:
+    return {endpoint: controller.stats() for endpoint, controller in _controllers.items()}
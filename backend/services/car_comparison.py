@@ -1,39 +1,165 @@
-import os
-from langchain_openai import ChatOpenAI
-
-from langchain.schema import HumanMessage, SystemMessage
-from dotenv import load_dotenv
+import asyncio
+import logging
+from dataclasses import replace
+from typing import Optional, Tuple
+from langchain_core.messages import HumanMessage, SystemMessage
 from backend.models.schemas import CompareRequest, CompareResponse, CarDetails
-from backend.utils.prompts import CAR_COMPARISON_PROMPT, CAR_DETAILS_EXTRACTION_PROMPT
-import json
-import re
+from backend.services.admission import Overloaded
+from backend.services.car_profiles import (
+    format_profile,
+    is_complete_profile,
+    local_recommendation,
+    merge_profiles,
+    parse_car_profile
+)
+from backend.services.comparison_parser import (
+    DEFAULT_RECOMMENDATION,
+    ComparisonStreamParser,
+    render_section,
+    sections_by_category,
+    winner_name
+)
+from backend.services.detail_extractor import extract_details_locally
+from backend.services.persistent_cache import create_result_cache
+from backend.services.llm_client import astream_llm
+from backend.services.model_router import TaskBudget, get_router
+from backend.services.near_duplicates import get_near_duplicate_index
+from backend.services.singleflight import SingleFlight
+from backend.services.structured_output import comparison_response_format, parse_comparison_json
+from backend.utils.canonical import canonical_car_key, normalize_text
+from backend.utils.metrics import EXTRACT_PATHS, stage_timer
+from backend.utils.prompts import (
+    CAR_COMPARISON_JSON_PROMPT,
+    CAR_COMPARISON_MERGE_PROMPT,
+    COMPARISON_CATEGORIES,
+    COMPARISON_JSON_ANALYSIS_FIELDS,
+    COMPARISON_JSON_RECOMMENDATION_FIELD,
+    CAR_DETAILS_EXTRACTION_PROMPT,
+    CAR_PROFILE_PROMPT,
+    COMPARISON_SYSTEM_PROMPT,
+    EXTRACTION_SYSTEM_PROMPT,
+    comparison_prompt
+)
+from backend.utils.settings import (
+    COMPARISON_CACHE_MAX_ENTRIES,
+    COMPARISON_CACHE_TTL_SECONDS,
+    COMPARISON_MERGE,
+    COMPARISON_MODE,
+    EXTRACT_CACHE_MAX_ENTRIES,
+    EXTRACT_CACHE_TTL_SECONDS,
+    EXTRACT_MIN_CONFIDENCE,
+    LLM_JSON_ANALYSIS,
+    LLM_OUTPUT_FORMAT,
+    MERGE_MAX_TOKENS,
+    PROFILE_CACHE_MAX_ENTRIES,
+    PROFILE_CACHE_TTL_SECONDS,
+    PROFILE_MAX_TOKENS
+)
+
+logger = logging.getLogger(__name__)
+
+# Short structured outputs start on the small tier and escalate when they fail
+# to parse; the one-shot comparison needs the large model
+EXTRACT_BUDGET = TaskBudget(latency_seconds=5.0, max_tokens=400, temperature=0.3)
+PROFILE_BUDGET = TaskBudget(latency_seconds=15.0, max_tokens=PROFILE_MAX_TOKENS, temperature=0.3)
+MERGE_BUDGET = TaskBudget(latency_seconds=10.0, max_tokens=MERGE_MAX_TOKENS, temperature=0.3)
+COMPARE_BUDGET = TaskBudget(latency_seconds=60.0, max_tokens=2000, temperature=0.3, min_tier="large")
+COMPARE_JSON_BUDGET = TaskBudget(
+    latency_seconds=30.0,
+    max_tokens=1200 if LLM_JSON_ANALYSIS else 500,
+    temperature=0.3,
+    min_tier="large",
+    response_format=comparison_response_format(LLM_JSON_ANALYSIS)
+)
+COMPARE_JSON_CATEGORY_BUDGET = replace(
+    COMPARE_JSON_BUDGET, response_format=comparison_response_format(LLM_JSON_ANALYSIS, include_recommendation=False)
+)
+
+# Shares of a full comparison's output: framing text, each category section and
+# the final recommendation (the rest). A comparison of selected categories gets
+# only the share of what it asks for.
+_FRAMING_SHARE = 0.1
+_CATEGORY_SHARE = 0.125
+
 
-# Load environment variables
-load_dotenv()
+def _selected_categories(request: CompareRequest) -> Optional[Tuple[str, ...]]:
+    """Requested category keys in prompt order, or None for a full comparison"""
+    if not request.categories:
+        return None
+    keys = tuple(key for key, _ in COMPARISON_CATEGORIES if key in request.categories)
+    return None if len(keys) == len(COMPARISON_CATEGORIES) else keys
+
+
+def _scaled_budget(budget: TaskBudget, categories: Optional[Tuple[str, ...]]) -> TaskBudget:
+    if categories is None:
+        return budget
+    share = _FRAMING_SHARE + _CATEGORY_SHARE * len(categories)
+    return replace(budget, max_tokens=max(64, round(budget.max_tokens * share)))
+
+
+def _category_recommendation(sections: list) -> str:
+    """Recommendation text for a comparison of selected categories: the winner of each"""
+    lines = [f"{section['title']}: {section['winner']}" for section in sections if section["winner"]]
+    return "\n".join(lines) or DEFAULT_RECOMMENDATION
 
 class CarComparisonService:
     def __init__(self):
-        OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-        self.llm = ChatOpenAI(
-            model="gpt-4o",
-            api_key=OPENAI_API_KEY,
-            temperature=0.3,
-            max_tokens=2000
+        self.router = get_router()
+        self.near_dups = get_near_duplicate_index()
+        self.flights = SingleFlight(name="compare")
+        self.extract_flights = SingleFlight(name="extract")
+        self.profile_flights = SingleFlight(name="car_profile")
+        self.comparison_cache = create_result_cache(
+            COMPARISON_CACHE_MAX_ENTRIES, COMPARISON_CACHE_TTL_SECONDS, name="comparison", model=CompareResponse
+        )
+        self.profile_cache = create_result_cache(PROFILE_CACHE_MAX_ENTRIES, PROFILE_CACHE_TTL_SECONDS, name="car_profile")
+        # Single category sections per car pair, shared by full and selective comparisons
+        self.category_cache = create_result_cache(
+            COMPARISON_CACHE_MAX_ENTRIES * len(COMPARISON_CATEGORIES), COMPARISON_CACHE_TTL_SECONDS,
+            name="comparison_category"
         )
+        self.extract_cache = create_result_cache(EXTRACT_CACHE_MAX_ENTRIES, EXTRACT_CACHE_TTL_SECONDS, name="extract")
     
-    def extract_car_details(self, raw_description: str) -> dict:
-        """Extract structured details from raw car description"""
+    async def extract_car_details(self, raw_description: str) -> Tuple[dict, str]:
+        """Extract structured details from raw car description.
+        
+        Returns the details and the path that produced them: ``rules`` when
+        the local extractor is confident enough, otherwise ``llm``.
+        """
+        with stage_timer("extract", "rules"):
+            local = extract_details_locally(raw_description)
+        if local.confidence >= EXTRACT_MIN_CONFIDENCE:
+            EXTRACT_PATHS.labels("rules").inc()
+            return local.details, "rules"
+        
+        EXTRACT_PATHS.labels("llm").inc()
+        with stage_timer("extract", "cache"):
+            cache_key = normalize_text(raw_description)
+            cached = await self.extract_cache.aget(cache_key)
+        if cached is not None:
+            return cached, "llm"
+        
         try:
-            messages = [
-                SystemMessage(content="You are an expert at extracting car specifications from descriptions."),
-                HumanMessage(content=CAR_DETAILS_EXTRACTION_PROMPT.format(description=raw_description))
-            ]
+            with stage_timer("extract", "prompt"):
+                prompt = CAR_DETAILS_EXTRACTION_PROMPT.format(description=raw_description)
+                messages = [
+                    SystemMessage(content=EXTRACTION_SYSTEM_PROMPT),
+                    HumanMessage(content=prompt)
+                ]
             
-            response = self.llm.invoke(messages)
-            return self._parse_extracted_details(response.content)
+            response = await self.extract_flights.do(
+                prompt, lambda: self.router.invoke("extract", EXTRACT_BUDGET, messages, accept=self._has_make_model)
+            )
+            with stage_timer("extract", "parse"):
+                details = self._parse_extracted_details(response.content)
+            if details:
+                self.extract_cache.set(cache_key, details)
+            return details, "llm"
+        except Overloaded:
+            raise
         except Exception as e:
-            print(f"Error extracting car details: {e}")
-            return {"raw_description": raw_description}
+            logger.warning("Car detail extraction failed: %s", e)
+            return {"raw_description": raw_description}, "llm"
     
     def _parse_extracted_details(self, extracted_text: str) -> dict:
         """Parse the extracted details into a structured format"""
@@ -50,43 +176,279 @@ class CarComparisonService:
         
         return details
     
-    def compare_cars(self, request: CompareRequest) -> CompareResponse:
+    def _has_make_model(self, extracted_text: str) -> bool:
+        """Whether an extraction response identified the car at all"""
+        details = self._parse_extracted_details(extracted_text)
+        return bool(details.get("make") or details.get("model"))
+    
+    async def compare_cars(self, request: CompareRequest) -> CompareResponse:
         """Compare two cars and return detailed analysis"""
         try:
-            # Format car details for comparison
-            car1_formatted = self._format_car_details(request.car1)
-            car2_formatted = self._format_car_details(request.car2)
+            # A comparison of (A, B) is reused for (B, A): the text uses car names, not positions
+            categories = _selected_categories(request)
+            with stage_timer("compare", "cache"):
+                car_keys = [canonical_car_key(request.car1), canonical_car_key(request.car2)]
+                cache_keys = [self.near_dups.canonical_key(key) for key in car_keys]
+                pair_key = tuple(sorted(cache_keys))
+                cached = await self.comparison_cache.aget(pair_key) if categories is None else None
+            if cached is not None:
+                if cache_keys != car_keys:
+                    self.near_dups.record_saved("comparison")
+                return cached
             
-            # Create comparison prompt
-            messages = [
-                SystemMessage(content="You are an expert automotive consultant providing detailed car comparisons."),
-                HumanMessage(content=CAR_COMPARISON_PROMPT.format(
-                    car1_details=car1_formatted,
-                    car2_details=car2_formatted
-                ))
-            ]
+            if categories is not None:
+                return await self._compare_categories(request, categories, pair_key, cache_keys != car_keys)
             
-            # Get comparison from LLM
-            response = self.llm.invoke(messages)
-            comparison_text = response.content
+            if COMPARISON_MODE == "decomposed":
+                result, complete = await self._compare_decomposed(request)
+            else:
+                result = await self._compare_full(request)
+                complete = "Winner:" in result.comparison
             
-            # Extract summary and recommendation
-            summary = self._extract_summary(comparison_text)
-            recommendation = self._extract_recommendation(comparison_text)
+            # Fallback output (failed profiles or merge) is served but never cached
+            if complete:
+                self.comparison_cache.set(pair_key, result)
+                self._cache_sections(pair_key, sections_by_category(result.comparison))
+            return result
             
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.exception("Car comparison failed: %s", e)
             return CompareResponse(
+                comparison=f"Error occurred during comparison: {str(e)}",
+                summary={},
+                recommendation="Unable to provide recommendation due to an error."
+            )
+    
+    async def _compare_categories(self, request: CompareRequest, categories: Tuple[str, ...],
+                                  pair_key: tuple, near_duplicate: bool) -> CompareResponse:
+        """Compare only ``categories``, generating just the sections not cached for this pair"""
+        with stage_timer("compare", "cache"):
+            found = await asyncio.gather(*(self.category_cache.aget((pair_key, key)) for key in categories))
+            sections = dict(zip(categories, found))
+        missing = tuple(key for key in categories if sections[key] is None)
+        if near_duplicate and len(missing) < len(categories):
+            self.near_dups.record_saved("comparison_category")
+        
+        if missing:
+            if COMPARISON_MODE == "decomposed":
+                profile1, profile2 = await asyncio.gather(
+                    self._get_profile(request.car1),
+                    self._get_profile(request.car2)
+                )
+                with stage_timer("compare", "merge"):
+                    text, _ = merge_profiles(profile1["name"], profile1, profile2["name"], profile2, missing)
+                complete = is_complete_profile(profile1) and is_complete_profile(profile2)
+            else:
+                text = (await self._compare_full(request, missing)).comparison
+                complete = True
+            
+            fresh = sections_by_category(text)
+            if complete:
+                self._cache_sections(pair_key, fresh)
+            sections.update((key, fresh.get(key)) for key in missing)
+        
+        found = [sections[key] for key in categories if sections[key] is not None]
+        return CompareResponse.model_construct(
+            comparison="\n".join(render_section(section) for section in found),
+            summary={key: winner_name(sections[key]["winner"])
+                     for key in categories if sections[key] is not None and sections[key]["winner"]},
+            recommendation=_category_recommendation(found)
+        )
+    
+    def _cache_sections(self, pair_key: tuple, sections: dict) -> None:
+        for key, section in sections.items():
+            if section["winner"]:
+                self.category_cache.set((pair_key, key), section)
+    
+    async def _compare_full(self, request: CompareRequest,
+                            categories: Optional[Tuple[str, ...]] = None) -> CompareResponse:
+        """Generate the pairwise comparison in one LLM call, for all or only the given categories"""
+        json_format = LLM_OUTPUT_FORMAT == "json"
+        with stage_timer("compare", "prompt"):
+            messages = self._build_comparison_messages(request, json_format=json_format, categories=categories)
+        
+        # Get comparison from LLM, sharing the call with identical in-flight requests
+        prompt = messages[-1].content
+        with_recommendation = categories is None
+        if json_format:
+            budget = COMPARE_JSON_BUDGET if with_recommendation else COMPARE_JSON_CATEGORY_BUDGET
+            accept = lambda text: self._is_comparison_json(text, with_recommendation)
+        else:
+            budget, accept = COMPARE_BUDGET, lambda text: "Winner:" in text
+        budget = _scaled_budget(budget, categories)
+        response = await self.flights.do(
+            prompt, lambda: self.router.invoke("compare", budget, messages, accept=accept)
+        )
+        
+        with stage_timer("compare", "parse"):
+            # Extract summary and recommendation; JSON is rendered to the markdown format first
+            if json_format:
+                comparison_text, summary = parse_comparison_json(
+                    response.content, LLM_JSON_ANALYSIS, include_recommendation=with_recommendation
+                )
+            else:
+                comparison_text = response.content
+                summary = self._extract_summary(comparison_text)
+            recommendation = self._extract_recommendation(comparison_text)
+            
+            return CompareResponse.model_construct(
                 comparison=comparison_text,
                 summary=summary,
                 recommendation=recommendation
             )
+    
+    async def _compare_decomposed(self, request: CompareRequest) -> Tuple[CompareResponse, bool]:
+        """Build the comparison from per-car profiles plus a short merge step.
+        
+        Profiles are cached per car, so comparing a catalog of N cars needs
+        O(N) profile calls; each pair then costs at most one short merge call
+        (none with COMPARISON_MERGE=local). Also returns whether both profiles
+        and the merge were complete, i.e. whether the result may be cached.
+        """
+        profile1, profile2 = await asyncio.gather(
+            self._get_profile(request.car1),
+            self._get_profile(request.car2)
+        )
+        name1, name2 = profile1["name"], profile2["name"]
+        
+        with stage_timer("compare", "merge"):
+            sections, summary = merge_profiles(name1, profile1, name2, profile2)
+        
+        if COMPARISON_MERGE == "local":
+            final_block = local_recommendation(name1, profile1, name2, profile2)
+        else:
+            prompt = CAR_COMPARISON_MERGE_PROMPT.format(
+                car1_profile=format_profile(name1, profile1),
+                car2_profile=format_profile(name2, profile2)
+            )
+            messages = [
+                SystemMessage(content=COMPARISON_SYSTEM_PROMPT),
+                HumanMessage(content=prompt)
+            ]
+            response = await self.flights.do(
+                prompt,
+                lambda: self.router.invoke(
+                    "compare_merge", MERGE_BUDGET, messages, accept=lambda text: "Overall Winner:" in text
+                )
+            )
+            final_block = response.content.strip()
+        
+        complete = (is_complete_profile(profile1) and is_complete_profile(profile2)
+                    and "Overall Winner:" in final_block)
+        comparison_text = f"{sections}\n{final_block}"
+        with stage_timer("compare", "parse"):
+            return CompareResponse.model_construct(
+                comparison=comparison_text,
+                summary=summary,
+                recommendation=self._extract_recommendation(comparison_text)
+            ), complete
+    
+    async def _get_profile(self, car: CarDetails) -> dict:
+        """Return the cached profile for a car, generating it on a miss"""
+        car_key = canonical_car_key(car)
+        key = self.near_dups.canonical_key(car_key)
+        profile = await self.profile_cache.aget(key)
+        if profile is not None:
+            if key != car_key:
+                self.near_dups.record_saved("car_profile")
+            return profile
+        
+        prompt = CAR_PROFILE_PROMPT.format(car_details=self._format_car_details(car))
+        messages = [
+            SystemMessage(content=COMPARISON_SYSTEM_PROMPT),
+            HumanMessage(content=prompt)
+        ]
+        response = await self.profile_flights.do(
+            prompt,
+            lambda: self.router.invoke(
+                "compare_profile", PROFILE_BUDGET, messages,
+                accept=lambda text: is_complete_profile(parse_car_profile(text))
+            )
+        )
+        
+        profile = parse_car_profile(response.content)
+        if not profile["name"]:
+            profile["name"] = self._display_name(car)
+        if is_complete_profile(profile):
+            self.profile_cache.set(key, profile)
+        return profile
+    
+    def _display_name(self, car: CarDetails) -> str:
+        """Readable car name used when the profile does not state one"""
+        name = " ".join(filter(None, [car.make, car.model, car.year]))
+        return name or car.raw_description[:40].strip()
+    
+    async def stream_comparison(self, request: CompareRequest):
+        """Stream a comparison as (event, data) pairs.
+        
+        Yields ``token`` events as text arrives, ``section`` events as each
+        numbered category and its winner complete, a ``recommendation`` event
+        and finally ``done`` with the full CompareResponse payload.
+        """
+        parser = ComparisonStreamParser()
+        chunks = []
+        categories = _selected_categories(request)
+        
+        try:
+            messages = self._build_comparison_messages(request, categories=categories)
+            
+            # Streamed text reaches the client as it arrives, so it cannot be escalated
+            llm = self.router.chat_model("compare_stream", _scaled_budget(COMPARE_BUDGET, categories))
+            async for text in astream_llm(llm, messages, endpoint="compare_stream"):
+                chunks.append(text)
+                yield "token", {"text": text}
+                for event in parser.feed(text):
+                    yield event["event"], event["data"]
+            
+            for event in parser.close():
+                yield event["event"], event["data"]
+            
+            response = CompareResponse.model_construct(
+                comparison="".join(chunks),
+                summary=parser.summary,
+                recommendation=parser.recommendation if categories is None else _category_recommendation(parser.sections)
+            )
+            yield "done", response.model_dump()
             
         except Exception as e:
-            print(f"Error in car comparison: {e}")
-            return CompareResponse(
-                comparison=f"Error occurred during comparison: {str(e)}",
-                summary={},
-                recommendation="Unable to provide recommendation due to an error."
+            logger.exception("Streaming car comparison failed: %s", e)
+            yield "error", {"detail": f"Comparison failed: {str(e)}"}
+    
+    def _build_comparison_messages(self, request: CompareRequest, json_format: bool = False,
+                                   categories: Optional[Tuple[str, ...]] = None) -> list:
+        """Build the chat messages for a comparison of all or only the given categories"""
+        # Format car details for comparison
+        car1_formatted = self._format_car_details(request.car1)
+        car2_formatted = self._format_car_details(request.car2)
+        
+        # Create comparison prompt
+        if json_format:
+            prompt = CAR_COMPARISON_JSON_PROMPT.format(
+                category_keys=", ".join(categories or (key for key, _ in COMPARISON_CATEGORIES)),
+                analysis_fields=COMPARISON_JSON_ANALYSIS_FIELDS if LLM_JSON_ANALYSIS else "",
+                recommendation_field=COMPARISON_JSON_RECOMMENDATION_FIELD if categories is None else "",
+                car1_details=car1_formatted,
+                car2_details=car2_formatted
+            )
+        else:
+            prompt = comparison_prompt(categories).format(
+                car1_details=car1_formatted,
+                car2_details=car2_formatted
             )
+        return [
+            SystemMessage(content=COMPARISON_SYSTEM_PROMPT),
+            HumanMessage(content=prompt)
+        ]
+    
+    def _is_comparison_json(self, text: str, include_recommendation: bool = True) -> bool:
+        """Whether a JSON comparison matches the schema"""
+        try:
+            parse_comparison_json(text, LLM_JSON_ANALYSIS, include_recommendation)
+        except ValueError:
+            return False
+        return True
     
     def _format_car_details(self, car: CarDetails) -> str:
         """Format car details for LLM consumption"""
@@ -118,28 +480,15 @@ class CarComparisonService:
         return "\n".join(details)
     
     def _extract_summary(self, comparison_text: str) -> dict:
-        """Extract key points summary from comparison text"""
-        summary = {
-            "performance": "Analysis included in comparison",
-            "fuel_efficiency": "Analysis included in comparison", 
-            "features": "Analysis included in comparison",
-            "value": "Analysis included in comparison"
-        }
-        return summary
+        """Extract the winning car per category from comparison text"""
+        parser = ComparisonStreamParser()
+        parser.feed(comparison_text)
+        parser.close()
+        return parser.summary
     
     def _extract_recommendation(self, comparison_text: str) -> str:
         """Extract recommendation from comparison text"""
-        lines = comparison_text.split('\n')
-        recommendation_started = False
-        recommendation_lines = []
-        
-        for line in lines:
-            if 'recommendation' in line.lower() or 'conclusion' in line.lower():
-                recommendation_started = True
-            elif recommendation_started:
-                recommendation_lines.append(line.strip())
-        
-        if recommendation_lines:
-            return '\n'.join(recommendation_lines)
-        else:
-            return "Please refer to the detailed comparison above for recommendations."
+        parser = ComparisonStreamParser()
+        parser.feed(comparison_text)
+        parser.close()
+        return parser.recommendation
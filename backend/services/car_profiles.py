@@ -0,0 +1,137 @@
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+from backend.utils.prompts import COMPARISON_CATEGORIES
+
+_HEADER = re.compile(r"^\s*\*\*\s*(?:\d+\.\s*)?(.+?)\s*:?\s*\*\*\s*$")
+_SCORE = re.compile(r"^\s*\**\s*Score\s*:\s*\**\s*(\d+(?:\.\d+)?)", re.IGNORECASE)
+_VEHICLE = re.compile(r"^\s*\**\s*Vehicle\s*:\s*\**\s*(.+?)\s*$", re.IGNORECASE)
+_BULLET = re.compile(r"^\s*[-•*]\s+(.+?)\s*$")
+
+_TITLE_KEYS = {title.lower(): key for key, title in COMPARISON_CATEGORIES}
+
+
+def _category_key(title: str) -> Optional[str]:
+    title = title.lower()
+    if title in _TITLE_KEYS:
+        return _TITLE_KEYS[title]
+    # Tolerate small wording changes by matching on the leading word
+    for known, key in _TITLE_KEYS.items():
+        if title.split()[0] == known.split()[0]:
+            return key
+    return None
+
+
+def parse_car_profile(text: str) -> dict:
+    """Parse a CAR_PROFILE_PROMPT response into name, points and scores per category"""
+    profile = {"name": None, "categories": {}}
+    current = None
+
+    for line in text.split("\n"):
+        vehicle = _VEHICLE.match(line)
+        if vehicle and profile["name"] is None:
+            profile["name"] = vehicle.group(1)
+            continue
+
+        header = _HEADER.match(line)
+        if header:
+            key = _category_key(header.group(1))
+            current = {"points": [], "score": None} if key else None
+            if key:
+                profile["categories"][key] = current
+            continue
+
+        if current is None:
+            continue
+
+        score = _SCORE.match(line)
+        if score:
+            current["score"] = float(score.group(1))
+            continue
+
+        bullet = _BULLET.match(line)
+        if bullet:
+            current["points"].append(bullet.group(1))
+
+    return profile
+
+
+def is_complete_profile(profile: dict) -> bool:
+    """Whether enough categories were parsed for the profile to be reused"""
+    return len(profile["categories"]) * 2 >= len(COMPARISON_CATEGORIES)
+
+
+def format_profile(name: str, profile: dict) -> str:
+    """Render a parsed profile back into compact text for the merge prompt"""
+    lines = [f"Vehicle: {name}"]
+    for key, title in COMPARISON_CATEGORIES:
+        category = profile["categories"].get(key)
+        if not category:
+            continue
+        lines.append(f"{title}: " + "; ".join(category["points"]))
+        if category["score"] is not None:
+            lines.append(f"Score: {category['score']:g}/10")
+    return "\n".join(lines)
+
+
+def _winner(name1: str, score1: Optional[float], name2: str, score2: Optional[float]) -> Tuple[str, str]:
+    """Return (winner, reason) from two category scores"""
+    if score1 is None or score2 is None or score1 == score2:
+        return "Tie", "both cars are evenly matched in this area"
+    if score1 > score2:
+        return name1, f"scores {score1:g}/10 vs {score2:g}/10"
+    return name2, f"scores {score2:g}/10 vs {score1:g}/10"
+
+
+def merge_profiles(name1: str, profile1: dict, name2: str, profile2: dict,
+                   categories: Optional[Iterable[str]] = None) -> Tuple[str, Dict[str, str]]:
+    """Build the per-category comparison sections and winner summary locally.
+
+    The text follows the CAR_COMPARISON_PROMPT section format, so the
+    frontend and the comparison parser handle it like a full comparison.
+    ``categories`` limits the sections to those keys.
+    """
+    sections = []
+    summary = {}
+    selected = set(categories) if categories is not None else None
+
+    for number, (key, title) in enumerate(COMPARISON_CATEGORIES, 1):
+        if selected is not None and key not in selected:
+            continue
+        category1 = profile1["categories"].get(key, {"points": [], "score": None})
+        category2 = profile2["categories"].get(key, {"points": [], "score": None})
+        winner, reason = _winner(name1, category1["score"], name2, category2["score"])
+        summary[key] = winner
+
+        points1 = "\n".join(f"- {point}" for point in category1["points"]) or "- No details available"
+        points2 = "\n".join(f"- {point}" for point in category2["points"]) or "- No details available"
+        sections.append(
+            f"**{number}. {title}**\n\n{name1}:\n{points1}\n\n{name2}:\n{points2}\n\nWinner: {winner} - {reason}\n"
+        )
+
+    return "\n".join(sections), summary
+
+
+def local_recommendation(name1: str, profile1: dict, name2: str, profile2: dict) -> str:
+    """Derive the Final Recommendation block from category scores without an LLM call"""
+    def total(profile: dict, keys: tuple) -> float:
+        return sum(profile["categories"].get(key, {}).get("score") or 0 for key in keys)
+
+    def pick(keys: tuple) -> str:
+        score1, score2 = total(profile1, keys), total(profile2, keys)
+        if score1 == score2:
+            return "Either car - they score evenly here"
+        winner = name1 if score1 > score2 else name2
+        return f"{winner} - higher combined score ({max(score1, score2):g} vs {min(score1, score2):g})"
+
+    all_keys = tuple(key for key, _ in COMPARISON_CATEGORIES)
+    return "\n".join([
+        "**Final Recommendation**",
+        "",
+        f"Family Use: {pick(('safety', 'features'))}",
+        f"Daily Commuting: {pick(('fuel_efficiency', 'safety'))}",
+        f"Performance: {pick(('performance',))}",
+        f"Budget: {pick(('value', 'fuel_efficiency', 'resale'))}",
+        "",
+        f"Overall Winner: {pick(all_keys)}",
+    ])
@@ -0,0 +1,138 @@
+import re
+from typing import Dict, List, Optional
+
+from backend.utils.prompts import COMPARISON_CATEGORIES
+
+SECTION_HEADER = re.compile(r"^\s*\*\*\s*(\d+)\.\s*(.+?)\s*\*\*\s*$")
+BOLD_HEADER = re.compile(r"^\s*\*\*(.+?)\*\*\s*$")
+WINNER_LINE = re.compile(r"^\s*\**\s*Winner\s*:\s*\**\s*(.+?)\s*$", re.IGNORECASE)
+
+DEFAULT_RECOMMENDATION = "Please refer to the detailed comparison above for recommendations."
+
+
+class ComparisonStreamParser:
+    """Incremental parser for comparison text in the CAR_COMPARISON_PROMPT format.
+
+    Text can be fed in arbitrary chunks as it streams from the LLM. Each call
+    to ``feed`` returns the events completed by that chunk: a ``section``
+    event once a ``**N. Section**`` block reaches its ``Winner:`` line (or the
+    next header), and a ``recommendation`` event from ``close``.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._section: Optional[dict] = None
+        self.sections: List[dict] = []
+        self._recommendation_started = False
+        self._recommendation_lines: List[str] = []
+
+    def feed(self, chunk: str) -> List[dict]:
+        """Consume a chunk of text and return any events it completed"""
+        self._buffer += chunk
+        events = []
+
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            events.extend(self._process_line(line))
+
+        return events
+
+    def close(self) -> List[dict]:
+        """Flush the trailing partial line and any unfinished section"""
+        events = self._process_line(self._buffer)
+        self._buffer = ""
+
+        if self._section is not None:
+            events.append(self._finish_section())
+
+        events.append({"event": "recommendation", "data": {"recommendation": self.recommendation}})
+        return events
+
+    @property
+    def summary(self) -> Dict[str, str]:
+        """Winning car per category key, from the sections parsed so far"""
+        summary = {}
+        for section in self.sections:
+            if section["winner"] and 1 <= section["number"] <= len(COMPARISON_CATEGORIES):
+                key = COMPARISON_CATEGORIES[section["number"] - 1][0]
+                summary[key] = winner_name(section["winner"])
+        return summary
+
+    @property
+    def recommendation(self) -> str:
+        if self._recommendation_lines:
+            return '\n'.join(self._recommendation_lines)
+        return DEFAULT_RECOMMENDATION
+
+    def _process_line(self, line: str) -> List[dict]:
+        events = []
+
+        # Everything after the first line mentioning a recommendation/conclusion
+        if 'recommendation' in line.lower() or 'conclusion' in line.lower():
+            self._recommendation_started = True
+        elif self._recommendation_started:
+            self._recommendation_lines.append(line.strip())
+
+        header = SECTION_HEADER.match(line)
+        if header:
+            if self._section is not None:
+                events.append(self._finish_section())
+            self._section = {
+                "number": int(header.group(1)),
+                "title": header.group(2).strip(),
+                "lines": [],
+                "winner": None
+            }
+            return events
+
+        if self._section is None:
+            return events
+
+        if BOLD_HEADER.match(line):
+            # A non-numbered header such as **Final Recommendation** ends the section
+            events.append(self._finish_section())
+            return events
+
+        winner = WINNER_LINE.match(line)
+        if winner:
+            self._section["winner"] = winner.group(1)
+            events.append(self._finish_section())
+            return events
+
+        self._section["lines"].append(line)
+        return events
+
+    def _finish_section(self) -> dict:
+        section = self._section
+        self._section = None
+
+        completed = {
+            "number": section["number"],
+            "title": section["title"],
+            "content": "\n".join(section["lines"]).strip(),
+            "winner": section["winner"]
+        }
+        self.sections.append(completed)
+        return {"event": "section", "data": completed}
+
+
+def winner_name(winner: str) -> str:
+    """Car name from a winner line such as "Toyota Camry 2023 - better fuel economy"."""
+    return winner.split(" - ", 1)[0].strip()
+
+
+def sections_by_category(text: str) -> Dict[str, dict]:
+    """Parsed sections of a comparison text, keyed by category"""
+    parser = ComparisonStreamParser()
+    parser.feed(text)
+    parser.close()
+    return {
+        COMPARISON_CATEGORIES[section["number"] - 1][0]: section
+        for section in parser.sections
+        if 1 <= section["number"] <= len(COMPARISON_CATEGORIES)
+    }
+
+
+def render_section(section: dict) -> str:
+    """A parsed section back in the CAR_COMPARISON_PROMPT format"""
+    return f"**{section['number']}. {section['title']}**\n\n{section['content']}\n\nWinner: {section['winner']}\n"
@@ -0,0 +1,297 @@
+import json
+import math
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.models.schemas import CarDetails, PriceEstimateResponse
+from backend.utils.canonical import canonical_car_key
+
+# Positions of the fields the model uses in canonical_car_key
+_MAKE, _MODEL, _YEAR, _MILEAGE_KM, _CONDITION, _REGION = range(6)
+
+CONDITIONS = ["excellent", "very good", "good", "fair", "poor"]
+
+# Two-sided 80% interval of a normal distribution
+_Z80 = 1.2816
+
+_NUMERIC_FEATURES = ["intercept", "age", "age_squared", "log_mileage"]
+
+
+@dataclass
+class TrainingSample:
+    key: Tuple[str, ...]
+    min_price: float
+    max_price: float
+    currency: str
+
+
+@dataclass
+class LocalEstimate:
+    currency: str
+    min_price: float
+    max_price: float
+    most_likely_price: float
+    interval: float
+    age: int
+    mileage_km: int
+
+
+def _year_and_mileage(key: Sequence[str]) -> Optional[Tuple[int, int]]:
+    """Model year and odometer (km) from a canonical key, or None when either is unknown"""
+    year, mileage = key[_YEAR], key[_MILEAGE_KM]
+    if not (year.isdigit() and mileage.isdigit()):
+        return None
+    return int(year), int(mileage)
+
+
+def _model_name(key: Sequence[str]) -> str:
+    return f"{key[_MAKE]}|{key[_MODEL]}"
+
+
+class DepreciationModel:
+    """Ridge regression of log price on age, mileage, condition, region, make and model.
+
+    Predicts the log of the geometric mid-point of the LLM's price range and
+    the log width of the range. Each prediction comes with the relative
+    half-width of an 80% prediction interval, from the residual spread and
+    the car's leverage, so callers can tell interpolation from guessing.
+    Only cars whose region and make/model were seen often enough in training
+    are scored at all.
+    """
+
+    def __init__(self, vocabulary: Dict[str, List[str]], currencies: Dict[str, str],
+                 coef: np.ndarray, covariance: np.ndarray, residual_std: float,
+                 reference_year: int, meta: Optional[dict] = None):
+        self.vocabulary = vocabulary
+        self.currencies = currencies
+        self.coef = coef
+        self.covariance = covariance
+        self.residual_std = residual_std
+        self.reference_year = reference_year
+        self.meta = meta or {}
+
+        # Column of each categorical value in the design matrix
+        self._columns: Dict[str, Dict[str, int]] = {}
+        offset = len(_NUMERIC_FEATURES)
+        for name in ("condition", "region", "make", "model"):
+            self._columns[name] = {value: offset + i for i, value in enumerate(vocabulary[name])}
+            offset += len(vocabulary[name])
+        self.n_features = offset
+
+    def design(self, keys: Sequence[Sequence[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """Design matrix for canonical keys, and a mask of the rows the model can score"""
+        n = len(keys)
+        X = np.zeros((n, self.n_features))
+        known = np.zeros(n, dtype=bool)
+        years = np.zeros(n)
+        mileage = np.zeros(n)
+        columns = self._columns
+
+        for i, key in enumerate(keys):
+            numbers = _year_and_mileage(key)
+            region = columns["region"].get(key[_REGION])
+            model = columns["model"].get(_model_name(key))
+            if numbers is None or region is None or model is None:
+                continue
+            known[i] = True
+            years[i], mileage[i] = numbers
+            X[i, region] = X[i, model] = 1.0
+            make = columns["make"].get(key[_MAKE])
+            if make is not None:
+                X[i, make] = 1.0
+            condition = columns["condition"].get(key[_CONDITION])
+            if condition is not None:
+                X[i, condition] = 1.0
+
+        age = np.clip(self.reference_year - years, 0, None)
+        X[:, 0] = 1.0
+        X[:, 1] = age
+        X[:, 2] = age ** 2
+        X[:, 3] = np.log1p(mileage / 1000.0)
+        X[~known] = 0.0
+        return X, known
+
+    def predict_keys(self, keys: Sequence[Sequence[str]]) -> List[Optional[LocalEstimate]]:
+        """Score a batch of canonical keys in one pass; None where the model cannot score"""
+        if not keys:
+            return []
+        X, known = self.design(keys)
+        log_mid, log_width = (X @ self.coef).T
+        leverage = np.einsum("ij,jk,ik->i", X, self.covariance, X)
+        interval = np.expm1(_Z80 * self.residual_std * np.sqrt(1.0 + leverage))
+
+        mid = np.exp(log_mid)
+        half_width = np.exp(np.clip(log_width, 0.0, None) / 2)
+        ages = X[:, 1].astype(int)
+        mileage = np.expm1(X[:, 3]) * 1000.0
+
+        estimates: List[Optional[LocalEstimate]] = []
+        for i, key in enumerate(keys):
+            if not known[i]:
+                estimates.append(None)
+                continue
+            estimates.append(LocalEstimate(
+                currency=self.currencies[key[_REGION]],
+                min_price=float(mid[i] / half_width[i]),
+                max_price=float(mid[i] * half_width[i]),
+                most_likely_price=float(mid[i]),
+                interval=float(interval[i]),
+                age=int(ages[i]),
+                mileage_km=int(round(mileage[i]))
+            ))
+        return estimates
+
+    def predict(self, cars: Sequence[CarDetails]) -> List[Optional[LocalEstimate]]:
+        return self.predict_keys([canonical_car_key(car) for car in cars])
+
+    def save(self, path: str) -> None:
+        """Write the model atomically, so serving workers never load a partial file"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        header = {
+            "vocabulary": self.vocabulary,
+            "currencies": self.currencies,
+            "residual_std": self.residual_std,
+            "reference_year": self.reference_year,
+            "meta": self.meta
+        }
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(f, coef=self.coef, covariance=self.covariance, header=np.array(json.dumps(header)))
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "DepreciationModel":
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(str(data["header"]))
+            return cls(
+                header["vocabulary"], header["currencies"], data["coef"], data["covariance"],
+                header["residual_std"], header["reference_year"], header["meta"]
+            )
+
+    def stats(self) -> dict:
+        return {
+            **self.meta,
+            "models": len(self.vocabulary["model"]),
+            "regions": len(self.vocabulary["region"]),
+            "residual_std": round(self.residual_std, 4)
+        }
+
+
+def _vocabulary(values: Iterable[str], min_samples: int) -> List[str]:
+    counts = Counter(value for value in values if value)
+    return sorted(value for value, count in counts.items() if count >= min_samples)
+
+
+def fit(samples: Sequence[TrainingSample], min_samples: int = 5, ridge: float = 1.0,
+        reference_year: Optional[int] = None) -> DepreciationModel:
+    """Fit the model to LLM appraisals.
+
+    Makes, models and regions with fewer than ``min_samples`` appraisals get
+    no coefficient, and cars of those models are left to the LLM. Raises
+    ValueError when no sample is usable.
+    """
+    usable = [s for s in samples if _year_and_mileage(s.key) and 0 < s.min_price <= s.max_price]
+    if not usable:
+        raise ValueError("No appraisals with a year, mileage and price range to train on")
+
+    currencies: Dict[str, Counter] = {}
+    for sample in usable:
+        currencies.setdefault(sample.key[_REGION], Counter())[sample.currency] += 1
+    vocabulary = {
+        "condition": [c for c in CONDITIONS if any(s.key[_CONDITION] == c for s in usable)],
+        "region": _vocabulary((s.key[_REGION] for s in usable), min_samples),
+        "make": _vocabulary((s.key[_MAKE] for s in usable), min_samples),
+        "model": _vocabulary((_model_name(s.key) for s in usable), min_samples)
+    }
+    model = DepreciationModel(
+        vocabulary,
+        {region: counts.most_common(1)[0][0] for region, counts in currencies.items()},
+        coef=np.zeros((0, 2)), covariance=np.zeros((0, 0)), residual_std=0.0,
+        reference_year=reference_year or date.today().year
+    )
+
+    X, known = model.design([s.key for s in usable])
+    X = X[known]
+    if not len(X):
+        raise ValueError(f"No make/model has {min_samples} appraisals yet")
+    low = np.log([s.min_price for s, k in zip(usable, known) if k])
+    high = np.log([s.max_price for s, k in zip(usable, known) if k])
+    Y = np.column_stack([(low + high) / 2, high - low])
+
+    # Ridge penalty on everything but the intercept keeps rare categories near the average
+    penalty = np.full(model.n_features, ridge)
+    penalty[0] = 0.0
+    gram = X.T @ X + np.diag(penalty)
+    model.coef = np.linalg.solve(gram, X.T @ Y)
+    model.covariance = np.linalg.pinv(gram)
+
+    residuals = Y[:, 0] - X @ model.coef[:, 0]
+    dof = max(len(X) - model.n_features, 1)
+    model.residual_std = float(math.sqrt(residuals @ residuals / dof))
+    model.meta = {"samples": int(len(X)), "trained_at": int(time.time())}
+    return model
+
+
+def evaluate(model: DepreciationModel, samples: Sequence[TrainingSample], max_interval: float) -> dict:
+    """Accuracy and scoring latency of ``model`` against held-out LLM appraisals"""
+    started = time.perf_counter()
+    estimates = model.predict_keys([s.key for s in samples])
+    elapsed = time.perf_counter() - started
+
+    scored = [(s, e) for s, e in zip(samples, estimates) if e is not None]
+    confident = [(s, e) for s, e in scored if e.interval <= max_interval]
+
+    def mape(pairs) -> Optional[float]:
+        if not pairs:
+            return None
+        errors = [abs(e.most_likely_price / math.sqrt(s.min_price * s.max_price) - 1) for s, e in pairs]
+        return round(float(np.mean(errors)), 4)
+
+    def in_range(pairs) -> Optional[float]:
+        if not pairs:
+            return None
+        return round(sum(s.min_price <= e.most_likely_price <= s.max_price for s, e in pairs) / len(pairs), 4)
+
+    return {
+        "holdout": len(samples),
+        "scored": len(scored),
+        "answered_locally": len(confident),
+        "local_share": round(len(confident) / len(samples), 4) if samples else 0.0,
+        "mape_scored": mape(scored),
+        "mape_local": mape(confident),
+        "within_llm_range_local": in_range(confident),
+        "batch_seconds": round(elapsed, 6),
+        "microseconds_per_car": round(elapsed / max(len(samples), 1) * 1e6, 2)
+    }
+
+
+def load_training_samples(rows: Iterable[Tuple[str, str]]) -> Tuple[List[TrainingSample], int]:
+    """Training samples from (key, value) rows of the price result cache.
+
+    Returns the samples and the number of malformed rows that were skipped.
+    """
+    samples = []
+    skipped = 0
+    for raw_key, raw_value in rows:
+        try:
+            key = tuple(json.loads(raw_key))
+            price_range = PriceEstimateResponse.model_validate_json(raw_value).price_range
+        except (TypeError, ValueError):
+            # ValidationError is a ValueError; a row from an older schema or a torn write
+            skipped += 1
+            continue
+        try:
+            low, high = float(price_range.get("min", 0)), float(price_range.get("max", 0))
+        except (TypeError, ValueError):
+            continue
+        if len(key) > _REGION and low > 0:
+            samples.append(TrainingSample(key, low, high, str(price_range.get("currency_detected", "$"))))
+    return samples, skipped
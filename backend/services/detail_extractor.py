@@ -0,0 +1,296 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from backend.utils.canonical import CURRENCY_REGIONS
+
+# Makes and their common models. Multi-word and hyphenated names are matched as
+# whole phrases, so "Grand Cherokee" wins over "Cherokee" and "CR-V" over "CR".
+MAKE_MODELS = {
+    "Acura": ["ILX", "TLX", "RDX", "MDX", "Integra", "NSX"],
+    "Audi": ["A3", "A4", "A5", "A6", "A7", "A8", "Q3", "Q5", "Q7", "Q8", "TT", "R8", "e-tron"],
+    "BMW": ["1 Series", "2 Series", "3 Series", "4 Series", "5 Series", "7 Series",
+            "X1", "X3", "X5", "X7", "M3", "M5", "i3", "i4", "iX"],
+    "Chevrolet": ["Spark", "Sonic", "Cruze", "Malibu", "Impala", "Camaro", "Corvette",
+                  "Trax", "Equinox", "Blazer", "Traverse", "Tahoe", "Suburban",
+                  "Silverado", "Colorado", "Bolt"],
+    "Dodge": ["Charger", "Challenger", "Durango", "Journey", "Grand Caravan"],
+    "Ford": ["Fiesta", "Focus", "Fusion", "Mustang", "EcoSport", "Escape", "Edge",
+             "Explorer", "Expedition", "Bronco", "Ranger", "F-150", "F-250", "Maverick"],
+    "GMC": ["Terrain", "Acadia", "Yukon", "Sierra", "Canyon"],
+    "Honda": ["Civic", "Accord", "Fit", "Jazz", "City", "Insight", "HR-V", "CR-V",
+              "Pilot", "Passport", "Odyssey", "Ridgeline"],
+    "Hyundai": ["i10", "i20", "i30", "Accent", "Elantra", "Sonata", "Venue", "Kona",
+                "Creta", "Tucson", "Santa Fe", "Palisade", "Ioniq 5", "Ioniq"],
+    "Jeep": ["Renegade", "Compass", "Cherokee", "Grand Cherokee", "Wrangler", "Gladiator"],
+    "Kia": ["Rio", "Forte", "Cerato", "K5", "Optima", "Soul", "Seltos", "Sportage",
+            "Sorento", "Telluride", "Carnival", "EV6"],
+    "Lexus": ["IS", "ES", "GS", "LS", "UX", "NX", "RX", "GX", "LX"],
+    "Mahindra": ["Thar", "XUV300", "XUV500", "XUV700", "Scorpio", "Bolero"],
+    "Maruti Suzuki": ["Alto", "Wagon R", "Swift", "Dzire", "Baleno", "Ciaz", "Brezza",
+                      "Ertiga", "Vitara Brezza"],
+    "Mazda": ["2", "3", "6", "CX-3", "CX-30", "CX-5", "CX-9", "CX-50", "MX-5", "Miata"],
+    "Mercedes-Benz": ["A-Class", "C-Class", "E-Class", "S-Class", "CLA", "GLA", "GLC",
+                      "GLE", "GLS", "G-Class"],
+    "Mitsubishi": ["Mirage", "Lancer", "Outlander", "Eclipse Cross", "Pajero"],
+    "Nissan": ["Micra", "Versa", "Sentra", "Altima", "Maxima", "Leaf", "Kicks",
+               "Qashqai", "Rogue", "X-Trail", "Murano", "Pathfinder", "Frontier",
+               "Navara", "GT-R"],
+    "Porsche": ["911", "Cayman", "Boxster", "Macan", "Cayenne", "Panamera", "Taycan"],
+    "Renault": ["Clio", "Megane", "Captur", "Kadjar", "Duster", "Kwid"],
+    "Subaru": ["Impreza", "Legacy", "WRX", "BRZ", "Crosstrek", "Forester", "Outback", "Ascent"],
+    "Tata": ["Tiago", "Altroz", "Nexon", "Harrier", "Safari", "Punch"],
+    "Tesla": ["Model 3", "Model S", "Model X", "Model Y"],
+    "Toyota": ["Yaris", "Corolla", "Camry", "Prius", "Avalon", "C-HR", "RAV4",
+               "Highlander", "4Runner", "Land Cruiser", "Sequoia", "Tacoma", "Tundra",
+               "Sienna", "Supra", "86", "Fortuner", "Innova", "Hilux"],
+    "Volkswagen": ["Polo", "Golf", "Jetta", "Passat", "Arteon", "Tiguan", "Atlas",
+                   "Touareg", "T-Roc", "ID.4", "Beetle"],
+    "Volvo": ["S60", "S90", "V60", "V90", "XC40", "XC60", "XC90"],
+}
+
+MAKE_ALIASES = {
+    "chevy": "Chevrolet",
+    "vw": "Volkswagen",
+    "mercedes": "Mercedes-Benz",
+    "benz": "Mercedes-Benz",
+    "merc": "Mercedes-Benz",
+    "maruti": "Maruti Suzuki",
+    "suzuki": "Maruti Suzuki",
+}
+
+TRIMS = {"ex", "ex-l", "lx", "dx", "si", "sport", "touring", "se", "le", "xle", "xse",
+         "sel", "sl", "sv", "s", "gt", "gli", "gti", "limited", "premium", "platinum",
+         "titanium", "base", "lariat", "xlt", "ltz", "lt", "ls", "denali", "trd"}
+
+TRANSMISSIONS = {
+    "automatic": "Automatic", "auto": "Automatic",
+    "manual": "Manual", "stick": "Manual", "stick shift": "Manual",
+    "cvt": "CVT",
+    "dct": "Dual-clutch", "dsg": "Dual-clutch", "dual-clutch": "Dual-clutch",
+}
+
+# Abbreviations that are also English words ("at"), so only matched in capitals
+TRANSMISSION_CODES = {"at": "Automatic", "a/t": "Automatic", "mt": "Manual", "m/t": "Manual"}
+
+FUEL_TYPES = {
+    "petrol": "Petrol", "gasoline": "Gasoline", "gas": "Gasoline",
+    "diesel": "Diesel", "tdi": "Diesel",
+    "hybrid": "Hybrid", "plug-in hybrid": "Plug-in Hybrid", "phev": "Plug-in Hybrid",
+    "electric": "Electric", "ev": "Electric", "bev": "Electric",
+    "cng": "CNG", "lpg": "LPG",
+}
+
+CONDITIONS = {
+    "excellent": "Excellent", "mint": "Excellent", "like new": "Excellent",
+    "very good": "Very Good", "good": "Good", "fair": "Fair", "poor": "Poor",
+}
+
+# Words that carry no car detail; anything else left unexplained lowers confidence
+FILLER_WORDS = {"a", "an", "the", "with", "and", "in", "on", "at", "for", "of", "only",
+                "used", "car", "condition", "sale", "for sale", "located", "odometer",
+                "mileage", "engine", "transmission", "speed", "-", "/", "|"}
+
+# Confidence contributed by each field; make, model and year alone reach the default threshold
+FIELD_WEIGHTS = {
+    "make": 0.3,
+    "model": 0.25,
+    "year": 0.25,
+    "mileage/odometer_reading": 0.1,
+    "transmission_type": 0.025,
+    "fuel_type": 0.025,
+    "engine_details": 0.025,
+    "location": 0.025,
+}
+UNPARSED_WORD_PENALTY = 0.05
+
+
+def _phrase_pattern(phrases) -> str:
+    # Longest first, so multi-word phrases win over their prefixes
+    return "|".join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True))
+
+
+_YEAR = re.compile(r"(?<![\w.,])(19[5-9]\d|20[0-4]\d)(?!\w|,\d)")
+_MILEAGE = re.compile(
+    r"(?<![\w.])(\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?)\s*(k)?\s*"
+    r"(miles|mile|mi|kilometers|kilometres|kms|km)\b",
+    re.IGNORECASE
+)
+_ENGINE = re.compile(
+    r"(?<![\w.])(?:\d\.\d\s*(?:l|litre|liter)?(?:\s*(?:t|turbo)\b)?|[vwi]\d{1,2}|\d\.\dt)(?![\w.])"
+    r"(?:\s+(?:turbo|twin[- ]turbo|turbocharged))?",
+    re.IGNORECASE
+)
+_TRANSMISSION = re.compile(
+    r"(?<![\w-])(?:(\d{1,2})[- ]speed\s+)?(" + _phrase_pattern(TRANSMISSIONS) + r")(?![\w-])",
+    re.IGNORECASE
+)
+_TRANSMISSION_CODE = re.compile(
+    r"(?<![\w/-])(?:(\d{1,2})[- ](?i:speed)\s+)?(A/T|M/T|AT|MT)(?![\w/-])"
+)
+_FUEL = re.compile(r"(?<![\w-])(" + _phrase_pattern(FUEL_TYPES) + r")(?![\w-])", re.IGNORECASE)
+_CONDITION = re.compile(r"(?<![\w-])(" + _phrase_pattern(CONDITIONS) + r")(?![\w-])", re.IGNORECASE)
+_LOCATION = re.compile(
+    r"(?<![\w-])(" + _phrase_pattern(k for _, keywords in CURRENCY_REGIONS for k in keywords if len(k) > 2)
+    + r")(?![\w-])",
+    re.IGNORECASE
+)
+_WORD = re.compile(r"[A-Za-z0-9]+(?:[-.][A-Za-z0-9]+)*|[-/|]")
+
+
+def _normalize(phrase: str) -> str:
+    return " ".join(phrase.lower().split())
+
+
+# Dictionary index: normalized phrase -> canonical name
+_MAKE_INDEX: Dict[str, str] = {_normalize(make): make for make in MAKE_MODELS}
+_MAKE_INDEX.update(MAKE_ALIASES)
+_MODEL_INDEX: Dict[str, Dict[str, str]] = {
+    make: {_normalize(model): model for model in models} for make, models in MAKE_MODELS.items()
+}
+# Models that identify their make on their own (no other make uses the name, and not a bare number)
+_MODEL_ONLY_INDEX: Dict[str, Tuple[str, str]] = {}
+_seen_models: Dict[str, int] = {}
+for _make, _models in _MODEL_INDEX.items():
+    for _key in _models:
+        _seen_models[_key] = _seen_models.get(_key, 0) + 1
+for _make, _models in _MODEL_INDEX.items():
+    for _key, _model in _models.items():
+        if _seen_models[_key] == 1 and not _key.isdigit() and len(_key) > 2:
+            _MODEL_ONLY_INDEX[_key] = (_make, _model)
+_MAX_PHRASE_WORDS = max(len(key.split()) for index in [_MAKE_INDEX, *_MODEL_INDEX.values()] for key in index)
+
+
+@dataclass
+class ExtractionResult:
+    """Details found by the rule-based extractor and how much of the text they explain"""
+    details: Dict[str, str] = field(default_factory=dict)
+    confidence: float = 0.0
+    unparsed: List[str] = field(default_factory=list)
+
+
+def _lookup(words: List[Tuple[str, int, int]], start: int, index: dict) -> Optional[Tuple[int, object]]:
+    """Longest phrase in ``index`` starting at word ``start``, as (word count, value)"""
+    for size in range(min(_MAX_PHRASE_WORDS, len(words) - start), 0, -1):
+        phrase = " ".join(word for word, _, _ in words[start:start + size])
+        if phrase in index:
+            return size, index[phrase]
+    return None
+
+
+def _match_make_model(text: str, taken: List[bool]) -> Dict[str, str]:
+    words = [(m.group(0).lower(), m.start(), m.end()) for m in _WORD.finditer(text)
+             if not any(taken[m.start():m.end()])]
+    found = {}
+
+    def claim(first: int, count: int) -> None:
+        for i in range(words[first][1], words[first + count - 1][2]):
+            taken[i] = True
+
+    i = 0
+    while i < len(words):
+        make_match = _lookup(words, i, _MAKE_INDEX) if "make" not in found else None
+        if make_match:
+            size, make = make_match
+            claim(i, size)
+            found["make"] = make
+            i += size
+            model_match = _lookup(words, i, _MODEL_INDEX[make]) if i < len(words) else None
+            if model_match:
+                size, model = model_match
+                claim(i, size)
+                found["model"] = model
+                i += size
+                if i < len(words) and words[i][0] in TRIMS:
+                    claim(i, 1)
+                    found["model"] = f"{model} {text[words[i][1]:words[i][2]]}"
+                    i += 1
+            continue
+
+        if "model" not in found:
+            model_match = _lookup(words, i, _MODEL_ONLY_INDEX)
+            if model_match:
+                size, (make, model) = model_match
+                claim(i, size)
+                found.setdefault("make", make)
+                found["model"] = model
+                i += size
+                if i < len(words) and words[i][0] in TRIMS:
+                    claim(i, 1)
+                    found["model"] = f"{model} {text[words[i][1]:words[i][2]]}"
+                    i += 1
+                continue
+        i += 1
+
+    return found
+
+
+def extract_details_locally(description: str) -> ExtractionResult:
+    """Extract car details with dictionary lookups and compiled patterns.
+
+    Returns the same keys ``CarComparisonService._parse_extracted_details``
+    produces for the LLM response, plus a confidence in [0, 1] that drops
+    for every word the rules could not account for.
+    """
+    text = description or ""
+    taken = [False] * len(text)
+    details: Dict[str, str] = {}
+
+    def take(match: re.Match) -> str:
+        for i in range(match.start(), match.end()):
+            taken[i] = True
+        return match.group(0).strip()
+
+    # Mileage first, so its digits are never read as a year or an engine size
+    mileage = _MILEAGE.search(text)
+    if mileage:
+        details["mileage/odometer_reading"] = take(mileage)
+
+    for match in _YEAR.finditer(text):
+        if not any(taken[match.start():match.end()]):
+            details["year"] = take(match)
+            break
+
+    # An engine can be described in several pieces ("2.5L V6"), so keep them all
+    engine = [take(match) for match in _ENGINE.finditer(text) if not any(taken[match.start():match.end()])]
+    if engine:
+        details["engine_details"] = " ".join(engine)
+
+    for key, pattern, names in (
+        ("transmission_type", _TRANSMISSION, TRANSMISSIONS),
+        ("transmission_type", _TRANSMISSION_CODE, TRANSMISSION_CODES),
+        ("fuel_type", _FUEL, FUEL_TYPES),
+        ("condition", _CONDITION, CONDITIONS),
+        ("location", _LOCATION, None),
+    ):
+        if key in details:
+            continue
+        for match in pattern.finditer(text):
+            if any(taken[match.start():match.end()]):
+                continue
+            value = take(match)
+            if key == "transmission_type":
+                speeds = f"{match.group(1)}-speed " if match.group(1) else ""
+                value = speeds + names[_normalize(match.group(2))]
+            elif names:
+                value = names[_normalize(value)]
+            elif key == "location":
+                value = value.title() if value.islower() else value
+            details[key] = value
+            break
+
+    details.update(_match_make_model(text, taken))
+
+    unparsed = [
+        m.group(0) for m in _WORD.finditer(text)
+        if not any(taken[m.start():m.end()]) and m.group(0).lower() not in FILLER_WORDS
+    ]
+    score = sum(weight for key, weight in FIELD_WEIGHTS.items() if key in details)
+    confidence = max(0.0, min(1.0, score) - UNPARSED_WORD_PENALTY * len(unparsed))
+
+    # Same key order as the extraction prompt, so both paths look alike
+    ordered = {key: details[key] for key in (
+        "make", "model", "year", "engine_details", "location", "transmission_type",
+        "fuel_type", "mileage/odometer_reading", "condition"
+    ) if key in details}
+    return ExtractionResult(details=ordered, confidence=round(confidence, 3), unparsed=unparsed)
@@ -0,0 +1,430 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from backend.utils.canonical import resolve_currency_region
+
+# Currency symbol and rough USD exchange rate per region, matching the price prompt
+REGION_CURRENCIES = {
+    "USD": ("$", 1.0),
+    "CAD": ("C$", 1.35),
+    "AUD": ("A$", 1.5),
+    "EUR": ("€", 0.92),
+    "GBP": ("£", 0.79),
+    "INR": ("₹", 83.0),
+    "JPY": ("¥", 150.0),
+}
+
+CONDITION_FACTORS = {"excellent": 1.08, "very good": 1.04, "good": 1.0, "fair": 0.88, "poor": 0.72}
+
+CATEGORIES = [
+    "Performance and Engine Specifications",
+    "Fuel Efficiency and Running Costs",
+    "Features and Technology",
+    "Safety and Reliability",
+    "Resale Value",
+    "Overall Value for Money",
+]
+
+_FIELD = re.compile(r"(?:^|(?<=\s))(Vehicle|Make|Model|Year|Mileage|Location|Condition):[ \t]*(.+?)[ \t]*$", re.MULTILINE)
+_NUMBER = re.compile(r"\d[\d,]*")
+
+# Latency samples are random, but reproducible for a given FAKE_LLM_SEED
+_latency_rng = random.Random()
+
+# Recent prompts per model, standing in for the provider's prefix cache
+_recent_prompts: dict = {}
+
+
+def seed_latency(seed: int) -> None:
+    _latency_rng.seed(seed)
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _cached_prefix_tokens(model: str, prompt: str, min_tokens: int) -> int:
+    """Tokens of ``prompt`` a provider prefix cache would serve, then remember the prompt.
+
+    Like OpenAI: only prompts of at least ``min_tokens`` are cached, and the
+    reusable prefix is counted in 128-token steps from ``min_tokens`` on.
+    """
+    recent: Deque[str] = _recent_prompts.setdefault(model, deque(maxlen=256))
+    shared = max((len(os.path.commonprefix([prompt, previous])) for previous in recent), default=0)
+    recent.append(prompt)
+
+    prompt_tokens, shared_tokens = _approx_tokens(prompt), shared // 4
+    if prompt_tokens < min_tokens or shared_tokens < min_tokens:
+        return 0
+    return min_tokens + (shared_tokens - min_tokens) // 128 * 128
+
+
+def _prompt_rng(prompt: str) -> random.Random:
+    """Deterministic RNG per prompt so identical requests get identical answers"""
+    digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def _fields(block: str) -> dict:
+    return {name.lower(): value for name, value in _FIELD.findall(block)}
+
+
+def _car_name(fields: dict, fallback: str) -> str:
+    name = fields.get("vehicle") or " ".join(filter(None, [fields.get("make"), fields.get("model")]))
+    year = fields.get("year")
+    if name and year:
+        return f"{name} {year}"
+    return name or fallback
+
+
+def _round_amount(symbol: str, amount: float) -> int:
+    step = 10000 if symbol in ("₹", "¥") else 100
+    return int(round(amount / step) * step)
+
+
+def _format_amount(symbol: str, amount: float) -> str:
+    return f"{symbol}{_round_amount(symbol, amount):,}"
+
+
+def _appraise(prompt: str):
+    """Deterministic (rng, fields, symbol, age, mileage, value) for a price prompt"""
+    rng = _prompt_rng(prompt)
+    fields = _fields(prompt)
+    symbol, rate = REGION_CURRENCIES.get(resolve_currency_region(fields.get("location")), ("$", 1.0))
+
+    year_match = _NUMBER.search(fields.get("year", ""))
+    age = max(0, 2025 - int(year_match.group(0).replace(",", ""))) if year_match else 5
+    mileage_match = _NUMBER.search(fields.get("mileage", ""))
+    mileage = int(mileage_match.group(0).replace(",", "")) if mileage_match else 12000 * age
+
+    # The vehicle sets the base value, so appraisals of one model agree up to
+    # age, mileage, condition and a little per-listing noise
+    vehicle = fields.get("vehicle", "").strip().lower()
+    base = random.Random(vehicle).uniform(18000, 60000) if vehicle else rng.uniform(22000, 55000)
+    condition = CONDITION_FACTORS.get(fields.get("condition", "").strip().lower(), 1.0)
+    value = base * rng.uniform(0.95, 1.05) * (0.88 ** age) * max(0.5, 1 - mileage / 400000) * condition * rate
+    return rng, fields, symbol, age, mileage, value
+
+
+def fake_price_response(prompt: str) -> str:
+    """Generate a response in the CAR_PRICE_ESTIMATION_PROMPT format"""
+    rng, fields, symbol, age, mileage, value = _appraise(prompt)
+    low, high = value * 0.92, value * 1.08
+    name = fields.get("vehicle", "this vehicle")
+
+    return f"""**ESTIMATED PRICE RANGE:**
+Minimum Value: {_format_amount(symbol, low)}
+Maximum Value: {_format_amount(symbol, high)}
+Most Likely Price: {_format_amount(symbol, value)}
+
+**MARKET TRENDS ANALYSIS:**
+• Current market demand for the {name} is {rng.choice(["steady", "strong", "softening"])} in this region.
+• Seasonal pricing factors: spring and early summer typically lift used car prices by 3-5%.
+• Supply availability in local market is {rng.choice(["moderate", "tight", "plentiful"])}.
+
+**DEMAND AND SUPPLY FACTORS:**
+• Market competition analysis: several comparable listings keep prices competitive.
+• Regional availability impact: availability is in line with national averages.
+• Buyer demand trends favour well-maintained, fuel-efficient vehicles.
+
+**DEPRECIATION ASSESSMENT:**
+• Age-related value impact: at {age} years old the vehicle has passed its steepest depreciation.
+• Mileage depreciation effect: {mileage:,} on the odometer is {"below" if mileage < 12000 * age else "around"} average for its age.
+• Future value projection: expect a further 8-12% decline over the next year.
+
+**LOCATION AND CURRENCY FACTORS:**
+• Local market pricing patterns are consistent with regional averages.
+• Regional economic factors are stable.
+• Currency-specific considerations: prices are quoted in {symbol}.
+
+**CONDITION AND FEATURE IMPACT:**
+• Vehicle condition assessment: {fields.get("condition", "Good")} condition supports a mid-range price.
+• Feature premium analysis: optional equipment adds modest value.
+• Maintenance history effect: documented service history adds buyer confidence.
+
+**KEY PRICING FACTORS:**
+- Mileage Impact: The odometer reading is typical for the model year and keeps the value near the market median.
+- Condition Assessment: The reported condition supports pricing in the middle of the range.
+- Market Demand: Demand for this model is healthy, which keeps resale values firm.
+- Location Factors: Local pricing is consistent with regional averages for this segment.
+- Age/Depreciation: The car has already absorbed most of its early depreciation.
+- Features Premium: Higher trim features add a small premium over base models.
+
+**RECOMMENDATIONS:**
+• Best time to sell/buy: spring offers the strongest demand.
+• Optimal pricing strategy: list near {_format_amount(symbol, high)} and accept offers close to {_format_amount(symbol, value)}.
+• Negotiation tips: have service records ready and expect a 5% negotiation margin."""
+
+
+def fake_price_json_response(prompt: str) -> str:
+    """Generate a response in the CAR_PRICE_ESTIMATION_JSON_PROMPT schema"""
+    rng, fields, symbol, age, mileage, value = _appraise(prompt)
+    output = {
+        "currency": symbol,
+        "min_price": _round_amount(symbol, value * 0.92),
+        "max_price": _round_amount(symbol, value * 1.08),
+        "most_likely_price": _round_amount(symbol, value),
+        "factors": {
+            "mileage": f"{mileage:,} on the odometer is typical for a {age}-year-old car.",
+            "condition": f"{fields.get('condition', 'Good')} condition supports a mid-range price.",
+            "market_demand": f"Demand is {rng.choice(['steady', 'strong', 'softening'])} for this model.",
+            "location": "Local pricing is consistent with regional averages.",
+            "depreciation": "The car has already absorbed most of its early depreciation.",
+            "features": "Optional equipment adds a small premium."
+        }
+    }
+    if "- analysis:" in prompt:
+        output["analysis"] = {
+            "market_trends": ["Prices for this segment are stable.", "Spring lifts demand by 3-5%."],
+            "demand_supply": ["Several comparable listings keep prices competitive."],
+            "depreciation": ["Expect a further 8-12% decline over the next year."],
+            "location": [f"Prices are quoted in {symbol}."],
+            "condition": ["Documented service history adds buyer confidence."],
+            "recommendations": ["List near the top of the range and negotiate down."]
+        }
+    return json.dumps(output, ensure_ascii=False)
+
+
+def fake_comparison_json_response(prompt: str) -> str:
+    """Generate a response in the CAR_COMPARISON_JSON_PROMPT schema"""
+    rng = _prompt_rng(prompt)
+    car1_block, _, car2_block = prompt.partition("Car 2 Details:")
+    car1 = _car_name(_fields(car1_block.split("Car 1 Details:")[-1]), "First car")
+    car2 = _car_name(_fields(car2_block), "Second car")
+    with_points = "car1_points" in prompt
+    listed = re.search(r"per category key \(([\w, ]+)\)", prompt)
+    keys = listed.group(1).split(", ") if listed else ["performance", "fuel_efficiency", "features", "safety", "resale", "value"]
+
+    categories = []
+    for key in keys:
+        verdict = {"category": key, "winner": rng.choice([car1, car2]), "reason": f"edges ahead on {key.replace('_', ' ')}"}
+        if with_points:
+            verdict["car1_points"] = [f"{rng.choice(['Solid', 'Competitive', 'Class-leading'])} {key.replace('_', ' ')} for its segment"]
+            verdict["car2_points"] = [f"{rng.choice(['Solid', 'Competitive', 'Class-leading'])} {key.replace('_', ' ')} for its segment"]
+        categories.append(verdict)
+
+    output = {"car1_name": car1, "car2_name": car2, "categories": categories}
+    if "- recommendation:" not in prompt:
+        return json.dumps(output)
+    return json.dumps({
+        **output,
+        "recommendation": {
+            "family_use": f"{rng.choice([car1, car2])} - more practical everyday space",
+            "daily_commuting": f"{rng.choice([car1, car2])} - lower running costs",
+            "performance": f"{rng.choice([car1, car2])} - more engaging to drive",
+            "budget": f"{rng.choice([car1, car2])} - better value for money",
+            "overall_winner": f"{rng.choice([car1, car2])} - the more complete package for most buyers"
+        }
+    })
+
+
+def fake_comparison_response(prompt: str) -> str:
+    """Generate a response in the CAR_COMPARISON_PROMPT format"""
+    rng = _prompt_rng(prompt)
+    car1_block, _, car2_block = prompt.partition("Car 2 Details:")
+    car1 = _car_name(_fields(car1_block.split("Car 1 Details:")[-1]), "First car")
+    car2 = _car_name(_fields(car2_block.split("Provide a detailed comparison")[0]), "Second car")
+
+    sections = []
+    for number, category in enumerate(CATEGORIES, 1):
+        # Only the sections the prompt asks for
+        if f"**{number}. {category}**" not in prompt:
+            continue
+        winner = rng.choice([car1, car2])
+        sections.append(f"""**{number}. {category}**
+
+{car1}:
+- {rng.choice(["Solid", "Competitive", "Class-leading"])} {category.split()[0].lower()} for its segment
+- {rng.choice(["Well-rounded", "Practical", "Refined"])} package overall
+
+{car2}:
+- {rng.choice(["Solid", "Competitive", "Class-leading"])} {category.split()[0].lower()} for its segment
+- {rng.choice(["Well-rounded", "Practical", "Refined"])} package overall
+
+Winner: {winner} - edges ahead on {category.split()[0].lower()}
+""")
+
+    if "**Final Recommendation**" not in prompt:
+        return "\n".join(sections)
+    overall = rng.choice([car1, car2])
+    return "\n".join(sections) + f"""
+**Final Recommendation**
+
+Family Use: {rng.choice([car1, car2])} - more practical everyday space
+Daily Commuting: {rng.choice([car1, car2])} - lower running costs
+Performance: {rng.choice([car1, car2])} - more engaging to drive
+Budget: {rng.choice([car1, car2])} - better value for money
+
+Overall Winner: {overall} - the more complete package for most buyers"""
+
+
+def fake_profile_response(prompt: str) -> str:
+    """Generate a response in the CAR_PROFILE_PROMPT format"""
+    rng = _prompt_rng(prompt)
+    details = prompt.split("Car Details:", 1)[-1].split("Use exactly this format", 1)[0]
+    car = _car_name(_fields(details), "This car")
+
+    sections = [f"Vehicle: {car}"]
+    for category in CATEGORIES:
+        sections.append(f"""**{category}**
+- {rng.choice(["Solid", "Competitive", "Class-leading"])} {category.split()[0].lower()} for its segment
+- {rng.choice(["Well-rounded", "Practical", "Refined"])} package overall
+Score: {rng.randint(5, 9)}""")
+    return "\n\n".join(sections)
+
+
+def fake_merge_response(prompt: str) -> str:
+    """Generate a response in the CAR_COMPARISON_MERGE_PROMPT format"""
+    rng = _prompt_rng(prompt)
+    car1_block, _, car2_block = prompt.partition("Car 2 Profile:")
+    car1 = _car_name(_fields(car1_block.split("Car 1 Profile:")[-1]), "First car")
+    car2 = _car_name(_fields(car2_block.split("Respond in exactly this format")[0]), "Second car")
+
+    return f"""**Final Recommendation**
+
+Family Use: {rng.choice([car1, car2])} - more practical everyday space
+Daily Commuting: {rng.choice([car1, car2])} - lower running costs
+Performance: {rng.choice([car1, car2])} - more engaging to drive
+Budget: {rng.choice([car1, car2])} - better value for money
+
+Overall Winner: {rng.choice([car1, car2])} - the more complete package for most buyers"""
+
+
+def fake_extraction_response(prompt: str) -> str:
+    """Generate a response in the CAR_DETAILS_EXTRACTION_PROMPT format"""
+    description = prompt.split("Description:", 1)[-1].split("Extract and return", 1)[0].strip()
+    words = description.split()
+    year = next((word for word in words if re.fullmatch(r"(19|20)\d{2}", word)), "Not specified")
+    after_year = words[words.index(year) + 1:] if year in words else words
+    make = after_year[0] if after_year else "Not specified"
+    model = after_year[1] if len(after_year) > 1 else "Not specified"
+    mileage = re.search(r"([\d,]+)\s*(miles|km|kilometers)", description, re.IGNORECASE)
+
+    return f"""Make: {make}
+Model: {model}
+Year: {year}
+Engine details: Not specified
+Location: Not specified
+Transmission type: {"Automatic" if "auto" in description.lower() else "Not specified"}
+Fuel type: Not specified
+Mileage/Odometer reading: {mileage.group(0) if mileage else "Not specified"}
+Key features: Not specified
+Condition: Not specified"""
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic local stand-in for ChatOpenAI.
+
+    Answers price, comparison, profile and extraction prompts with realistic text in
+    the formats the prompts ask for, after a simulated time to first token
+    (drawn from the configured latency distribution) plus generation time at
+    ``tokens_per_second``. Identical prompts always get identical text.
+    """
+
+    model_name: str = "fake-gpt-4o"
+    max_tokens: int = 2000
+    latency_ms: float = 800.0
+    latency_sigma: float = 0.5
+    latency_distribution: str = "lognormal"
+    tokens_per_second: float = 80.0
+    prefix_cache_min_tokens: int = 1024
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _respond(self, messages: List[BaseMessage]) -> str:
+        prompt = messages[-1].content if messages else ""
+        if "Respond with a JSON object" in prompt:
+            if "Car 1 Details" in prompt:
+                return fake_comparison_json_response(prompt)
+            return fake_price_json_response(prompt)
+        if "ESTIMATED PRICE RANGE" in prompt:
+            return fake_price_response(prompt)
+        if "Car 1 Details" in prompt:
+            return fake_comparison_response(prompt)
+        if "Write a concise standalone profile" in prompt:
+            return fake_profile_response(prompt)
+        if "write ONLY the final recommendation" in prompt:
+            return fake_merge_response(prompt)
+        if "Extract structured car information" in prompt:
+            return fake_extraction_response(prompt)
+        return "I can only help with car comparisons, price estimates and detail extraction."
+
+    def _first_token_delay(self) -> float:
+        median = self.latency_ms / 1000
+        if self.latency_distribution == "fixed":
+            return median
+        if self.latency_distribution == "exponential":
+            return _latency_rng.expovariate(1 / median) if median > 0 else 0.0
+        return _latency_rng.lognormvariate(0, self.latency_sigma) * median
+
+    def _generation_delay(self, text: str) -> float:
+        if self.tokens_per_second <= 0:
+            return 0.0
+        return _approx_tokens(text) / self.tokens_per_second
+
+    def _result(self, messages: List[BaseMessage], content: str) -> ChatResult:
+        prompt = "".join(str(message.content) for message in messages)
+        prompt_tokens = _approx_tokens(prompt)
+        cached_tokens = _cached_prefix_tokens(self.model_name, prompt, self.prefix_cache_min_tokens)
+        completion_tokens = _approx_tokens(content)
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=content), generation_info={"finish_reason": "stop"})],
+            llm_output={
+                "token_usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                    "prompt_tokens_details": {"cached_tokens": cached_tokens}
+                },
+                "model_name": self.model_name
+            }
+        )
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        content = self._respond(messages)
+        time.sleep(self._first_token_delay() + self._generation_delay(content))
+        return self._result(messages, content)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        content = self._respond(messages)
+        await asyncio.sleep(self._first_token_delay() + self._generation_delay(content))
+        return self._result(messages, content)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        content = self._respond(messages)
+        time.sleep(self._first_token_delay())
+        for piece in re.split(r"(?<=\s)", content):
+            time.sleep(self._generation_delay(piece))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        content = self._respond(messages)
+        await asyncio.sleep(self._first_token_delay())
+
+        # Sleep in batches of at least 10ms rather than once per word
+        pending = 0.0
+        for piece in re.split(r"(?<=\s)", content):
+            pending += self._generation_delay(piece)
+            if pending >= 0.01:
+                await asyncio.sleep(pending)
+                pending = 0.0
+            if run_manager:
+                await run_manager.on_llm_new_token(piece)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
@@ -0,0 +1,92 @@
+import logging
+import threading
+from typing import Optional
+
+import httpx
+
+from backend.utils.metrics import LLM_POOL_CONNECTIONS
+from backend.utils.settings import (
+    LLM_HTTP2,
+    LLM_POOL_KEEPALIVE_EXPIRY,
+    LLM_POOL_MAX_CONNECTIONS,
+    LLM_POOL_MAX_KEEPALIVE,
+    LLM_TIMEOUT_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+# One keep-alive connection pool per worker, shared by every chat model, so
+# bursts reuse warm TLS connections instead of each client opening its own
+_client: Optional[httpx.AsyncClient] = None
+_transport: Optional[httpx.AsyncHTTPTransport] = None
+_http2 = False
+_lock = threading.Lock()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the worker's shared HTTP client for LLM providers, creating it on first use"""
+    global _client, _transport, _http2
+    with _lock:
+        if _client is None:
+            _http2 = LLM_HTTP2 and _http2_available()
+            if LLM_HTTP2 and not _http2:
+                logger.warning("LLM_HTTP2 is enabled but the h2 package is missing; using HTTP/1.1")
+
+            _transport = httpx.AsyncHTTPTransport(
+                http2=_http2,
+                limits=httpx.Limits(
+                    max_connections=LLM_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=LLM_POOL_KEEPALIVE_EXPIRY
+                )
+            )
+            _client = httpx.AsyncClient(
+                transport=_transport,
+                timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=10.0)
+            )
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared pool (on shutdown)"""
+    global _client, _transport
+    if _client is not None:
+        await _client.aclose()
+        _client = _transport = None
+
+
+def pool_stats() -> dict:
+    """Connection counts of the shared pool; saturation is active / max_connections"""
+    if _transport is None:
+        return {"enabled": False}
+
+    # httpcore does not expose the wait queue publicly; read it defensively
+    pool = _transport._pool
+    connections = pool.connections
+    idle = sum(1 for connection in connections if connection.is_idle())
+    active = len(connections) - idle
+    queued = sum(1 for request in getattr(pool, "_requests", []) if request.is_queued())
+
+    LLM_POOL_CONNECTIONS.labels("active").set(active)
+    LLM_POOL_CONNECTIONS.labels("idle").set(idle)
+    LLM_POOL_CONNECTIONS.labels("queued").set(queued)
+
+    return {
+        "enabled": True,
+        "http2": _http2,
+        "max_connections": LLM_POOL_MAX_CONNECTIONS,
+        "max_keepalive": LLM_POOL_MAX_KEEPALIVE,
+        "connections": len(connections),
+        "active": active,
+        "idle": idle,
+        "queued": queued,
+        "saturation": round(active / LLM_POOL_MAX_CONNECTIONS, 4) if LLM_POOL_MAX_CONNECTIONS else 0.0
+    }
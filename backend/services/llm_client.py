@@ -0,0 +1,335 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from backend.utils.settings import (
+    FAKE_LLM_LATENCY_DISTRIBUTION,
+    FAKE_LLM_LATENCY_MS,
+    FAKE_LLM_LATENCY_SIGMA,
+    FAKE_LLM_PREFIX_CACHE_MIN_TOKENS,
+    FAKE_LLM_SEED,
+    FAKE_LLM_TOKENS_PER_SECOND,
+    LLM_DEADLINE_SECONDS,
+    LLM_HEDGE_MAX_RATIO,
+    LLM_HEDGE_MIN_SAMPLES,
+    LLM_HEDGE_PERCENTILE,
+    LLM_HEDGING,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_MODEL_PARAMS,
+    LLM_PROVIDER,
+    LLM_RETRY_BASE_SECONDS,
+    LLM_RETRY_MAX_SECONDS,
+    LLM_TIMEOUT_SECONDS,
+    OPENAI_API_KEY
+)
+from backend.services.admission import Overloaded
+from backend.utils.metrics import (
+    LLM_CALLS,
+    LLM_HEDGES,
+    LLM_IN_FLIGHT,
+    LLM_RETRIES,
+    record_token_usage,
+    stage_timer
+)
+
+# Caps the number of LLM calls in flight across all services in this worker
+_llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+# Chat models are shared by every service asking for the same parameters
+_chat_models: Dict[Tuple, object] = {}
+_openai_clients = None
+_lock = threading.Lock()
+
+# Model parameters that configure the OpenAI client rather than the request
+_CLIENT_OPTIONS = ("timeout", "max_retries")
+
+
+def _shared_openai_clients():
+    """Sync and async OpenAI clients on the worker's shared connection pool"""
+    global _openai_clients
+    if _openai_clients is None:
+        import openai
+        from backend.services.http_pool import get_http_client
+        _openai_clients = (
+            # ainvoke_llm retries with jittered backoff within its deadline, so the SDK does not
+            openai.OpenAI(api_key=OPENAI_API_KEY, timeout=LLM_TIMEOUT_SECONDS, max_retries=0),
+            openai.AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=get_http_client(), max_retries=0)
+        )
+    return _openai_clients
+
+
+def create_chat_model(temperature: float, max_tokens: int, model: str = "gpt-4o"):
+    """Return the chat model for these parameters according to LLM_PROVIDER.
+    
+    Models are built once per parameter set and shared between services;
+    OpenAI models all draw from the same pooled HTTP client.
+    """
+    key = (LLM_PROVIDER, model, temperature, max_tokens)
+    with _lock:
+        if key not in _chat_models:
+            _chat_models[key] = _build_chat_model(temperature, max_tokens, model)
+        return _chat_models[key]
+
+
+def _build_chat_model(temperature: float, max_tokens: int, model: str):
+    if LLM_PROVIDER == "fake":
+        from backend.services.fake_llm import FakeChatModel, seed_latency
+        seed_latency(FAKE_LLM_SEED)
+        return FakeChatModel(
+            model_name=f"fake-{model}",
+            max_tokens=max_tokens,
+            latency_ms=FAKE_LLM_LATENCY_MS,
+            latency_sigma=FAKE_LLM_LATENCY_SIGMA,
+            latency_distribution=FAKE_LLM_LATENCY_DISTRIBUTION,
+            tokens_per_second=FAKE_LLM_TOKENS_PER_SECOND,
+            prefix_cache_min_tokens=FAKE_LLM_PREFIX_CACHE_MIN_TOKENS
+        )
+
+    # Imported here so startup and the fake provider never load the OpenAI SDK
+    from langchain_openai import ChatOpenAI
+    params = dict(LLM_MODEL_PARAMS.get(model, {}))
+    client_options = {name: params.pop(name) for name in _CLIENT_OPTIONS if name in params}
+    sync_client, async_client = _shared_openai_clients()
+    if client_options:
+        # with_options copies the client but keeps its connection pool
+        sync_client = sync_client.with_options(**client_options)
+        async_client = async_client.with_options(**client_options)
+    params.update(temperature=temperature, max_tokens=max_tokens)
+    return ChatOpenAI(
+        model=model,
+        api_key=OPENAI_API_KEY,
+        client=sync_client.chat.completions,
+        async_client=async_client.chat.completions,
+        **params
+    )
+
+
+class _UsageCollector(AsyncCallbackHandler):
+    """Captures the provider's llm_output (token usage, model name) for one call"""
+
+    def __init__(self):
+        self.llm_output = {}
+
+    async def on_llm_end(self, response, **kwargs) -> None:
+        self.llm_output = response.llm_output or {}
+
+
+def _raise_if_rate_limited(error: Exception, endpoint: str) -> None:
+    """Turn a provider 429 into Overloaded, so clients get a 503 with Retry-After instead of a 500"""
+    if getattr(error, "status_code", None) != 429:
+        return
+    LLM_CALLS.labels(endpoint, "rate_limited").inc()
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        seconds = float(retry_after) if retry_after else 5.0
+    except ValueError:
+        seconds = 5.0
+    raise Overloaded(503, seconds, "LLM provider rate limit reached") from error
+
+
+class _LatencyTracker:
+    """Recent successful call durations of one endpoint, for picking the hedge delay"""
+
+    def __init__(self, window: int = 500):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.hedges = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """The configured percentile of recent latencies, or None while there is too little data"""
+        if len(self.samples) < LLM_HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * LLM_HEDGE_PERCENTILE / 100))]
+
+    def may_hedge(self) -> bool:
+        # Keeps hedges to a small share of calls, so they trim the tail without doubling spend
+        return self.hedges < LLM_HEDGE_MAX_RATIO * self.calls
+
+
+_latency: Dict[str, _LatencyTracker] = {}
+
+
+def _is_transient(error: BaseException) -> bool:
+    """Timeouts, connection failures and 5xx/408/409 responses are worth retrying"""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    if any(cls.__name__ in ("APIConnectionError", "TransportError") for cls in type(error).__mro__):
+        return True
+    status = getattr(error, "status_code", None)
+    return status in (408, 409) or (status is not None and status >= 500)
+
+
+async def _invoke_once(llm, messages: List, endpoint: str, timeout: float):
+    """One provider call: concurrency slot, timeout, outcome and usage metrics"""
+    collector = _UsageCollector()
+
+    with stage_timer(endpoint, "llm_queue"):
+        await _llm_semaphore.acquire()
+    try:
+        LLM_IN_FLIGHT.inc()
+        started = time.monotonic()
+        with stage_timer(endpoint, "llm"):
+            response = await asyncio.wait_for(
+                llm.ainvoke(messages, config={"callbacks": [collector]}),
+                timeout=timeout
+            )
+    except asyncio.TimeoutError:
+        LLM_CALLS.labels(endpoint, "timeout").inc()
+        raise
+    except asyncio.CancelledError:
+        # The losing side of a hedge, or the client went away
+        LLM_CALLS.labels(endpoint, "cancelled").inc()
+        raise
+    except Exception as e:
+        _raise_if_rate_limited(e, endpoint)
+        LLM_CALLS.labels(endpoint, "error").inc()
+        raise
+    finally:
+        LLM_IN_FLIGHT.dec()
+        _llm_semaphore.release()
+
+    _latency.setdefault(endpoint, _LatencyTracker()).samples.append(time.monotonic() - started)
+    LLM_CALLS.labels(endpoint, "ok").inc()
+    record_token_usage(
+        endpoint,
+        collector.llm_output.get("model_name") or getattr(llm, "model_name", None),
+        collector.llm_output.get("token_usage")
+    )
+    return response
+
+
+async def _invoke_hedged(llm, messages: List, endpoint: str, timeout: float):
+    """Call once; if no answer by the hedge delay, race a second identical call"""
+    tracker = _latency.setdefault(endpoint, _LatencyTracker())
+    tracker.calls += 1
+    delay = tracker.hedge_delay() if LLM_HEDGING else None
+    if delay is None or delay >= timeout:
+        return await _invoke_once(llm, messages, endpoint, timeout)
+
+    primary = asyncio.ensure_future(_invoke_once(llm, messages, endpoint, timeout))
+    try:
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not tracker.may_hedge():
+            return await primary
+
+        tracker.hedges += 1
+        LLM_HEDGES.labels(endpoint, "fired").inc()
+        hedge = asyncio.ensure_future(_invoke_once(llm, messages, endpoint, timeout - delay))
+        pending = {primary, hedge}
+        errors = []
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        LLM_HEDGES.labels(endpoint, "won" if task is hedge else "lost").inc()
+                        return task.result()
+                    errors.append(task.exception())
+            # Both failed; report the first failure
+            raise errors[0]
+        finally:
+            for task in pending:
+                task.cancel()
+    finally:
+        if not primary.done():
+            primary.cancel()
+
+
+async def ainvoke_llm(llm, messages: List, endpoint: str = "unknown", timeout: Optional[float] = None):
+    """Invoke a chat model without blocking the event loop.
+
+    Each attempt waits for a free concurrency slot and runs with a per-call
+    timeout (``LLM_TIMEOUT_SECONDS`` unless overridden). Attempts slower than
+    the endpoint's recent p95 are hedged with a second call when
+    ``LLM_HEDGING`` is on, and transient failures are retried with jittered
+    exponential backoff, all within ``LLM_DEADLINE_SECONDS``. A blown
+    deadline raises Overloaded (504). Queue and call time, outcome and token
+    usage are recorded under ``endpoint``.
+    """
+    per_call = timeout if timeout is not None else LLM_TIMEOUT_SECONDS
+    deadline = time.monotonic() + max(per_call, LLM_DEADLINE_SECONDS)
+    attempt = 0
+
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise Overloaded(504, per_call, "LLM call exceeded its deadline")
+        try:
+            return await _invoke_hedged(llm, messages, endpoint, min(per_call, remaining))
+        except Overloaded:
+            raise
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not _is_transient(e):
+                if isinstance(e, asyncio.TimeoutError):
+                    raise Overloaded(504, per_call, "LLM call exceeded its deadline") from e
+                raise
+
+            attempt += 1
+            # Full jitter: a random wait up to the exponential cap spreads retries out
+            backoff = random.uniform(0, min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** attempt))
+            if time.monotonic() + backoff >= deadline:
+                if isinstance(e, asyncio.TimeoutError):
+                    raise Overloaded(504, per_call, "LLM call exceeded its deadline") from e
+                raise
+            LLM_RETRIES.labels(endpoint).inc()
+            await asyncio.sleep(backoff)
+
+
+def latency_stats() -> dict:
+    """Hedge delay and hedge counts per endpoint"""
+    return {
+        endpoint: {
+            "samples": len(tracker.samples),
+            "hedge_delay": tracker.hedge_delay(),
+            "calls": tracker.calls,
+            "hedges": tracker.hedges
+        }
+        for endpoint, tracker in _latency.items()
+    }
+
+
+async def astream_llm(llm, messages: List, endpoint: str = "unknown", timeout: Optional[float] = None):
+    """Stream text chunks from a chat model without blocking the event loop.
+
+    Holds a concurrency slot for the whole stream; the timeout applies to the
+    wait for each chunk, so long generations are fine as long as tokens keep
+    arriving.
+    """
+    chunk_timeout = timeout if timeout is not None else LLM_TIMEOUT_SECONDS
+
+    with stage_timer(endpoint, "llm_queue"):
+        await _llm_semaphore.acquire()
+    try:
+        LLM_IN_FLIGHT.inc()
+        with stage_timer(endpoint, "llm"):
+            stream = llm.astream(messages).__aiter__()
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), timeout=chunk_timeout)
+                    except StopAsyncIteration:
+                        break
+                    if chunk.content:
+                        yield chunk.content
+            finally:
+                await stream.aclose()
+    except asyncio.TimeoutError:
+        LLM_CALLS.labels(endpoint, "timeout").inc()
+        raise
+    except Exception as e:
+        _raise_if_rate_limited(e, endpoint)
+        LLM_CALLS.labels(endpoint, "error").inc()
+        raise
+    else:
+        LLM_CALLS.labels(endpoint, "ok").inc()
+    finally:
+        LLM_IN_FLIGHT.dec()
+        _llm_semaphore.release()
@@ -0,0 +1,189 @@
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from backend.services.llm_client import ainvoke_llm, create_chat_model
+from backend.utils.metrics import ROUTER_DECISIONS, ROUTER_ESCALATIONS, TIER_SECONDS
+from backend.utils.settings import (
+    MODEL_TIER_MAX_TOKENS,
+    MODEL_TIERS,
+    ROUTER_ESCALATION_THRESHOLD,
+    ROUTER_PROBE_RATIO,
+    ROUTER_WINDOW
+)
+
+# Tiers from cheapest to most capable, in the order MODEL_TIERS lists them
+TIER_ORDER: List[str] = list(MODEL_TIERS)
+
+# Budgets and tier caps say "small" for the cheapest tier and "large" for the most
+# capable; when MODEL_TIERS_JSON uses other names, they resolve by position
+_TIER_ALIASES = {"small": TIER_ORDER[0], "large": TIER_ORDER[-1]}
+
+
+def resolve_tier(name: str) -> str:
+    """The MODEL_TIERS name of a tier, raising ValueError for an unknown one"""
+    if name in MODEL_TIERS:
+        return name
+    if name in _TIER_ALIASES:
+        return _TIER_ALIASES[name]
+    raise ValueError(f"Unknown model tier {name!r}; MODEL_TIERS has {', '.join(TIER_ORDER)}")
+
+
+# Budgets are module constants, so a cap for an unknown tier fails at startup
+TIER_MAX_TOKENS: Dict[str, int] = {resolve_tier(tier): cap for tier, cap in MODEL_TIER_MAX_TOKENS.items()}
+
+
+@dataclass(frozen=True)
+class TaskBudget:
+    """What a service method needs from the model.
+
+    ``latency_seconds`` is the time the task can afford for its LLM call;
+    ``min_tier`` is the cheapest tier with acceptable quality (see
+    ``resolve_tier``); output is capped at ``max_tokens``, or lower where the
+    tier's own cap is lower. With ``escalate`` set, output the caller rejects
+    is regenerated on the next tier up. ``response_format`` is passed to the
+    provider, e.g. a JSON schema the output must follow.
+    """
+    latency_seconds: float
+    max_tokens: int
+    temperature: float
+    min_tier: str = TIER_ORDER[0]
+    escalate: bool = True
+    response_format: Optional[dict] = None
+
+    def __post_init__(self):
+        object.__setattr__(self, "min_tier", resolve_tier(self.min_tier))
+
+
+@dataclass
+class Route:
+    tier: str
+    model: str
+    max_tokens: int
+    reason: str
+
+
+class _TierStats:
+    """Recent latency and escalation history of one task on one tier"""
+
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=ROUTER_WINDOW)
+        self.escalated: Deque[bool] = deque(maxlen=ROUTER_WINDOW)
+
+    def p90(self) -> Optional[float]:
+        if len(self.latencies) < 10:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.9)]
+
+    def escalation_rate(self) -> float:
+        if len(self.escalated) < 10:
+            return 0.0
+        return sum(self.escalated) / len(self.escalated)
+
+
+class ModelRouter:
+    """Picks a model tier per call from the task's budget and recent history.
+
+    A task starts on the cheapest tier its budget allows. A tier is skipped
+    while its recent p90 latency for the task exceeds the latency budget, or
+    while most of its answers get escalated anyway (then calling it first
+    only adds latency). A small share of calls still probes skipped tiers so
+    the router notices when they recover.
+    """
+
+    def __init__(self):
+        self._stats: Dict[Tuple[str, str], _TierStats] = {}
+
+    def _tier_stats(self, task: str, tier: str) -> _TierStats:
+        return self._stats.setdefault((task, tier), _TierStats())
+
+    def _next_tier(self, tier: str) -> Optional[str]:
+        index = TIER_ORDER.index(tier)
+        return TIER_ORDER[index + 1] if index + 1 < len(TIER_ORDER) else None
+
+    def _route(self, tier: str, budget: TaskBudget, reason: str) -> Route:
+        cap = TIER_MAX_TOKENS.get(tier)
+        max_tokens = min(budget.max_tokens, cap) if cap else budget.max_tokens
+        return Route(tier=tier, model=MODEL_TIERS[tier], max_tokens=max_tokens, reason=reason)
+
+    def route(self, task: str, budget: TaskBudget) -> Route:
+        candidates = TIER_ORDER[TIER_ORDER.index(budget.min_tier):]
+        tier, reason = candidates[-1], "budget"
+
+        for candidate in candidates[:-1]:
+            stats = self._tier_stats(task, candidate)
+            p90 = stats.p90()
+            if p90 is not None and p90 > budget.latency_seconds:
+                skip = "latency"
+            elif stats.escalation_rate() > ROUTER_ESCALATION_THRESHOLD:
+                skip = "quality"
+            else:
+                tier, reason = candidate, "budget"
+                break
+
+            if random.random() < ROUTER_PROBE_RATIO:
+                tier, reason = candidate, "probe"
+                break
+            reason = skip
+
+        ROUTER_DECISIONS.labels(task, tier, reason).inc()
+        return self._route(tier, budget, reason)
+
+    def chat_model(self, task: str, budget: TaskBudget):
+        """Chat model for a call that cannot be checked or escalated (e.g. streaming)"""
+        route = self.route(task, budget)
+        return create_chat_model(budget.temperature, route.max_tokens, model=route.model)
+
+    async def invoke(self, task: str, budget: TaskBudget, messages: List,
+                     accept: Optional[Callable[[str], bool]] = None):
+        """Call the routed model; escalate once if ``accept`` rejects the output text"""
+        route = self.route(task, budget)
+        response = await self._call(task, route, budget, messages)
+
+        next_tier = self._next_tier(route.tier) if budget.escalate else None
+        if accept is None or next_tier is None:
+            return response
+
+        accepted = accept(response.content)
+        self._tier_stats(task, route.tier).escalated.append(not accepted)
+        if accepted:
+            return response
+
+        ROUTER_ESCALATIONS.labels(task, route.tier, next_tier).inc()
+        return await self._call(task, self._route(next_tier, budget, "escalation"), budget, messages)
+
+    async def _call(self, task: str, route: Route, budget: TaskBudget, messages: List):
+        tier = route.tier
+        llm = create_chat_model(budget.temperature, route.max_tokens, model=route.model)
+        if budget.response_format:
+            llm = llm.bind(response_format=budget.response_format)
+        started = time.monotonic()
+        response = await ainvoke_llm(llm, messages, endpoint=task)
+        elapsed = time.monotonic() - started
+        self._tier_stats(task, tier).latencies.append(elapsed)
+        TIER_SECONDS.labels(task, tier).observe(elapsed)
+        return response
+
+    def stats(self) -> dict:
+        return {
+            f"{task}:{tier}": {
+                "p90_seconds": stats.p90(),
+                "escalation_rate": round(stats.escalation_rate(), 4),
+                "samples": len(stats.latencies)
+            }
+            for (task, tier), stats in self._stats.items()
+        }
+
+
+_router: Optional[ModelRouter] = None
+
+
+def get_router() -> ModelRouter:
+    """The worker's shared router, so every service learns from the same history"""
+    global _router
+    if _router is None:
+        _router = ModelRouter()
+    return _router
@@ -0,0 +1,165 @@
+import hashlib
+import random
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from backend.utils.metrics import NEAR_DUP_SAVED
+from backend.utils.settings import (
+    NEAR_DUP_MAX_ENTRIES,
+    NEAR_DUP_PERMUTATIONS,
+    NEAR_DUP_THRESHOLD
+)
+
+# Anything but letters and digits separates words, so punctuation, emoji and
+# spacing never change a fingerprint
+_NON_WORD = re.compile(r"[^\w]+|_")
+
+CarKey = Tuple[str, ...]
+
+
+def shingles(text: str) -> Set[str]:
+    """Word bigrams of a description (single words when it has only one)"""
+    words = _NON_WORD.sub(" ", text.casefold()).split()
+    if len(words) < 2:
+        return set(words)
+    return {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def _shingle_hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _band_rows(permutations: int, threshold: float) -> int:
+    """Rows per LSH band: the most selective split that still finds 95% of pairs at the threshold"""
+    best = 1
+    for rows in range(1, permutations + 1):
+        if permutations % rows:
+            continue
+        bands = permutations // rows
+        if 1 - (1 - threshold ** rows) ** bands >= 0.95:
+            best = rows
+    return best
+
+
+class NearDuplicateIndex:
+    """Maps near-identical descriptions of the same vehicle spec to one cache key.
+
+    Descriptions are fingerprinted with MinHash over word bigrams and
+    indexed with LSH bands. The first description seen for a spec becomes
+    the representative; later ones whose estimated Jaccard similarity to it
+    reaches ``threshold`` reuse its key. Only the description may differ:
+    the rest of the canonical car key (make, model, year, mileage bucket,
+    ...) must match exactly.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD, permutations: int = NEAR_DUP_PERMUTATIONS,
+                 max_entries: int = NEAR_DUP_MAX_ENTRIES):
+        self.threshold = threshold
+        self.permutations = permutations
+        self.max_entries = max_entries
+        self.rows = _band_rows(permutations, threshold)
+        # MinHash permutations as XOR masks over one 64-bit hash per shingle
+        rng = random.Random(0x5EED)
+        self._masks = [rng.getrandbits(64) for _ in range(permutations)]
+
+        self._aliases: "OrderedDict[CarKey, CarKey]" = OrderedDict()
+        self._signatures: "OrderedDict[CarKey, Tuple[int, ...]]" = OrderedDict()
+        self._buckets: Dict[tuple, List[CarKey]] = {}
+        self.matches = 0
+        self.saved: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return 0 < self.threshold < 1 and self.max_entries > 0
+
+    def signature(self, text: str) -> Optional[Tuple[int, ...]]:
+        hashes = [_shingle_hash(shingle) for shingle in shingles(text)]
+        if not hashes:
+            return None
+        return tuple(min(h ^ mask for h in hashes) for mask in self._masks)
+
+    def _bands(self, spec: CarKey, signature: Tuple[int, ...]) -> List[tuple]:
+        rows = self.rows
+        return [(spec, start, signature[start:start + rows]) for start in range(0, self.permutations, rows)]
+
+    def canonical_key(self, key: CarKey) -> CarKey:
+        """The cache key for a canonical car key whose last field is the description"""
+        if not self.enabled:
+            return key
+        alias = self._aliases.get(key)
+        if alias is not None:
+            self._aliases.move_to_end(key)
+            return alias
+
+        spec, description = key[:-1], key[-1]
+        signature = self.signature(description)
+        target = key
+        if signature is not None:
+            target = self._find(spec, signature) or key
+            if target is key:
+                self._add(key, signature)
+            else:
+                self.matches += 1
+
+        self._aliases[key] = target
+        if len(self._aliases) > self.max_entries:
+            self._aliases.popitem(last=False)
+        return target
+
+    def _find(self, spec: CarKey, signature: Tuple[int, ...]) -> Optional[CarKey]:
+        best, best_similarity = None, self.threshold
+        seen = set()
+        for band in self._bands(spec, signature):
+            for candidate in self._buckets.get(band, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                other = self._signatures[candidate]
+                similarity = sum(a == b for a, b in zip(signature, other)) / self.permutations
+                if similarity >= best_similarity:
+                    best, best_similarity = candidate, similarity
+        if best is not None:
+            self._signatures.move_to_end(best)
+        return best
+
+    def _add(self, key: CarKey, signature: Tuple[int, ...]) -> None:
+        self._signatures[key] = signature
+        for band in self._bands(key[:-1], signature):
+            self._buckets.setdefault(band, []).append(key)
+
+        while len(self._signatures) > self.max_entries:
+            old_key, old_signature = self._signatures.popitem(last=False)
+            for band in self._bands(old_key[:-1], old_signature):
+                members = self._buckets.get(band)
+                if members is None:
+                    continue
+                members.remove(old_key)
+                if not members:
+                    del self._buckets[band]
+
+    def record_saved(self, cache: str) -> None:
+        """Count a cache hit that only happened because of a near-duplicate match"""
+        self.saved[cache] = self.saved.get(cache, 0) + 1
+        NEAR_DUP_SAVED.labels(cache).inc()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "representatives": len(self._signatures),
+            "aliases": len(self._aliases),
+            "matches": self.matches,
+            "saved_llm_calls": dict(self.saved)
+        }
+
+
+_index: Optional[NearDuplicateIndex] = None
+
+
+def get_near_duplicate_index() -> NearDuplicateIndex:
+    """The worker's shared index, so price and comparison requests map descriptions alike"""
+    global _index
+    if _index is None:
+        _index = NearDuplicateIndex()
+    return _index
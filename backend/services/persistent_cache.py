@@ -0,0 +1,306 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from backend.services.cache import TTLCache
+from backend.utils.metrics import CACHE_LOOKUPS
+from backend.utils.settings import (
+    RESULT_CACHE_COMPACT_INTERVAL_SECONDS,
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_PATH
+)
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_expiry ON entries (namespace, expires_at);
+"""
+_INSERT = "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)"
+
+# Queued writes waiting for the writer thread, and writes applied per transaction
+_WRITE_QUEUE_SIZE = 10000
+_WRITE_BATCH = 500
+
+
+class SQLiteStore:
+    """Disk-backed key/value store shared by every worker on a host.
+
+    SQLite in WAL mode lets readers proceed while another process writes.
+    Writes are queued and applied in batches by a background thread with
+    its own connection, which also compacts registered namespaces every
+    RESULT_CACHE_COMPACT_INTERVAL_SECONDS; callers never wait for a write,
+    a lock or a compaction. Expiry uses wall-clock time because entries
+    outlive the process that wrote them.
+    """
+
+    def __init__(self, path: str, compact_interval: float = RESULT_CACHE_COMPACT_INTERVAL_SECONDS):
+        self.path = path
+        self.compact_interval = compact_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._conn.executescript(_SCHEMA)
+
+        # Namespace -> entry bound enforced by compaction, and its entry count after the last one
+        self._limits: Dict[str, int] = {}
+        self._counts: Dict[str, int] = {}
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=_WRITE_QUEUE_SIZE)
+        self._writer: Optional[threading.Thread] = None
+        self.dropped_writes = 0
+        self.write_errors = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL with synchronous=NORMAL only fsyncs at checkpoints; a crash loses at most the last writes
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get(self, namespace: str, key: str) -> Optional[str]:
+        """Blocking read; call it from a worker thread, not the event loop"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM entries WHERE namespace = ? AND key = ? AND expires_at > ?",
+                (namespace, key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, namespace: str, key: str, value: str, ttl_seconds: float) -> None:
+        """Blocking write, for scripts; the API queues writes with ``set_later``"""
+        with self._lock:
+            self._conn.execute(_INSERT, (namespace, key, value, time.time() + ttl_seconds))
+
+    def register(self, namespace: str, max_entries: int) -> None:
+        """Bound a namespace to max_entries and start the background writer"""
+        with self._lock:
+            self._limits[namespace] = max_entries
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="carmatch-cache-writer", daemon=True)
+                self._writer.start()
+
+    def set_later(self, namespace: str, key: str, value: str, ttl_seconds: float) -> None:
+        """Queue a write for the background writer; dropped (and counted) when the queue is full"""
+        try:
+            self._queue.put_nowait((namespace, key, value, time.time() + ttl_seconds))
+        except queue.Full:
+            self.dropped_writes += 1
+
+    def _run(self) -> None:
+        conn = self._connect()
+        next_compaction = time.monotonic()
+        while True:
+            timeout = max(next_compaction - time.monotonic(), 0.0)
+            try:
+                batch = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < _WRITE_BATCH and batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = bool(batch) and batch[-1] is None
+            rows = [row for row in batch if row is not None]
+            if rows:
+                try:
+                    conn.execute("BEGIN")
+                    conn.executemany(_INSERT, rows)
+                    conn.execute("COMMIT")
+                except sqlite3.Error as e:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    self.write_errors += 1
+                    logger.warning("Persistent cache write failed: %s", e)
+
+            if time.monotonic() >= next_compaction:
+                for namespace, max_entries in list(self._limits.items()):
+                    try:
+                        self.compact(namespace, max_entries, conn)
+                    except sqlite3.Error as e:
+                        logger.warning("Persistent cache compaction failed (%s): %s", namespace, e)
+                next_compaction = time.monotonic() + self.compact_interval
+
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                conn.close()
+                return
+
+    def compact(self, namespace: str, max_entries: int, conn: Optional[sqlite3.Connection] = None) -> int:
+        """Drop expired entries, then the soonest-to-expire ones beyond max_entries"""
+        if conn is None:
+            with self._lock:
+                return self.compact(namespace, max_entries, self._conn)
+        removed = conn.execute(
+            "DELETE FROM entries WHERE namespace = ? AND expires_at <= ?", (namespace, time.time())
+        ).rowcount
+        removed += conn.execute(
+            "DELETE FROM entries WHERE namespace = ? AND key IN ("
+            " SELECT key FROM entries WHERE namespace = ? ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (namespace, namespace, max_entries)
+        ).rowcount
+        self._counts[namespace] = conn.execute(
+            "SELECT COUNT(*) FROM entries WHERE namespace = ?", (namespace,)
+        ).fetchone()[0]
+        return removed
+
+    def flush(self) -> None:
+        """Wait until every queued write is on disk"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Apply the queued writes and stop the writer"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._writer = None
+
+    def items(self, namespace: str) -> List[Tuple[str, str]]:
+        """All unexpired (key, value) pairs of a namespace"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT key, value FROM entries WHERE namespace = ? AND expires_at > ?",
+                (namespace, time.time())
+            ).fetchall()
+
+    def count(self, namespace: str) -> Optional[int]:
+        """Entries of a namespace as of its last compaction (None before the first)"""
+        return self._counts.get(namespace)
+
+    def pending_writes(self) -> int:
+        return self._queue.qsize()
+
+    def clear(self, namespace: str) -> None:
+        self.flush()
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+
+
+_store: Optional[SQLiteStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Optional[SQLiteStore]:
+    """Open the shared result store once per process, or None when disabled or unavailable"""
+    global _store
+    if not RESULT_CACHE_PATH:
+        return None
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = SQLiteStore(RESULT_CACHE_PATH)
+            except sqlite3.Error as e:
+                logger.warning("Persistent cache disabled, cannot open %s: %s", RESULT_CACHE_PATH, e)
+                return None
+    return _store
+
+
+def close_store() -> None:
+    """Write out queued cache entries; call before the process exits"""
+    if _store is not None:
+        _store.close()
+
+
+class PersistentCache(TTLCache):
+    """In-memory TTL cache backed by the shared SQLite result store.
+
+    ``get`` only looks in memory. ``aget`` falls through to disk in a worker
+    thread, so results computed before a restart or by another worker are
+    reused without blocking the event loop; disk hits are promoted into
+    memory. ``set`` writes memory and queues the disk write. Values are
+    stored as JSON, decoded into ``model`` when one is given.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, name: str = "default",
+                 model: Optional[Type[BaseModel]] = None, store: Optional[SQLiteStore] = None):
+        super().__init__(max_entries, ttl_seconds, name=name)
+        self.model = model
+        self.store = store
+        self.disk_max_entries = RESULT_CACHE_MAX_ENTRIES
+        self.disk_hits = 0
+        self.disk_misses = 0
+        self.disk_errors = 0
+        if store is not None and max_entries > 0:
+            store.register(name, self.disk_max_entries)
+
+    async def aget(self, key: Hashable) -> Optional[Any]:
+        """Look up key in memory, then on disk"""
+        value = self.get(key)
+        if value is not None or self.store is None:
+            return value
+
+        try:
+            raw = await asyncio.to_thread(self.store.get, self.name, self._encode_key(key))
+        except sqlite3.Error as e:
+            self.disk_errors += 1
+            logger.warning("Persistent cache read failed (%s): %s", self.name, e)
+            return None
+
+        if raw is None:
+            self.disk_misses += 1
+            CACHE_LOOKUPS.labels(f"{self.name}_disk", "miss").inc()
+            return None
+
+        self.disk_hits += 1
+        CACHE_LOOKUPS.labels(f"{self.name}_disk", "hit").inc()
+        value = self.model.model_validate_json(raw) if self.model else json.loads(raw)
+        super().set(key, value)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        super().set(key, value)
+        if self.store is None or self.max_entries <= 0:
+            return
+
+        raw = value.model_dump_json() if isinstance(value, BaseModel) else json.dumps(value)
+        self.store.set_later(self.name, self._encode_key(key), raw, self.ttl_seconds)
+
+    def clear(self) -> None:
+        super().clear()
+        if self.store is not None:
+            self.store.clear(self.name)
+
+    def _encode_key(self, key: Hashable) -> str:
+        return json.dumps(key, separators=(",", ":"), ensure_ascii=False)
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        if self.store is not None:
+            stats["disk"] = {
+                "path": self.store.path,
+                "entries": self.store.count(self.name),
+                "max_entries": self.disk_max_entries,
+                "hits": self.disk_hits,
+                "misses": self.disk_misses,
+                "errors": self.disk_errors,
+                "pending_writes": self.store.pending_writes(),
+                "dropped_writes": self.store.dropped_writes,
+                "write_errors": self.store.write_errors
+            }
+        return stats
+
+
+def create_result_cache(max_entries: int, ttl_seconds: float, name: str,
+                        model: Optional[Type[BaseModel]] = None) -> PersistentCache:
+    """Cache for LLM-derived results, persisted to disk when RESULT_CACHE_PATH is set"""
+    return PersistentCache(max_entries, ttl_seconds, name=name, model=model, store=get_store())
@@ -1,64 +1,270 @@
+import asyncio
+import logging
 import os
-import re
-from langchain_openai import ChatOpenAI
-
-from langchain.schema import HumanMessage, SystemMessage
-from dotenv import load_dotenv
+from typing import List, Optional, Union
+from langchain_core.messages import HumanMessage, SystemMessage
 from backend.models.schemas import PriceEstimateRequest, PriceEstimateResponse, CarDetails
-from backend.utils.prompts import CAR_PRICE_ESTIMATION_PROMPT
+from backend.services.admission import Overloaded
+from backend.services.persistent_cache import create_result_cache
+from backend.services.model_router import TaskBudget, get_router
+from backend.services.near_duplicates import get_near_duplicate_index
+from backend.services.price_parser import parse_price_response
+from backend.services.singleflight import SingleFlight
+from backend.services.structured_output import parse_price_json, price_response_format
+from backend.utils.canonical import canonical_car_key
+from backend.utils.log import log_payload
+from backend.utils.metrics import PRICE_PATHS, stage_timer
+from backend.utils.prompts import (
+    CAR_PRICE_ESTIMATION_JSON_PROMPT,
+    CAR_PRICE_ESTIMATION_PROMPT,
+    PRICE_JSON_ANALYSIS_FIELDS,
+    PRICE_SYSTEM_PROMPT
+)
+from backend.utils.settings import (
+    BATCH_MAX_CONCURRENCY,
+    DEPRECIATION_MAX_INTERVAL,
+    DEPRECIATION_MODEL_PATH,
+    LLM_JSON_ANALYSIS,
+    LLM_OUTPUT_FORMAT,
+    PRICE_CACHE_MAX_ENTRIES,
+    PRICE_CACHE_TTL_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+# Most appraisals parse fine from the small tier; a response without a usable
+# price range is regenerated on the large one
+PRICE_BUDGET = TaskBudget(latency_seconds=20.0, max_tokens=1500, temperature=0.2)
+
+# Compact JSON mode needs a fraction of the completion tokens of the markdown report
+PRICE_JSON_BUDGET = TaskBudget(
+    latency_seconds=10.0,
+    max_tokens=1000 if LLM_JSON_ANALYSIS else 300,
+    temperature=0.2,
+    response_format=price_response_format(LLM_JSON_ANALYSIS)
+)
+
+# Retry-After for a provider failure that outlasted the router's own retries
+PROVIDER_ERROR_RETRY_AFTER = 5
+
+
+def _parse(text: str):
+    """Return (parsed fields, market analysis text) for a response in the configured format"""
+    if LLM_OUTPUT_FORMAT == "json":
+        return parse_price_json(text, LLM_JSON_ANALYSIS)
+    return parse_price_response(text), text
+
+
+def _has_price(text: str) -> bool:
+    return _parse(text)[0].max_price > 0
+
+
+def _load_local_model():
+    """The trained depreciation model, or None when none has been trained yet.
+
+    numpy is only imported when there is a model to load.
+    """
+    if not DEPRECIATION_MODEL_PATH:
+        return None
+    if not os.path.exists(DEPRECIATION_MODEL_PATH):
+        logger.info("No depreciation model at %s; every price estimate uses the LLM", DEPRECIATION_MODEL_PATH)
+        return None
+    try:
+        from backend.services.depreciation_model import DepreciationModel
+        model = DepreciationModel.load(DEPRECIATION_MODEL_PATH)
+    except Exception as e:
+        logger.warning("Depreciation model disabled, cannot load %s: %s", DEPRECIATION_MODEL_PATH, e)
+        return None
+    logger.info("Loaded depreciation model", extra={"data": model.stats()})
+    return model
+
+
+def _mileage_display(car: CarDetails) -> str:
+    """The mileage as the request gave it, with its unit"""
+    mileage = car.mileage.strip()
+    if "km" in mileage.lower() or "mi" in mileage.lower():
+        return mileage
+    return f"{mileage} {car.mileage_unit or 'miles'}"
+
+
+def _local_response(estimate, car: CarDetails) -> PriceEstimateResponse:
+    """A price response for a local estimate, in the same shape as a parsed LLM report.
+
+    The model only sees the mileage bucket from the cache key; the Mileage
+    factor quotes the request's own reading.
+    """
+    currency = estimate.currency
+    low, high, likely = (f"{currency}{amount:,.0f}" for amount in
+                         (estimate.min_price, estimate.max_price, estimate.most_likely_price))
+    factors = {
+        "Mileage": _mileage_display(car),
+        "Age/Depreciation": f"{estimate.age} years",
+        "Source": f"Local depreciation model (±{estimate.interval:.0%} at 80% confidence)"
+    }
+    market_analysis = "\n".join([
+        "**ESTIMATED PRICE RANGE:**",
+        f"Minimum Value: {low}",
+        f"Maximum Value: {high}",
+        f"Most Likely Price: {likely}",
+        "",
+        "**KEY PRICING FACTORS:**",
+        *(f"- {name}: {value}" for name, value in factors.items())
+    ])
+    return PriceEstimateResponse.model_construct(
+        estimated_price=likely,
+        price_range={
+            "min": round(estimate.min_price),
+            "max": round(estimate.max_price),
+            "min_display": low,
+            "max_display": high,
+            "currency_detected": currency
+        },
+        factors=factors,
+        market_analysis=market_analysis
+    )
 
-# Load environment variables
-load_dotenv()
 
 class PriceEstimationService:
     def __init__(self):
-        OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-        self.llm = ChatOpenAI(
-            model="gpt-4o",
-            api_key=OPENAI_API_KEY,
-            temperature=0.2,
-            max_tokens=2000
+        self.router = get_router()
+        self.cache = create_result_cache(
+            PRICE_CACHE_MAX_ENTRIES, PRICE_CACHE_TTL_SECONDS, name="price", model=PriceEstimateResponse
         )
+        self.flights = SingleFlight(name="price")
+        self.local_model = _load_local_model()
+        self.near_dups = get_near_duplicate_index()
     
-    def estimate_price(self, request: PriceEstimateRequest) -> PriceEstimateResponse:
-        """Estimate car price based on provided details"""
-        try:
+    async def estimate_price(self, request: PriceEstimateRequest) -> PriceEstimateResponse:
+        """Estimate car price based on provided details.
+        
+        Raises Overloaded (502) when the LLM provider still fails after its retries.
+        """
+        return await self._estimate(request.car_details)
+    
+    async def estimate_prices(
+        self,
+        cars: List[CarDetails],
+        max_concurrency: Optional[int] = None
+    ) -> List[Union[PriceEstimateResponse, Exception]]:
+        """Estimate prices for many cars, returning results in input order.
+        
+        Equivalent entries (same canonical key) are estimated once and share
+        the result. At most ``max_concurrency`` estimates run at a time, capped
+        by ``BATCH_MAX_CONCURRENCY``. Failed items are returned as the
+        exception instead of a response.
+        """
+        limit = min(max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+        semaphore = asyncio.Semaphore(max(limit, 1))
+        
+        keys = [canonical_car_key(car) for car in cars]
+        unique_cars = {}
+        for key, car in zip(keys, cars):
+            unique_cars.setdefault(key, car)
+        
+        # Score the whole batch with the local model in one pass; only the
+        # cars it is unsure about go on to the cache and the LLM
+        local = self._estimate_locally(list(unique_cars.keys()), list(unique_cars.values()))
+        
+        async def run(car: CarDetails, local_result: Optional[PriceEstimateResponse]) -> PriceEstimateResponse:
+            if local_result is not None:
+                return local_result
+            async with semaphore:
+                return await self._estimate(car, try_local=False)
+        
+        results = await asyncio.gather(
+            *(run(car, local_result) for car, local_result in zip(unique_cars.values(), local)),
+            return_exceptions=True
+        )
+        results_by_key = dict(zip(unique_cars.keys(), results))
+        return [results_by_key[key] for key in keys]
+    
+    def _estimate_locally(self, keys: list, cars: List[CarDetails]) -> List[Optional[PriceEstimateResponse]]:
+        """Local model answers for the cars' canonical keys; None where its interval is too wide"""
+        if self.local_model is None:
+            return [None] * len(keys)
+        with stage_timer("price", "model"):
+            estimates = self.local_model.predict_keys(keys)
+        results = [
+            _local_response(estimate, car) if estimate and estimate.interval <= DEPRECIATION_MAX_INTERVAL else None
+            for estimate, car in zip(estimates, cars)
+        ]
+        answered = sum(result is not None for result in results)
+        if answered:
+            PRICE_PATHS.labels("model").inc(answered)
+        return results
+    
+    async def _estimate(self, car: CarDetails, try_local: bool = True) -> PriceEstimateResponse:
+        """Estimate a single car's price, raising on failure"""
+        car_key = canonical_car_key(car)
+        if try_local:
+            local = self._estimate_locally([car_key], [car])[0]
+            if local is not None:
+                return local
+        
+        # Serve repeat appraisals of equivalent vehicles from the cache; listings
+        # whose descriptions are near-duplicates share one entry
+        with stage_timer("price", "cache"):
+            cache_key = self.near_dups.canonical_key(car_key)
+            cached = await self.cache.aget(cache_key)
+        if cached is not None:
+            if cache_key != car_key:
+                self.near_dups.record_saved("price")
+            return cached
+        
+        with stage_timer("price", "prompt"):
             # Format car details
-            car_formatted = self._format_car_details(request.car_details)
+            car_formatted = self._format_car_details(car)
             
             # Create price estimation prompt
+            if LLM_OUTPUT_FORMAT == "json":
+                budget = PRICE_JSON_BUDGET
+                prompt = CAR_PRICE_ESTIMATION_JSON_PROMPT.format(
+                    analysis_fields=PRICE_JSON_ANALYSIS_FIELDS if LLM_JSON_ANALYSIS else "",
+                    car_details=car_formatted
+                )
+            else:
+                budget = PRICE_BUDGET
+                prompt = CAR_PRICE_ESTIMATION_PROMPT.format(car_details=car_formatted)
             messages = [
-                SystemMessage(content="You are a professional car appraiser with 20+ years of experience in automotive valuation."),
-                HumanMessage(content=CAR_PRICE_ESTIMATION_PROMPT.format(car_details=car_formatted))
+                SystemMessage(content=PRICE_SYSTEM_PROMPT),
+                HumanMessage(content=prompt)
             ]
-            
-            # Get price estimation from LLM
-            response = self.llm.invoke(messages)
-            estimation_text = response.content
-            
-            print(f"AI Response: {estimation_text}")  # Debug log
-            
-            # Parse the response
-            price_range = self._extract_price_range(estimation_text)
-            estimated_price = self._extract_estimated_price(estimation_text)
-            factors = self._extract_factors(estimation_text)
-            market_analysis = estimation_text  # Return full text for frontend parsing
-            
-            return PriceEstimateResponse(
-                estimated_price=estimated_price,
-                price_range=price_range,
-                factors=factors,
-                market_analysis=market_analysis
+        
+        # Get price estimation from LLM, sharing the call with identical in-flight requests
+        try:
+            response = await self.flights.do(
+                prompt, lambda: self.router.invoke("price", budget, messages, accept=_has_price)
             )
-            
+        except Overloaded:
+            raise
         except Exception as e:
-            print(f"Error in price estimation: {e}")
-            return PriceEstimateResponse(
-                estimated_price="Unable to estimate due to error",
-                price_range={"min": 0, "max": 0},
-                factors={"error": str(e)},
-                market_analysis="Error occurred during price estimation."
+            # Retries are spent; report an outage rather than a zero-price estimate
+            logger.exception("Price estimation failed: %s", e)
+            raise Overloaded(502, PROVIDER_ERROR_RETRY_AFTER, f"LLM provider error: {e}") from e
+        estimation_text = response.content
+        
+        log_payload(logger, "Price LLM response", estimation_text, make=car.make, model=car.model)
+        
+        with stage_timer("price", "parse"):
+            # Parse prices, currency and factors in a single pass over the response;
+            # JSON responses are rendered to the markdown report the frontend parses
+            parsed, market_analysis = _parse(estimation_text)
+            
+            # Built from parser output of the right types; skip re-validation
+            result = PriceEstimateResponse.model_construct(
+                estimated_price=parsed.estimated_price,
+                price_range=parsed.price_range,
+                factors=parsed.factors,
+                market_analysis=market_analysis
             )
+        
+        # Only cache responses that yielded a usable price; local answers are
+        # never cached, so the model is only ever retrained on LLM appraisals
+        if parsed.max_price:
+            self.cache.set(cache_key, result)
+        PRICE_PATHS.labels("llm").inc()
+        
+        return result
     
     def _format_car_details(self, car: CarDetails) -> str:
         """Format car details for price estimation"""
@@ -89,223 +295,16 @@ class PriceEstimationService:
         return "\n".join(details)
     
     def _extract_price_range(self, text: str) -> dict:
-        """Extract minimum and maximum price range with improved currency detection"""
-        try:
-            print(f"Extracting price range from text: {text[:500]}...")  # Debug log
-            
-            # Enhanced patterns for multi-character currencies
-            min_patterns = [
-                r'Minimum Value:\s*(C\$[\d,]+)',    # Canadian Dollar
-                r'Minimum Value:\s*(A\$[\d,]+)',    # Australian Dollar
-                r'Minimum Value:\s*([₹$€£¥][\d,]+)' # Other currencies
-            ]
-            
-            max_patterns = [
-                r'Maximum Value:\s*(C\$[\d,]+)',    # Canadian Dollar
-                r'Maximum Value:\s*(A\$[\d,]+)',    # Australian Dollar
-                r'Maximum Value:\s*([₹$€£¥][\d,]+)' # Other currencies
-            ]
-            
-            min_price_str = None
-            max_price_str = None
-            
-            # Try each pattern until we find a match
-            for pattern in min_patterns:
-                min_match = re.search(pattern, text, re.IGNORECASE)
-                if min_match:
-                    min_price_str = min_match.group(1).strip()
-                    break
-            
-            for pattern in max_patterns:
-                max_match = re.search(pattern, text, re.IGNORECASE)
-                if max_match:
-                    max_price_str = max_match.group(1).strip()
-                    break
-            
-            if min_price_str and max_price_str:
-                print(f"Found min: {min_price_str}, max: {max_price_str}")  # Debug log
-                
-                # Extract numeric values for calculations
-                min_numeric = float(re.sub(r'[₹$€£¥CA,\s]', '', min_price_str))
-                max_numeric = float(re.sub(r'[₹$€£¥CA,\s]', '', max_price_str))
-                
-                # Detect currency
-                if min_price_str.startswith('C$'):
-                    currency = 'C$'
-                elif min_price_str.startswith('A$'):
-                    currency = 'A$'
-                elif min_price_str.startswith('₹'):
-                    currency = '₹'
-                elif min_price_str.startswith('€'):
-                    currency = '€'
-                elif min_price_str.startswith('£'):
-                    currency = '£'
-                elif min_price_str.startswith('¥'):
-                    currency = '¥'
-                else:
-                    currency = '$'
-                
-                return {
-                    "min": min_numeric,
-                    "max": max_numeric,
-                    "min_display": min_price_str,
-                    "max_display": max_price_str,
-                    "currency_detected": currency
-                }
-            
-            # Enhanced fallback: look for any currency patterns in order of preference
-            currency_patterns = [
-                (r'C\$[\d,]+', 'C$'),  # Canadian Dollar - check first
-                (r'A\$[\d,]+', 'A$'),  # Australian Dollar - check second  
-                (r'₹[\d,]+', '₹'),     # Indian Rupee
-                (r'€[\d,]+', '€'),     # Euro
-                (r'£[\d,]+', '£'),     # British Pound
-                (r'¥[\d,]+', '¥'),     # Japanese Yen
-                (r'\$[\d,]+', '$'),    # US Dollar - check last to avoid conflicts
-            ]
-            
-            all_prices = []
-            detected_currency = '$'  # Default
-            
-            for pattern, currency in currency_patterns:
-                matches = re.findall(pattern, text)
-                if matches:
-                    detected_currency = currency
-                    for match in matches:
-                        # Extract numeric value properly for multi-char currencies
-                        if currency in ['C$', 'A$']:
-                            numeric_str = re.sub(r'[CA$,\s]', '', match)
-                        else:
-                            numeric_str = re.sub(r'[₹$€£¥,\s]', '', match)
-                        
-                        try:
-                            numeric_value = float(numeric_str)
-                            if numeric_value > 0:
-                                all_prices.append({
-                                    "text": match,
-                                    "value": numeric_value
-                                })
-                        except ValueError:
-                            continue
-                    
-                    # If we found prices with this currency, stop looking
-                    if all_prices:
-                        break
-            
-            if len(all_prices) >= 2:
-                # Sort by numeric value
-                all_prices.sort(key=lambda x: x["value"])
-                
-                return {
-                    "min": all_prices[0]["value"],
-                    "max": all_prices[-1]["value"],
-                    "min_display": all_prices[0]["text"],
-                    "max_display": all_prices[-1]["text"],
-                    "currency_detected": detected_currency
-                }
-            elif len(all_prices) == 1:
-                # Single price found
-                price = all_prices[0]
-                return {
-                    "min": price["value"],
-                    "max": price["value"],
-                    "min_display": price["text"],
-                    "max_display": price["text"],
-                    "currency_detected": detected_currency
-                }
-                
-        except Exception as e:
-            print(f"Error extracting price range: {e}")
-        
-        # Return safe default values
-        return {
-            "min": 0, 
-            "max": 0,
-            "min_display": "",
-            "max_display": "",
-            "currency_detected": "$"
-        }
+        """Extract minimum and maximum price range with currency detection"""
+        return parse_price_response(text).price_range
     
     def _extract_estimated_price(self, text: str) -> str:
         """Extract the most likely price"""
-        try:
-            # Look for "Most Likely Price" first
-            likely_patterns = [
-                r'Most Likely Price:\s*(C\$[\d,]+)',    # Canadian Dollar
-                r'Most Likely Price:\s*(A\$[\d,]+)',    # Australian Dollar
-                r'Most Likely Price:\s*([₹$€£¥][\d,]+)' # Other currencies
-            ]
-            
-            for pattern in likely_patterns:
-                likely_match = re.search(pattern, text, re.IGNORECASE)
-                if likely_match:
-                    return likely_match.group(1).strip()
-            
-            # Fallback to any price found - prioritize multi-character currencies
-            price_patterns = [
-                r'(C\$[\d,]+)',      # Canadian Dollar
-                r'(A\$[\d,]+)',      # Australian Dollar
-                r'([₹€£¥][\d,]+)',   # Other currencies
-                r'(\$[\d,]+)',       # US Dollar (last to avoid conflicts)
-            ]
-            
-            for pattern in price_patterns:
-                match = re.search(pattern, text)
-                if match:
-                    return match.group(1).strip()
-            
-        except Exception as e:
-            print(f"Error extracting estimated price: {e}")
-        
-        return "Price estimate included in analysis"
+        return parse_price_response(text).estimated_price
     
     def _extract_factors(self, text: str) -> dict:
         """Extract key factors affecting price"""
-        factors = {}
-        
-        try:
-            # Look for the KEY PRICING FACTORS section
-            factors_section_match = re.search(r'\*\*KEY PRICING FACTORS:\*\*(.*?)(?:\*\*|$)', text, re.DOTALL | re.IGNORECASE)
-            
-            if factors_section_match:
-                factors_text = factors_section_match.group(1)
-                
-                # Parse individual factors with improved regex
-                factor_lines = re.findall(r'-\s*([^:]+):\s*([^\n\r-]+)', factors_text)
-                
-                for factor_name, factor_desc in factor_lines:
-                    clean_name = factor_name.strip()
-                    clean_desc = factor_desc.strip()
-                    
-                    # Clean up common suffixes
-                    clean_name = clean_name.replace(' Impact', '').replace(' Assessment', '').replace(' Factors', '')
-                    
-                    if clean_name and clean_desc and len(clean_desc) > 10:  # Only meaningful descriptions
-                        factors[clean_name] = clean_desc
-            
-            # If no factors found in the structured format, try to extract from anywhere in the text
-            if not factors:
-                # Look for common factor patterns throughout the text
-                factor_keywords = [
-                    ('mileage', r'mileage[^.]*\.'),
-                    ('condition', r'condition[^.]*\.'),
-                    ('market demand', r'market\s+demand[^.]*\.'),
-                    ('location', r'location[^.]*\.'),
-                    ('depreciation', r'depreciation[^.]*\.'),
-                    ('features', r'features[^.]*\.')
-                ]
-                
-                for keyword, pattern in factor_keywords:
-                    match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
-                    if match:
-                        description = match.group(0).strip()
-                        if len(description) > 20:  # Only meaningful descriptions
-                            factors[keyword.title()] = description[:150]  # Limit length
-        
-        except Exception as e:
-            print(f"Error extracting factors: {e}")
-        
-        return factors if factors else {"analysis": "Detailed factors included in market analysis"}
+        return parse_price_response(text).factors
     
     def _extract_market_analysis(self, text: str) -> str:
         """Extract market analysis section - kept for compatibility"""
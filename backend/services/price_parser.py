@@ -0,0 +1,217 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+
+# One pattern covers everything the price fields need, so the response is
+# tokenized in a single left-to-right scan. Every token starts with one of a
+# handful of rare characters (label colon, currency symbol, asterisk), which
+# lets the regex engine skip ordinary text quickly; lookbehinds then decide
+# which kind of token it is.
+_TOKENS = re.compile(
+    r"[:₹$€£¥*](?:"
+    r"(?:(?P<min>(?<=(?i:Minimum Value):))|(?P<max>(?<=(?i:Maximum Value):))|(?P<likely>(?<=(?i:Most Likely Price):)))"
+    r"\s*(?P<label_amount>(?i:[CA](?=\$))?[₹$€£¥][\d,]+)?"
+    r"|(?<=[₹$€£¥])(?P<amount>[\d,]+)"
+    r"|(?<=\*)(?P<factors>\*(?i:KEY PRICING FACTORS):\*\*)"
+    r")"
+)
+
+_NON_NUMERIC = re.compile(r'[₹$€£¥CA,\s]')
+
+_FACTOR_LINE = re.compile(r'-\s*([^:]+):\s*([^\n\r-]+)')
+
+_FALLBACK_FACTORS = [
+    ('mileage', re.compile(r'mileage[^.]*\.', re.IGNORECASE | re.DOTALL)),
+    ('condition', re.compile(r'condition[^.]*\.', re.IGNORECASE | re.DOTALL)),
+    ('market demand', re.compile(r'market\s+demand[^.]*\.', re.IGNORECASE | re.DOTALL)),
+    ('location', re.compile(r'location[^.]*\.', re.IGNORECASE | re.DOTALL)),
+    ('depreciation', re.compile(r'depreciation[^.]*\.', re.IGNORECASE | re.DOTALL)),
+    ('features', re.compile(r'features[^.]*\.', re.IGNORECASE | re.DOTALL)),
+]
+
+# Currencies in the order they are preferred when the labelled values are missing;
+# $ comes last so it never shadows C$ or A$.
+CURRENCY_PRIORITY = ['C$', 'A$', '₹', '€', '£', '¥', '$']
+
+# Labelled values prefer C$, then A$, then any single-symbol currency
+_LABEL_PRIORITY = {'C$': 0, 'A$': 1}
+
+# Amounts in any of these currencies, in order of appearance
+_OTHER_SYMBOLS = '₹€£¥'
+
+DEFAULT_ESTIMATED_PRICE = "Price estimate included in analysis"
+DEFAULT_FACTORS = {"analysis": "Detailed factors included in market analysis"}
+
+
+@dataclass
+class PriceParseResult:
+    """Typed view of the fields parsed from a price estimation response"""
+    min_price: Union[float, int] = 0
+    max_price: Union[float, int] = 0
+    min_display: str = ""
+    max_display: str = ""
+    currency: str = "$"
+    estimated_price: str = DEFAULT_ESTIMATED_PRICE
+    factors: Dict[str, str] = field(default_factory=lambda: dict(DEFAULT_FACTORS))
+
+    @property
+    def price_range(self) -> dict:
+        return {
+            "min": self.min_price,
+            "max": self.max_price,
+            "min_display": self.min_display,
+            "max_display": self.max_display,
+            "currency_detected": self.currency
+        }
+
+
+def _currency_of(amount: str) -> Tuple[str, str]:
+    """Return (currency, amount text) for a matched amount"""
+    if amount.startswith('C$') or amount.startswith('A$'):
+        return amount[:2], amount
+    if amount[0] in 'CcAa':
+        # Lowercase c$/a$ only matched case-insensitively; the price is in $
+        return '$', amount[1:]
+    return amount[0], amount
+
+
+def _record_amount(amounts: Dict[str, List[str]], amount: str) -> None:
+    currency, amount_text = _currency_of(amount)
+    amounts[currency].append(amount_text)
+    if currency in _OTHER_SYMBOLS:
+        amounts[_OTHER_SYMBOLS].append(amount_text)
+
+
+def _numeric(amount: str, currency: str) -> Optional[float]:
+    digits = amount[len(currency):].replace(',', '')
+    return float(digits) if digits else None
+
+
+def parse_price_response(text: str) -> PriceParseResult:
+    """Parse prices, currency and pricing factors from an LLM response in one scan"""
+    labels: Dict[str, List[Optional[str]]] = {}
+    amounts: Dict[str, List[str]] = {currency: [] for currency in CURRENCY_PRIORITY + [_OTHER_SYMBOLS]}
+    factors_span: Optional[Tuple[int, int]] = None
+    factors_start: Optional[int] = None
+
+    for token in _TOKENS.finditer(text):
+        kind = token.lastgroup
+
+        if kind == 'amount':
+            start = token.start()
+            # A C or A right before a $ makes it a Canadian/Australian amount
+            if text[start] == '$' and start and text[start - 1] in 'CA':
+                start -= 1
+            _record_amount(amounts, text[start:token.end()])
+
+        elif kind == 'factors':
+            if factors_start is None:
+                factors_start = token.end()
+
+        else:
+            amount = token.group('label_amount')
+            if amount is None:
+                continue
+            label = 'min' if token.group('min') is not None else 'max' if token.group('max') is not None else 'likely'
+            # Best labelled match per label: C$ first, then A$, then the rest
+            slots = labels.setdefault(label, [None, None, None])
+            slot = _LABEL_PRIORITY.get(amount[:2].upper(), 2)
+            if slots[slot] is None:
+                slots[slot] = amount
+            _record_amount(amounts, amount)
+
+    if factors_start is not None:
+        # The section runs to the next ** or, failing that, the end of the text
+        end = text.find('**', factors_start)
+        if end == -1:
+            end = len(text) - 1 if text.endswith('\n') else len(text)
+        factors_span = (factors_start, max(end, factors_start))
+
+    result = PriceParseResult()
+    _apply_price_range(result, labels, amounts)
+    result.estimated_price = _pick_estimated_price(labels, amounts)
+    result.factors = _parse_factors(text, factors_span)
+    return result
+
+
+def _first_label(labels: Dict[str, List[Optional[str]]], label: str) -> Optional[str]:
+    for amount in labels.get(label, ()):
+        if amount is not None:
+            return amount
+    return None
+
+
+def _apply_price_range(result: PriceParseResult, labels: dict, amounts: dict) -> None:
+    min_price_str = _first_label(labels, 'min')
+    max_price_str = _first_label(labels, 'max')
+
+    if min_price_str and max_price_str:
+        try:
+            result.min_price = float(_NON_NUMERIC.sub('', min_price_str))
+            result.max_price = float(_NON_NUMERIC.sub('', max_price_str))
+        except ValueError:
+            result.min_price = result.max_price = 0
+            return
+
+        result.min_display = min_price_str
+        result.max_display = max_price_str
+        prefix = min_price_str[:2] if min_price_str[:2] in ('C$', 'A$') else min_price_str[0]
+        result.currency = prefix if prefix in CURRENCY_PRIORITY else '$'
+        return
+
+    # Fallback: all prices in the first currency that has any positive amount
+    for currency in CURRENCY_PRIORITY:
+        prices = []
+        for amount in amounts[currency]:
+            value = _numeric(amount, currency)
+            if value:
+                prices.append((value, amount))
+        if prices:
+            prices.sort(key=lambda price: price[0])
+            result.min_price, result.min_display = prices[0]
+            result.max_price, result.max_display = prices[-1]
+            result.currency = currency
+            return
+
+
+def _pick_estimated_price(labels: dict, amounts: dict) -> str:
+    likely = _first_label(labels, 'likely')
+    if likely:
+        return likely
+
+    for currency in ('C$', 'A$'):
+        if amounts[currency]:
+            return amounts[currency][0]
+
+    # Earliest ₹/€/£/¥ amount in the text, then the first plain $ amount
+    if amounts[_OTHER_SYMBOLS]:
+        return amounts[_OTHER_SYMBOLS][0]
+    if amounts['$']:
+        return amounts['$'][0]
+    return DEFAULT_ESTIMATED_PRICE
+
+
+def _parse_factors(text: str, span: Optional[Tuple[int, int]]) -> Dict[str, str]:
+    factors = {}
+
+    if span is not None:
+        for factor_name, factor_desc in _FACTOR_LINE.findall(text, span[0], span[1]):
+            clean_name = factor_name.strip()
+            clean_desc = factor_desc.strip()
+
+            # Clean up common suffixes
+            clean_name = clean_name.replace(' Impact', '').replace(' Assessment', '').replace(' Factors', '')
+
+            if clean_name and clean_desc and len(clean_desc) > 10:  # Only meaningful descriptions
+                factors[clean_name] = clean_desc
+
+    # If no factors found in the structured format, try to extract from anywhere in the text
+    if not factors:
+        for keyword, pattern in _FALLBACK_FACTORS:
+            match = pattern.search(text)
+            if match:
+                description = match.group(0).strip()
+                if len(description) > 20:  # Only meaningful descriptions
+                    factors[keyword.title()] = description[:150]  # Limit length
+
+    return factors if factors else dict(DEFAULT_FACTORS)
@@ -0,0 +1,56 @@
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+if TYPE_CHECKING:
+    from backend.services.car_comparison import CarComparisonService
+    from backend.services.price_estimation import PriceEstimationService
+
+# Services are built on first use rather than at import time, so the app can
+# answer /health before langchain and the chat model clients are loaded
+_services: Dict[str, object] = {}
+_lock = threading.Lock()
+
+
+def _get_or_create(name: str, factory: Callable[[], object]):
+    service = _services.get(name)
+    if service is None:
+        # Preloading runs in a worker thread, so creation must happen exactly once
+        with _lock:
+            service = _services.get(name)
+            if service is None:
+                service = _services[name] = factory()
+    return service
+
+
+def _create_comparison_service() -> "CarComparisonService":
+    from backend.services.car_comparison import CarComparisonService
+    return CarComparisonService()
+
+
+def _create_price_service() -> "PriceEstimationService":
+    from backend.services.price_estimation import PriceEstimationService
+    return PriceEstimationService()
+
+
+def get_comparison_service() -> "CarComparisonService":
+    """FastAPI dependency returning the shared CarComparisonService"""
+    return _get_or_create("comparison", _create_comparison_service)
+
+
+def get_price_service() -> "PriceEstimationService":
+    """FastAPI dependency returning the shared PriceEstimationService"""
+    return _get_or_create("price", _create_price_service)
+
+
+def loaded_service(name: str) -> Optional[object]:
+    """The "comparison" or "price" service if it was already created; None otherwise.
+
+    Health checks use this, so asking about a service never builds it.
+    """
+    return _services.get(name)
+
+
+def preload_services() -> None:
+    """Create every service up front (blocking: imports langchain and builds the clients)"""
+    get_comparison_service()
+    get_price_service()
@@ -0,0 +1,52 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from backend.utils.metrics import COALESCED_CALLS
+
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one upstream call.
+
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same result (or exception). Waiters are shielded
+    so one cancelled client does not cancel the call for everyone else.
+    """
+
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        future = self._inflight.get(key)
+
+        if future is None:
+            self.executions += 1
+            COALESCED_CALLS.labels(self.name, "leader").inc()
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done, key=key: self._forget(key, done))
+        else:
+            self.collapsed += 1
+            COALESCED_CALLS.labels(self.name, "follower").inc()
+
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        # Mark the exception as retrieved in case every waiter went away
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "upstream_calls": self.executions,
+            "collapsed": self.collapsed,
+            "collapse_rate": round(self.collapsed / self.calls, 4) if self.calls else 0.0
+        }
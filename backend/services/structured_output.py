@@ -0,0 +1,236 @@
+from typing import Dict, List, Literal, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from backend.models.schemas import CategoryKey
+from backend.services.price_parser import CURRENCY_PRIORITY, PriceParseResult
+from backend.utils.prompts import COMPARISON_CATEGORIES
+
+Currency = Literal[tuple(CURRENCY_PRIORITY)]
+
+
+class PriceFactorsOutput(BaseModel):
+    mileage: str
+    condition: str
+    market_demand: str
+    location: str
+    depreciation: str
+    features: str
+
+
+class PriceAnalysisOutput(BaseModel):
+    market_trends: List[str]
+    demand_supply: List[str]
+    depreciation: List[str]
+    location: List[str]
+    condition: List[str]
+    recommendations: List[str]
+
+
+class PriceOutput(BaseModel):
+    currency: Currency
+    min_price: float
+    max_price: float
+    most_likely_price: float
+    factors: PriceFactorsOutput
+
+
+class PriceOutputWithAnalysis(PriceOutput):
+    analysis: PriceAnalysisOutput
+
+
+class CategoryVerdict(BaseModel):
+    category: CategoryKey
+    winner: str
+    reason: str
+
+
+class CategoryVerdictWithPoints(CategoryVerdict):
+    car1_points: List[str]
+    car2_points: List[str]
+
+
+class RecommendationOutput(BaseModel):
+    family_use: str
+    daily_commuting: str
+    performance: str
+    budget: str
+    overall_winner: str
+
+
+class CategoryComparisonOutput(BaseModel):
+    """Category verdicts only, for comparisons of selected categories"""
+    car1_name: str
+    car2_name: str
+    categories: List[CategoryVerdict]
+
+
+class CategoryComparisonOutputWithPoints(CategoryComparisonOutput):
+    categories: List[CategoryVerdictWithPoints]
+
+
+class ComparisonOutput(CategoryComparisonOutput):
+    recommendation: RecommendationOutput
+
+
+class ComparisonOutputWithPoints(ComparisonOutput):
+    categories: List[CategoryVerdictWithPoints]
+
+
+# Factor names and section headers as the markdown report uses them, so both
+# formats produce the same PriceEstimateResponse for the frontend
+_FACTOR_LABELS = [
+    ("mileage", "Mileage", "Mileage Impact"),
+    ("condition", "Condition", "Condition Assessment"),
+    ("market_demand", "Market Demand", "Market Demand"),
+    ("location", "Location", "Location Factors"),
+    ("depreciation", "Age/Depreciation", "Age/Depreciation"),
+    ("features", "Features Premium", "Features Premium"),
+]
+
+_ANALYSIS_HEADERS = [
+    ("market_trends", "MARKET TRENDS ANALYSIS"),
+    ("demand_supply", "DEMAND AND SUPPLY FACTORS"),
+    ("depreciation", "DEPRECIATION ASSESSMENT"),
+    ("location", "LOCATION AND CURRENCY FACTORS"),
+    ("condition", "CONDITION AND FEATURE IMPACT"),
+    ("recommendations", "RECOMMENDATIONS"),
+]
+
+_RECOMMENDATION_LABELS = [
+    ("family_use", "Family Use"),
+    ("daily_commuting", "Daily Commuting"),
+    ("performance", "Performance"),
+    ("budget", "Budget"),
+]
+
+
+def _strict_schema(model: Type[BaseModel]) -> dict:
+    """JSON schema in the form OpenAI's strict structured outputs accept"""
+    schema = model.model_json_schema()
+
+    def tighten(node):
+        if isinstance(node, dict):
+            node.pop("title", None)
+            if node.get("type") == "object" and "properties" in node:
+                node["additionalProperties"] = False
+                node["required"] = list(node["properties"])
+            for value in node.values():
+                tighten(value)
+        elif isinstance(node, list):
+            for value in node:
+                tighten(value)
+
+    tighten(schema)
+    return schema
+
+
+def _response_format(name: str, model: Type[BaseModel]) -> dict:
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "strict": True, "schema": _strict_schema(model)}
+    }
+
+
+def price_output_model(include_analysis: bool) -> Type[PriceOutput]:
+    return PriceOutputWithAnalysis if include_analysis else PriceOutput
+
+
+def comparison_output_model(include_analysis: bool, include_recommendation: bool = True) -> Type[CategoryComparisonOutput]:
+    if include_recommendation:
+        return ComparisonOutputWithPoints if include_analysis else ComparisonOutput
+    return CategoryComparisonOutputWithPoints if include_analysis else CategoryComparisonOutput
+
+
+def price_response_format(include_analysis: bool) -> dict:
+    return _response_format("price_estimate", price_output_model(include_analysis))
+
+
+def comparison_response_format(include_analysis: bool, include_recommendation: bool = True) -> dict:
+    return _response_format("car_comparison", comparison_output_model(include_analysis, include_recommendation))
+
+
+def _display(currency: str, amount: float) -> str:
+    return f"{currency}{amount:,.0f}"
+
+
+def parse_price_json(text: str, include_analysis: bool = False) -> Tuple[PriceParseResult, str]:
+    """Validate a JSON price response; return the parsed fields and the rendered market analysis.
+
+    Output that does not match the schema yields an empty result (max price
+    0) and the raw text, like an unparseable markdown response.
+    """
+    try:
+        output = price_output_model(include_analysis).model_validate_json(text)
+    except ValidationError:
+        return PriceParseResult(), text
+    if not 0 < output.min_price <= output.max_price:
+        return PriceParseResult(), text
+
+    currency = output.currency
+    result = PriceParseResult(
+        min_price=output.min_price,
+        max_price=output.max_price,
+        min_display=_display(currency, output.min_price),
+        max_display=_display(currency, output.max_price),
+        currency=currency,
+        estimated_price=_display(currency, output.most_likely_price or (output.min_price + output.max_price) / 2),
+        factors={label: getattr(output.factors, key) for key, label, _ in _FACTOR_LABELS}
+    )
+
+    lines = [
+        "**ESTIMATED PRICE RANGE:**",
+        f"Minimum Value: {result.min_display}",
+        f"Maximum Value: {result.max_display}",
+        f"Most Likely Price: {result.estimated_price}",
+        ""
+    ]
+    analysis = getattr(output, "analysis", None)
+    if analysis is not None:
+        for key, header in _ANALYSIS_HEADERS:
+            lines.append(f"**{header}:**")
+            lines.extend(f"• {point}" for point in getattr(analysis, key))
+            lines.append("")
+    lines.append("**KEY PRICING FACTORS:**")
+    lines.extend(f"- {heading}: {getattr(output.factors, key)}" for key, _, heading in _FACTOR_LABELS)
+
+    return result, "\n".join(lines)
+
+
+def parse_comparison_json(text: str, include_analysis: bool = False,
+                          include_recommendation: bool = True) -> Tuple[str, Dict[str, str]]:
+    """Validate a JSON comparison; return it rendered as CAR_COMPARISON_PROMPT text plus the winner summary.
+
+    Raises ValueError when the output does not match the schema.
+    """
+    try:
+        output = comparison_output_model(include_analysis, include_recommendation).model_validate_json(text)
+    except ValidationError as e:
+        raise ValueError(f"Invalid comparison JSON: {e}") from e
+
+    verdicts = {verdict.category: verdict for verdict in output.categories}
+    sections = []
+    summary = {}
+
+    for number, (key, title) in enumerate(COMPARISON_CATEGORIES, 1):
+        verdict = verdicts.get(key)
+        if verdict is None:
+            continue
+        summary[key] = verdict.winner
+
+        section = f"**{number}. {title}**\n\n"
+        if isinstance(verdict, CategoryVerdictWithPoints):
+            points1 = "\n".join(f"- {point}" for point in verdict.car1_points) or "- No details available"
+            points2 = "\n".join(f"- {point}" for point in verdict.car2_points) or "- No details available"
+            section += f"{output.car1_name}:\n{points1}\n\n{output.car2_name}:\n{points2}\n\n"
+        sections.append(f"{section}Winner: {verdict.winner} - {verdict.reason}\n")
+
+    recommendation = getattr(output, "recommendation", None)
+    if recommendation is None:
+        return "\n".join(sections), summary
+    final_block = "\n".join(
+        ["**Final Recommendation**", ""]
+        + [f"{label}: {getattr(recommendation, key)}" for key, label in _RECOMMENDATION_LABELS]
+        + ["", f"Overall Winner: {recommendation.overall_winner}"]
+    )
+    return "\n".join(sections) + "\n" + final_block, summary
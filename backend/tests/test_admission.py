@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from backend.services.admission import AdmissionController, Overloaded
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_waiters_are_admitted_in_arrival_order():
+    async def main():
+        controller = AdmissionController("test", max_concurrency=1, max_queue=5, queue_timeout=5)
+        order = []
+
+        async def request(i):
+            async with controller.admit():
+                order.append(i)
+                await asyncio.sleep(0.01)
+
+        holder = await controller.acquire()
+        tasks = []
+        for i in range(4):
+            tasks.append(asyncio.create_task(request(i)))
+            await asyncio.sleep(0)  # queue each one before the next arrives
+        assert controller.stats()["queued"] == 4
+
+        controller.release(holder)
+        await asyncio.gather(*tasks)
+        assert order == [0, 1, 2, 3]
+        assert controller.stats()["active"] == 0
+
+    run(main())
+
+
+def test_new_arrivals_do_not_overtake_the_queue():
+    async def main():
+        controller = AdmissionController("test", max_concurrency=1, max_queue=5, queue_timeout=5)
+        holder = await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+
+        # The slot is handed to the waiter, not freed for the next caller
+        controller.release(holder)
+        late = asyncio.create_task(controller.acquire())
+        admitted = await asyncio.wait_for(waiter, 0.5)
+        await asyncio.sleep(0.01)
+        assert not late.done()
+        assert controller.stats()["active"] == 1
+
+        controller.release(admitted)
+        controller.release(await asyncio.wait_for(late, 0.5))
+        assert controller.stats()["active"] == 0
+
+    run(main())
+
+
+def test_over_rate_is_rejected_with_429():
+    async def main():
+        controller = AdmissionController("test", rate=1.0, burst=2)
+        await controller.acquire()
+        await controller.acquire()
+        with pytest.raises(Overloaded) as error:
+            await controller.acquire()
+        assert error.value.status_code == 429
+        assert error.value.retry_after >= 1
+        assert controller.rejected == 1
+
+    run(main())
+
+
+def test_full_queue_is_rejected_with_503():
+    async def main():
+        controller = AdmissionController("test", max_concurrency=1, max_queue=1, queue_timeout=5)
+        holder = await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(Overloaded) as error:
+            await controller.acquire()
+        assert error.value.status_code == 503
+        assert "queued" in error.value.reason
+
+        controller.release(holder)
+        controller.release(await waiter)
+
+    run(main())
+
+
+def test_queue_timeout_is_rejected_with_503_and_leaves_no_waiter():
+    async def main():
+        controller = AdmissionController("test", max_concurrency=1, max_queue=4, queue_timeout=0.02)
+        holder = await controller.acquire()
+        with pytest.raises(Overloaded) as error:
+            await controller.acquire()
+        assert error.value.status_code == 503
+        assert controller.stats()["queued"] == 0
+
+        controller.release(holder)
+        assert controller.stats()["active"] == 0
+
+    run(main())
+
+
+def test_cancelled_waiter_does_not_leak_its_slot():
+    async def main():
+        controller = AdmissionController("test", max_concurrency=1, max_queue=4, queue_timeout=5)
+        holder = await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        controller.release(holder)
+        assert controller.stats()["active"] == 0
+        assert controller.stats()["queued"] == 0
+        # The freed slot is usable straight away
+        controller.release(await asyncio.wait_for(controller.acquire(), 0.1))
+
+    run(main())
@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+import pytest
+
+from backend import bulk_appraise
+from backend.bulk_appraise import UnusableEstimate, estimate_with_retries
+from backend.models.schemas import CarDetails, PriceEstimateResponse
+from backend.services import providers
+
+CAR = CarDetails(make="Audi", model="A4", year="2018", raw_description="2018 Audi A4")
+
+PRICED = PriceEstimateResponse(
+    estimated_price="$20,000", price_range={"min": 18000, "max": 22000}, factors={}, market_analysis=""
+)
+ZERO = PriceEstimateResponse(
+    estimated_price="Unable to estimate", price_range={"min": 0, "max": 0}, factors={}, market_analysis=""
+)
+ERRORED = PriceEstimateResponse(
+    estimated_price="$20,000", price_range={"min": 18000, "max": 22000},
+    factors={"error": "provider down"}, market_analysis=""
+)
+
+
+class ScriptedService:
+    """Answers estimate_prices from a list, one entry per call"""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = 0
+
+    async def estimate_prices(self, cars, max_concurrency=None):
+        self.calls += 1
+        return [self.answers.pop(0) if len(self.answers) > 1 else self.answers[0]]
+
+
+@pytest.mark.parametrize("bad", [ZERO, ERRORED])
+def test_unusable_estimate_is_retried(bad):
+    service = ScriptedService(bad, PRICED)
+    assert asyncio.run(estimate_with_retries(service, CAR)) is PRICED
+    assert service.calls == 2
+
+
+@pytest.mark.parametrize("bad", [ZERO, ERRORED])
+def test_unusable_estimate_fails_the_row_once_retries_are_spent(bad):
+    service = ScriptedService(bad)
+    result = asyncio.run(estimate_with_retries(service, CAR))
+    assert isinstance(result, UnusableEstimate)
+    assert service.calls == bulk_appraise.MAX_UNUSABLE_RETRIES + 1
+
+
+def test_unusable_rows_go_to_errors_and_stay_retryable(tmp_path, monkeypatch):
+    inventory = tmp_path / "inventory.jsonl"
+    inventory.write_text(json.dumps({"id": "zero", "make": "Audi", "model": "A4", "year": "2018"}) + "\n")
+    output = tmp_path / "prices.jsonl"
+    monkeypatch.setattr(providers, "get_price_service", lambda: ScriptedService(ZERO))
+
+    assert bulk_appraise.main([str(inventory), "--output", str(output)]) == 1
+
+    assert output.read_text() == ""
+    [error] = [json.loads(line) for line in (tmp_path / "prices.jsonl.errors.jsonl").read_text().splitlines()]
+    assert error["id"] == "zero" and "UnusableEstimate" in error["error"]
+    checkpoint = json.loads((tmp_path / "prices.jsonl.checkpoint.json").read_text())
+    assert checkpoint["retry"] == [0] and checkpoint["stats"]["priced"] == 0
@@ -0,0 +1,71 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from backend.models.schemas import CarDetails, CompareRequest
+from backend.services import car_comparison, persistent_cache
+from backend.services.car_comparison import CarComparisonService
+from backend.services.fake_llm import fake_comparison_response, fake_merge_response, fake_profile_response
+
+REFUSAL = "Sorry, I can't help with that."
+
+
+def car(make, model, year):
+    return CarDetails(make=make, model=model, year=year, mileage="50000 km", location="US",
+                      condition="good", raw_description=f"{year} {make} {model} test")
+
+
+REQUEST = CompareRequest(car1=car("Audi", "A4", "2018"), car2=car("BMW", "X5", "2019"))
+
+
+@pytest.fixture
+def service(monkeypatch):
+    # Memory caches only, so tests never touch the on-disk result store
+    monkeypatch.setattr(persistent_cache, "RESULT_CACHE_PATH", "")
+    monkeypatch.setattr(persistent_cache, "_store", None)
+    return CarComparisonService()
+
+
+def answer_with(service, respond):
+    async def invoke(task, budget, messages, accept=None):
+        return SimpleNamespace(content=respond(task, messages[-1].content))
+    service.router.invoke = invoke
+
+
+def working(task, prompt):
+    if task == "compare_profile":
+        return fake_profile_response(prompt)
+    if task == "compare_merge":
+        return fake_merge_response(prompt)
+    return fake_comparison_response(prompt)
+
+
+@pytest.mark.parametrize("mode", ["decomposed", "full"])
+def test_failed_comparisons_are_not_cached(service, monkeypatch, mode):
+    monkeypatch.setattr(car_comparison, "COMPARISON_MODE", mode)
+
+    answer_with(service, lambda task, prompt: REFUSAL)
+    failed = asyncio.run(service.compare_cars(REQUEST))
+    assert len(service.comparison_cache) == 0
+    assert len(service.category_cache) == 0
+    assert len(service.profile_cache) == 0
+
+    answer_with(service, working)
+    result = asyncio.run(service.compare_cars(REQUEST))
+    assert result.comparison != failed.comparison
+    assert "Overall Winner:" in result.comparison
+    assert len(service.comparison_cache) == 1
+
+
+def test_failed_profiles_are_not_cached_as_category_sections(service, monkeypatch):
+    monkeypatch.setattr(car_comparison, "COMPARISON_MODE", "decomposed")
+    request = REQUEST.model_copy(update={"categories": ["safety", "value"]})
+
+    answer_with(service, lambda task, prompt: REFUSAL)
+    asyncio.run(service.compare_cars(request))
+    assert len(service.category_cache) == 0
+
+    answer_with(service, working)
+    asyncio.run(service.compare_cars(request))
+    assert len(service.category_cache) == 2
@@ -0,0 +1,26 @@
+import json
+
+from backend.models.schemas import PriceEstimateResponse
+from backend.services.depreciation_model import load_training_samples
+
+KEY = json.dumps(["audi", "a4", "2018", "80000", "good", "us"])
+
+
+def appraisal(low, high):
+    return PriceEstimateResponse(
+        estimated_price=f"${high:,}", price_range={"min": low, "max": high, "currency_detected": "$"},
+        factors={}, market_analysis=""
+    ).model_dump_json()
+
+
+def test_malformed_rows_are_skipped_and_counted():
+    rows = [
+        (KEY, appraisal(18000, 22000)),
+        (KEY, '{"estimated_price": "$20,000"}'),  # missing required fields
+        (KEY, "not json"),
+        ("not json", appraisal(18000, 22000)),
+        (KEY, appraisal(0, 0)),  # well formed, just no price to learn from
+    ]
+    samples, skipped = load_training_samples(rows)
+    assert [(sample.min_price, sample.max_price) for sample in samples] == [(18000, 22000)]
+    assert skipped == 3
@@ -0,0 +1,63 @@
+import pytest
+
+from backend.services.detail_extractor import extract_details_locally
+
+
+@pytest.mark.parametrize("description", [
+    "2019 Honda Civic for sale at Toronto, 42,000 miles",
+    "Selling my 2018 Toyota Camry, located at Dallas, 60k miles",
+    "2016 Ford Focus at a great price, 80,000 km",
+    "2020 Mazda CX-5, parked at home, 20,000 miles",
+    "2017 BMW 3 Series, smart owner, mt vernon area",
+])
+def test_prepositions_are_not_transmission_codes(description):
+    assert "transmission_type" not in extract_details_locally(description).details
+
+
+@pytest.mark.parametrize("description, expected", [
+    ("2017 Mazda 3 AT, 50,000 km", "Automatic"),
+    ("2014 Honda Civic A/T at Toronto", "Automatic"),
+    ("2016 Volkswagen Golf 6-speed M/T, 80,000 km", "6-speed Manual"),
+    ("2015 Ford Focus MT at Boston", "Manual"),
+    ("2020 Honda Accord automatic, 30,000 miles", "Automatic"),
+    ("2012 Subaru Impreza 5 speed manual", "5-speed Manual"),
+])
+def test_transmission(description, expected):
+    assert extract_details_locally(description).details["transmission_type"] == expected
+
+
+def test_location_after_at():
+    result = extract_details_locally("2019 Honda Civic for sale at Toronto, 42,000 miles")
+    assert result.details == {
+        "make": "Honda",
+        "model": "Civic",
+        "year": "2019",
+        "location": "Toronto",
+        "mileage/odometer_reading": "42,000 miles",
+    }
+
+
+def test_mileage_digits_are_not_a_year():
+    result = extract_details_locally("Toyota Corolla with 2015 miles, 2021 model")
+    assert result.details["year"] == "2021"
+    assert result.details["mileage/odometer_reading"] == "2015 miles"
+
+
+def test_longest_model_phrase_wins():
+    assert extract_details_locally("2019 Jeep Grand Cherokee").details["model"] == "Grand Cherokee"
+
+
+@pytest.mark.parametrize("description", [
+    "Great family vehicle, must see, call now",
+    "Not a Ford, definitely better than a Civic, asking 9000",
+    "",
+])
+def test_vague_descriptions_stay_below_threshold(description):
+    assert extract_details_locally(description).confidence < 0.8
+
+
+def test_unexplained_words_lower_confidence():
+    clean = extract_details_locally("2018 Toyota Camry, 60,000 miles")
+    noisy = extract_details_locally("2018 Toyota Camry, 60,000 miles, rebuilt title flood damage")
+    assert noisy.confidence < clean.confidence
+    assert "flood" in noisy.unparsed
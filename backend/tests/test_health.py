@@ -0,0 +1,28 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from backend.main import app
+from backend.services import providers
+
+
+def test_importing_the_app_leaves_httpx_and_langchain_unloaded():
+    code = (
+        "import sys, backend.main; "
+        "print(sorted(m for m in ('httpx', 'langchain_core') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=Path(__file__).resolve().parents[2])
+    assert result.stdout.strip() == "[]"
+
+
+def test_service_health_checks_do_not_build_services(monkeypatch):
+    monkeypatch.setattr(providers, "_services", {})
+    client = TestClient(app)
+    for path in ("/api/price/health", "/api/compare/health"):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert response.json()["loaded"] is False
+    assert providers._services == {}
@@ -0,0 +1,40 @@
+from unittest import mock
+
+import pytest
+
+from backend.services import model_router
+from backend.services.model_router import ModelRouter, TaskBudget
+
+
+def test_route_applies_the_tier_token_cap():
+    budget = TaskBudget(latency_seconds=10.0, max_tokens=1500, temperature=0.2)
+    with mock.patch.dict(model_router.TIER_MAX_TOKENS, {"small": 800, "large": 4000}, clear=True):
+        router = ModelRouter()
+        assert router.route("price", budget).max_tokens == 800
+        assert router.route("price", TaskBudget(10.0, 1500, 0.2, min_tier="large")).max_tokens == 1500
+
+
+def test_uncapped_tier_keeps_the_task_budget():
+    budget = TaskBudget(latency_seconds=10.0, max_tokens=1500, temperature=0.2)
+    with mock.patch.dict(model_router.TIER_MAX_TOKENS, {}, clear=True):
+        assert ModelRouter().route("price", budget).max_tokens == 1500
+
+
+@pytest.fixture
+def custom_tiers():
+    tiers = {"mini": "gpt-4o-mini", "mid": "gpt-4o", "max": "o1"}
+    with mock.patch.multiple(model_router, MODEL_TIERS=tiers, TIER_ORDER=list(tiers),
+                             _TIER_ALIASES={"small": "mini", "large": "max"}):
+        yield
+
+
+def test_small_and_large_resolve_by_position_for_other_tier_names(custom_tiers):
+    assert TaskBudget(10.0, 1500, 0.2, min_tier="large").min_tier == "max"
+    assert TaskBudget(10.0, 1500, 0.2, min_tier="small").min_tier == "mini"
+    assert TaskBudget(10.0, 1500, 0.2, min_tier="mid").min_tier == "mid"
+    assert ModelRouter().route("compare", TaskBudget(10.0, 1500, 0.2, min_tier="large")).model == "o1"
+
+
+def test_unknown_tier_is_rejected_when_the_budget_is_built(custom_tiers):
+    with pytest.raises(ValueError, match="huge"):
+        TaskBudget(10.0, 1500, 0.2, min_tier="huge")
@@ -0,0 +1,59 @@
+from backend.services.near_duplicates import NearDuplicateIndex, shingles
+
+SPEC = ("toyota", "camry", "2018", "60000", "good", "us")
+DESCRIPTION = "2018 Toyota Camry SE, one owner, 60k miles, new tires, full service history, no accidents"
+
+
+def key(description, spec=SPEC):
+    return (*spec, description)
+
+
+def test_shingles_ignore_case_punctuation_and_emoji():
+    assert shingles("One owner!! 🚗 New TIRES") == shingles("one owner new tires")
+
+
+def test_near_duplicate_descriptions_share_a_key():
+    index = NearDuplicateIndex(threshold=0.8)
+    first = key(DESCRIPTION)
+    assert index.canonical_key(first) == first
+    variant = key("2018 toyota camry SE — one owner, 60k miles, NEW TIRES, full service history, no accidents 🔥")
+    assert index.canonical_key(variant) == first
+    assert index.stats()["matches"] == 1
+    # Repeat lookups come from the alias table
+    assert index.canonical_key(variant) == first
+    assert index.stats()["matches"] == 1
+
+
+def test_different_descriptions_or_specs_keep_their_own_key():
+    index = NearDuplicateIndex(threshold=0.8)
+    index.canonical_key(key(DESCRIPTION))
+    other = key("Camry with a salvage title, flood damage in 2021, sold as is for parts only")
+    assert index.canonical_key(other) == other
+    # Same words for a different model year are a different car
+    older = key(DESCRIPTION, spec=("toyota", "camry", "2017", "60000", "good", "us"))
+    assert index.canonical_key(older) == older
+
+
+def test_evicted_representatives_leave_the_index():
+    index = NearDuplicateIndex(threshold=0.8, max_entries=2)
+    first = key(DESCRIPTION)
+    index.canonical_key(first)
+    index.canonical_key(key("Blue Camry with leather seats, sunroof and a clean title, garage kept"))
+    index.canonical_key(key("Camry hybrid with navigation, heated seats and adaptive cruise control"))
+
+    assert index.stats()["representatives"] == 2
+    assert first not in index._signatures
+    assert all(first not in members for members in index._buckets.values())
+    assert all(index._buckets.values())  # no empty buckets are left behind
+    # A new near-duplicate of the evicted description becomes a representative itself
+    variant = key(DESCRIPTION + "!")
+    index._aliases.clear()
+    assert index.canonical_key(variant) == variant
+
+
+def test_disabled_index_returns_keys_unchanged():
+    index = NearDuplicateIndex(threshold=1.0)
+    assert not index.enabled
+    index.canonical_key(key(DESCRIPTION))
+    variant = key(DESCRIPTION.upper())
+    assert index.canonical_key(variant) == variant
@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+from backend.services.persistent_cache import PersistentCache, SQLiteStore
+
+
+def test_writes_are_queued_and_read_back_by_another_cache(tmp_path):
+    store = SQLiteStore(str(tmp_path / "results.sqlite3"))
+    writer = PersistentCache(10, 60, name="price", store=store)
+    writer.set(("audi", "a4"), {"min": 1})
+    store.flush()
+
+    reader = PersistentCache(10, 60, name="price", store=store)
+    assert reader.get(("audi", "a4")) is None  # memory only
+    assert asyncio.run(reader.aget(("audi", "a4"))) == {"min": 1}
+    assert reader.get(("audi", "a4")) == {"min": 1}  # promoted into memory
+    assert reader.disk_hits == 1
+    store.close()
+
+
+def test_close_applies_pending_writes(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    store = SQLiteStore(path)
+    cache = PersistentCache(100, 60, name="extract", store=store)
+    for i in range(50):
+        cache.set(f"description {i}", {"make": "Honda"})
+    store.close()
+
+    assert len(SQLiteStore(path).items("extract")) == 50
+
+
+def test_background_compaction_bounds_entries(tmp_path):
+    store = SQLiteStore(str(tmp_path / "results.sqlite3"), compact_interval=0.05)
+    cache = PersistentCache(100, 60, name="profile", store=store)
+    store.register("profile", 5)
+    for i in range(20):
+        cache.set(f"car {i}", {"name": str(i)})
+    store.flush()
+    deadline = time.monotonic() + 2
+    while store.count("profile") != 5 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert len(store.items("profile")) == 5
+    assert store.count("profile") == 5
+    store.close()
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from backend.models.schemas import CarDetails, PriceEstimateRequest
+from backend.services import persistent_cache, price_estimation
+from backend.services.admission import Overloaded
+from backend.services.depreciation_model import LocalEstimate
+from backend.services.price_estimation import PriceEstimationService
+
+CAR = CarDetails(make="Audi", model="A4", year="2018", mileage="50000 km", location="US",
+                 condition="good", raw_description="2018 Audi A4 test")
+
+
+@pytest.fixture
+def service(monkeypatch):
+    # Memory caches only and no local model, so every estimate reaches the router
+    monkeypatch.setattr(persistent_cache, "RESULT_CACHE_PATH", "")
+    monkeypatch.setattr(persistent_cache, "_store", None)
+    monkeypatch.setattr(price_estimation, "DEPRECIATION_MODEL_PATH", "")
+    return PriceEstimationService()
+
+
+def failing(service):
+    async def invoke(task, budget, messages, accept=None):
+        raise RuntimeError("provider down")
+    service.router.invoke = invoke
+
+
+def test_provider_failure_is_an_outage_not_a_zero_price(service):
+    failing(service)
+    with pytest.raises(Overloaded) as raised:
+        asyncio.run(service.estimate_price(PriceEstimateRequest(car_details=CAR)))
+    assert raised.value.status_code == 502
+    assert raised.value.retry_after > 0
+    assert len(service.cache) == 0
+
+
+def test_batch_returns_provider_failure_per_item(service):
+    failing(service)
+    [result] = asyncio.run(service.estimate_prices([CAR]))
+    assert isinstance(result, Overloaded) and result.status_code == 502
+
+
+def test_local_estimate_quotes_the_requested_mileage(service):
+    class Model:
+        def predict_keys(self, keys):
+            return [LocalEstimate(currency="$", min_price=18000, max_price=22000, most_likely_price=20000,
+                                  interval=0.05, age=7, mileage_km=50000) for _ in keys]
+    service.local_model = Model()
+
+    car = CAR.model_copy(update={"mileage": "52,345", "mileage_unit": "miles"})
+    result = asyncio.run(service.estimate_price(PriceEstimateRequest(car_details=car)))
+    assert result.factors["Mileage"] == "52,345 miles"
+    assert asyncio.run(service.estimate_price(PriceEstimateRequest(car_details=CAR))).factors["Mileage"] == "50000 km"
@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import time
+
+import anyio
+
+from backend.utils.metrics import stage_timer
+from backend.utils.profiling import StackSampler, server_timing
+
+
+def _blocking_work(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_sampler_sees_blocking_work_in_anyio_worker_threads():
+    sampler = StackSampler(threading.get_ident(), 0.002)
+
+    async def main():
+        # A parked worker thread, then blocking work on another one
+        await anyio.to_thread.run_sync(lambda: None)
+        sampler.start()
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(anyio.to_thread.run_sync, _blocking_work, 0.2)
+            tg.start_soon(anyio.to_thread.run_sync, time.sleep, 0.2)
+        sampler.stop()
+
+    anyio.run(main)
+    stacks = list(sampler.samples)
+    assert any(stack.startswith("AnyIO worker thread") and "_blocking_work" in stack for stack in stacks)
+    # A worker blocked in a sleep is shown, parked workers and the sampler are not
+    assert any(stack.startswith("AnyIO worker thread") and "_blocking_work" not in stack for stack in stacks)
+    assert not any("get (queue.py" in stack for stack in stacks)
+    assert not any(stack.startswith("carmatch-profiler") for stack in stacks)
+
+
+def test_server_timing_sums_repeated_stages():
+    timings = {("compare_profile", "llm"): [0.2, 2], ("compare", "total"): [0.25, 1]}
+    assert server_timing(timings, "a.folded") == (
+        'compare_profile.llm;dur=200.00;desc="2 runs", compare.total;dur=250.00, flame;desc="a.folded"'
+    )
+
+
+def test_server_timing_includes_the_log_stage(monkeypatch):
+    from backend.main import RequestContextMiddleware
+    from backend.utils import profiling
+    from backend.utils.log import set_endpoint
+
+    monkeypatch.setattr(profiling, "PROFILING_HEADER_ENABLED", True)
+
+    async def endpoint(scope, receive, send):
+        set_endpoint("price")
+        with stage_timer("price", "total"):
+            pass
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    app = RequestContextMiddleware(profiling.ProfilingMiddleware(endpoint))
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"x-profile", b"timing")]}
+    asyncio.run(app(scope, None, send))
+    header = dict(sent[0]["headers"])[b"server-timing"].decode()
+    assert "price.total;dur=" in header and "price.log;dur=" in header
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from backend.services.singleflight import SingleFlight
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_calls_share_one_execution():
+    async def main():
+        flights = SingleFlight("test")
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "result"
+
+        results = await asyncio.gather(*(flights.do("key", work) for _ in range(5)))
+        assert results == ["result"] * 5
+        assert calls == 1
+        assert flights.stats()["collapsed"] == 4
+        assert flights.stats()["in_flight"] == 0
+
+    run(main())
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    async def main():
+        flights = SingleFlight("test")
+        calls = 0
+
+        async def failing():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        results = await asyncio.gather(*(flights.do("key", failing) for _ in range(3)), return_exceptions=True)
+        assert calls == 1
+        assert all(isinstance(r, ValueError) for r in results)
+
+        # The failure is forgotten, so the next call tries again
+        with pytest.raises(ValueError):
+            await flights.do("key", failing)
+        assert calls == 2
+
+    run(main())
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_call():
+    async def main():
+        flights = SingleFlight("test")
+        finished = asyncio.Event()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            finished.set()
+            return "result"
+
+        leader = asyncio.create_task(flights.do("key", work))
+        follower = asyncio.create_task(flights.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == "result"
+        assert finished.is_set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    run(main())
+
+
+def test_call_finishes_when_every_caller_is_cancelled():
+    async def main():
+        flights = SingleFlight("test")
+        finished = asyncio.Event()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            finished.set()
+            raise RuntimeError("nobody is listening")
+
+        caller = asyncio.create_task(flights.do("key", failing))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.wait_for(finished.wait(), 1)
+        await asyncio.sleep(0)
+        assert flights.stats()["in_flight"] == 0
+
+    loop_errors = []
+    loop = asyncio.new_event_loop()
+    loop.set_exception_handler(lambda _, context: loop_errors.append(context))
+    try:
+        loop.run_until_complete(main())
+    finally:
+        loop.close()
+    # The orphaned exception was retrieved, so asyncio reports nothing
+    assert not loop_errors
+
+
+def test_different_keys_run_separately():
+    async def main():
+        flights = SingleFlight("test")
+
+        async def work(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(flights.do("a", lambda: work(1)), flights.do("b", lambda: work(2)))
+        assert results == [1, 2]
+        assert flights.stats()["upstream_calls"] == 2
+
+    run(main())
@@ -0,0 +1,80 @@
+"""Train the local depreciation model from accumulated LLM appraisals.
+
+Reads every price estimate in the persistent result store (the ``price``
+namespace of RESULT_CACHE_PATH, filled by the API and by
+``backend.bulk_appraise``), holds out a share of them to report accuracy,
+coverage and scoring latency, then refits on everything and writes the
+model to DEPRECIATION_MODEL_PATH. Running workers pick it up on restart.
+
+    python -m backend.train_price_model --holdout 0.2
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from typing import Optional
+
+from backend.services.depreciation_model import evaluate, fit, load_training_samples
+from backend.services.persistent_cache import get_store
+from backend.utils.settings import (
+    DEPRECIATION_MAX_INTERVAL,
+    DEPRECIATION_MIN_SAMPLES,
+    DEPRECIATION_MODEL_PATH
+)
+
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description="Train the local price model from cached LLM appraisals")
+    parser.add_argument("--output", default=DEPRECIATION_MODEL_PATH, help="model file to write")
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of appraisals held out for the report")
+    parser.add_argument("--min-samples", type=int, default=DEPRECIATION_MIN_SAMPLES,
+                        help="appraisals a make/model or region needs to get its own coefficient")
+    parser.add_argument("--ridge", type=float, default=1.0, help="ridge penalty")
+    parser.add_argument("--max-interval", type=float, default=DEPRECIATION_MAX_INTERVAL,
+                        help="interval width the report counts as answerable locally")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the holdout split")
+    parser.add_argument("--dry-run", action="store_true", help="report without writing the model")
+    args = parser.parse_args(argv)
+
+    store = get_store()
+    if store is None:
+        print("No result store; set RESULT_CACHE_PATH to the cache the API writes", file=sys.stderr)
+        return 1
+    samples, skipped = load_training_samples(store.items("price"))
+    if skipped:
+        print(f"Skipped {skipped} malformed appraisals", file=sys.stderr)
+    if not samples:
+        print(f"No price appraisals in {store.path} yet", file=sys.stderr)
+        return 1
+
+    random.Random(args.seed).shuffle(samples)
+    cut = int(len(samples) * (1 - args.holdout))
+    train, holdout = samples[:cut], samples[cut:]
+
+    report = {"appraisals": len(samples), "skipped_rows": skipped}
+    try:
+        if holdout:
+            started = time.perf_counter()
+            model = fit(train, args.min_samples, args.ridge)
+            report["fit_seconds"] = round(time.perf_counter() - started, 4)
+            report.update(evaluate(model, holdout, args.max_interval))
+
+        model = fit(samples, args.min_samples, args.ridge)
+    except ValueError as e:
+        print(f"Cannot train: {e}", file=sys.stderr)
+        return 1
+
+    model.meta["report"] = report
+    summary = {**model.stats(), **report}
+    summary.pop("report")
+    print(json.dumps(summary, indent=2))
+
+    if not args.dry_run:
+        model.save(args.output)
+        print(f"Wrote {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import re
+from typing import Optional, Tuple
+
+from backend.models.schemas import CarDetails
+from backend.utils.settings import PRICE_CACHE_MILEAGE_BUCKET_KM
+
+KM_PER_MILE = 1.609344
+
+# Location keywords mapped to the currency region the price prompt would pick.
+# Checked in order, so more specific names come before generic ones.
+CURRENCY_REGIONS = [
+    ("CAD", ["canada", "canadian", "ontario", "quebec", "british columbia", "alberta",
+             "manitoba", "saskatchewan", "nova scotia", "toronto", "vancouver",
+             "montreal", "calgary", "ottawa", "edmonton", "winnipeg"]),
+    ("AUD", ["australia", "australian", "sydney", "melbourne", "brisbane", "perth",
+             "adelaide", "canberra", "queensland", "new south wales", "tasmania"]),
+    ("GBP", ["united kingdom", "uk", "england", "scotland", "wales", "britain",
+             "british", "london", "manchester", "birmingham", "glasgow", "edinburgh",
+             "liverpool", "leeds"]),
+    ("INR", ["india", "indian", "mumbai", "delhi", "bangalore", "bengaluru", "chennai",
+             "hyderabad", "kolkata", "pune", "ahmedabad"]),
+    ("JPY", ["japan", "japanese", "tokyo", "osaka", "kyoto", "yokohama", "nagoya"]),
+    ("EUR", ["europe", "european", "germany", "france", "italy", "spain", "netherlands",
+             "belgium", "austria", "portugal", "ireland", "finland", "greece",
+             "berlin", "munich", "paris", "rome", "milan", "madrid", "barcelona",
+             "amsterdam", "brussels", "vienna", "lisbon", "dublin"]),
+    ("USD", ["usa", "us", "united states", "america", "american", "new york",
+             "california", "texas", "florida", "illinois", "washington", "chicago",
+             "los angeles", "houston", "phoenix", "seattle", "boston", "miami",
+             "dallas", "atlanta", "denver"]),
+]
+
+_REGION_PATTERNS = [
+    (region, re.compile(r"\b(?:" + "|".join(re.escape(k) for k in keywords) + r")\b"))
+    for region, keywords in CURRENCY_REGIONS
+]
+
+_WHITESPACE = re.compile(r"\s+")
+_MILEAGE_NUMBER = re.compile(r"(\d+(?:\.\d+)?)\s*(k)?\b", re.IGNORECASE)
+_YEAR = re.compile(r"\b(19|20)\d{2}\b")
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """Lowercase and collapse whitespace so cosmetic differences compare equal"""
+    if not value:
+        return ""
+    return _WHITESPACE.sub(" ", value).strip().casefold()
+
+
+def resolve_currency_region(location: Optional[str]) -> str:
+    """Map a free-text location to a currency region code.
+
+    Unrecognised locations fall back to their normalized text, so two
+    different unknown places never share a cache entry.
+    """
+    text = normalize_text(location)
+    if not text:
+        return "USD"
+
+    for region, pattern in _REGION_PATTERNS:
+        if pattern.search(text):
+            return region
+    return f"loc:{text}"
+
+
+def mileage_bucket_km(mileage: Optional[str], unit: Optional[str]) -> str:
+    """Convert a mileage reading to kilometres and round it down to a bucket"""
+    text = normalize_text(mileage)
+    if not text:
+        return ""
+
+    match = _MILEAGE_NUMBER.search(text.replace(",", ""))
+    if not match:
+        return text
+
+    value = float(match.group(1))
+    if match.group(2):
+        value *= 1000
+
+    unit_text = normalize_text(unit) or "miles"
+    if "km" in text or unit_text.startswith("k"):
+        km = value
+    else:
+        km = value * KM_PER_MILE
+
+    bucket = PRICE_CACHE_MILEAGE_BUCKET_KM
+    return str(int(km // bucket) * bucket) if bucket > 0 else str(int(km))
+
+
+def canonical_year(year: Optional[str]) -> str:
+    text = normalize_text(year)
+    match = _YEAR.search(text)
+    return match.group(0) if match else text
+
+
+def canonical_car_key(car: CarDetails) -> Tuple[str, ...]:
+    """Build a hashable key that is equal for equivalent price requests"""
+    return (
+        normalize_text(car.make),
+        normalize_text(car.model),
+        canonical_year(car.year),
+        mileage_bucket_km(car.mileage, car.mileage_unit),
+        normalize_text(car.condition),
+        resolve_currency_region(car.location),
+        normalize_text(car.engine),
+        normalize_text(car.transmission),
+        normalize_text(car.fuel_type),
+        normalize_text(car.features),
+        normalize_text(car.raw_description),
+    )
@@ -0,0 +1,98 @@
+import gzip
+from typing import List, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+from backend.utils.settings import (
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_MIN_BYTES,
+    RESPONSE_COMPRESSION
+)
+
+# Brotli quality 4 compresses JSON better than gzip -6 at a similar CPU cost
+_BROTLI_QUALITY = 4
+
+
+def _accepted(accept_encoding: str) -> List[str]:
+    """Encodings a client accepts, ignoring those it disables with q=0"""
+    accepted = []
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.append(name.strip().lower())
+    return accepted
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """Compresses complete responses with brotli or gzip, as the client accepts.
+
+    Encodings are tried in RESPONSE_COMPRESSION order; ``br`` is skipped when
+    the brotli package is missing. Bodies under COMPRESSION_MIN_BYTES, already
+    encoded responses and streamed responses (server-sent events must reach
+    the client as they are produced) are sent as they are.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.encodings = [e for e in RESPONSE_COMPRESSION if e == "gzip" or (e == "br" and brotli is not None)]
+
+    def _choose(self, scope) -> Optional[str]:
+        accept = dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1")
+        accepted = _accepted(accept)
+        for encoding in self.encodings:
+            if encoding in accepted or "*" in accepted:
+                return encoding
+        return None
+
+    async def __call__(self, scope, receive, send):
+        encoding = self._choose(scope) if scope["type"] == "http" and self.encodings else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = dict(start.get("headers", []))
+            if (message.get("more_body") or len(body) < COMPRESSION_MIN_BYTES
+                    or b"content-encoding" in headers):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            vary = headers.get(b"vary")
+            start["headers"] = [
+                (name, value) for name, value in start.get("headers", [])
+                if name not in (b"content-length", b"vary")
+            ] + [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(compressed)).encode("latin-1")),
+                (b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"),
+            ]
+            passthrough = True
+            await send(start)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
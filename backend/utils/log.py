@@ -0,0 +1,174 @@
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from backend.utils.settings import (
+    LOG_FORMAT,
+    LOG_LEVEL,
+    LOG_PAYLOAD_MAX_CHARS,
+    LOG_PAYLOAD_SAMPLE_RATE,
+    LOG_QUEUE_SIZE
+)
+
+# Per-request state: the request ID, the endpoint it maps to, and the time
+# spent handing log records to the queue (reported as the "log" stage)
+_request: ContextVar[Optional[dict]] = ContextVar("carmatch_request", default=None)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional["_NonBlockingQueueHandler"] = None
+
+
+def begin_request(request_id: Optional[str] = None) -> dict:
+    """Start the log context of a request; returns it so the caller can read the totals"""
+    context = {"request_id": request_id or uuid.uuid4().hex, "endpoint": None, "log_seconds": 0.0}
+    _request.set(context)
+    return context
+
+
+def set_endpoint(endpoint: str) -> None:
+    context = _request.get()
+    if context is not None and context["endpoint"] is None:
+        context["endpoint"] = endpoint
+
+
+def current_request_id() -> Optional[str]:
+    context = _request.get()
+    return context["request_id"] if context else None
+
+
+def current_log_seconds() -> Optional[Tuple[str, float]]:
+    """(endpoint, seconds spent logging so far) for the current request, once it has an endpoint"""
+    context = _request.get()
+    if context is None or context["endpoint"] is None:
+        return None
+    return context["endpoint"], context["log_seconds"]
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records without waiting; formatting and I/O happen on the listener thread.
+
+    A full queue drops the record (counted in ``dropped``) instead of
+    blocking the event loop.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Capture what only the emitting task knows; leave the formatting to the listener
+        context = _request.get()
+        record.request_id = context["request_id"] if context else None
+        record.endpoint = context["endpoint"] if context else None
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        started = time.perf_counter()
+        try:
+            return super().handle(record)
+        finally:
+            context = _request.get()
+            if context is not None:
+                context["log_seconds"] += time.perf_counter() - started
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; fields passed as ``extra={"data": {...}}`` are merged in"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key in ("request_id", "endpoint"):
+            value = getattr(record, key, None)
+            if value:
+                entry[key] = value
+        entry.update(getattr(record, "data", None) or {})
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        record.request_id = getattr(record, "request_id", None) or "-"
+        text = super().format(record)
+        data = getattr(record, "data", None)
+        return f"{text} {json.dumps(data, ensure_ascii=False, default=str)}" if data else text
+
+
+def setup_logging(stream=None) -> None:
+    """Route the ``backend`` loggers through a bounded queue to a writer thread"""
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _handler = _NonBlockingQueueHandler(log_queue)
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+
+    logger = logging.getLogger("backend")
+    logger.setLevel(LOG_LEVEL)
+    logger.addHandler(_handler)
+    logger.propagate = False
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread"""
+    global _listener, _handler
+    if _listener is None:
+        return
+    _listener.stop()
+    logging.getLogger("backend").removeHandler(_handler)
+    _listener = _handler = None
+
+
+def log_payload(logger: logging.Logger, message: str, payload: str, **fields) -> None:
+    """Log a full LLM payload at debug level, or for a LOG_PAYLOAD_SAMPLE_RATE sample of requests"""
+    if logger.isEnabledFor(logging.DEBUG):
+        level = logging.DEBUG
+    elif LOG_PAYLOAD_SAMPLE_RATE > 0 and random.random() < LOG_PAYLOAD_SAMPLE_RATE:
+        level = logging.INFO
+    else:
+        return
+    logger.log(level, message, extra={"data": {
+        **fields,
+        "payload": payload[:LOG_PAYLOAD_MAX_CHARS],
+        "payload_chars": len(payload)
+    }})
+
+
+def log_stats() -> dict:
+    return {
+        "queued": _handler.queue.qsize() if _handler else 0,
+        "dropped": _handler.dropped if _handler else 0
+    }
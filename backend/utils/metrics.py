@@ -0,0 +1,209 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest
+)
+
+from backend.utils.log import set_endpoint
+from backend.utils.profiling import record_stage
+from backend.utils.settings import LLM_PRICING
+
+# Stage durations range from microseconds (cache hits, parsing) to tens of seconds (LLM calls)
+STAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "carmatch_stage_seconds",
+    "Time spent in each stage of an API request",
+    ["endpoint", "stage"],
+    buckets=STAGE_BUCKETS
+)
+
+LLM_TOKENS = Counter(
+    "carmatch_llm_tokens_total",
+    "LLM tokens consumed, by endpoint and kind (prompt, cached_prompt or completion)",
+    ["endpoint", "kind"]
+)
+
+LLM_COST = Counter(
+    "carmatch_llm_cost_usd_total",
+    "Estimated LLM spend in US dollars",
+    ["endpoint"]
+)
+
+LLM_CALLS = Counter(
+    "carmatch_llm_calls_total",
+    "Upstream LLM calls, by endpoint and outcome",
+    ["endpoint", "outcome"]
+)
+
+LLM_RETRIES = Counter(
+    "carmatch_llm_retries_total",
+    "LLM calls retried after a transient failure",
+    ["endpoint"]
+)
+
+LLM_HEDGES = Counter(
+    "carmatch_llm_hedges_total",
+    "Hedged LLM calls by outcome (fired, won: the hedge answered first, lost: the original did)",
+    ["endpoint", "outcome"]
+)
+
+LLM_IN_FLIGHT = Gauge(
+    "carmatch_llm_in_flight",
+    "LLM calls currently awaiting a response",
+    multiprocess_mode="livesum"
+)
+
+LLM_POOL_CONNECTIONS = Gauge(
+    "carmatch_llm_pool_connections",
+    "Connections in the shared LLM HTTP pool by state (active, idle) and requests queued for one",
+    ["state"],
+    multiprocess_mode="livesum"
+)
+
+ADMISSION_DECISIONS = Counter(
+    "carmatch_admission_total",
+    "Admission decisions by endpoint and outcome (admitted, queued, rejected_rate, rejected_queue, timeout)",
+    ["endpoint", "outcome"]
+)
+
+CACHE_LOOKUPS = Counter(
+    "carmatch_cache_lookups_total",
+    "Cache lookups, by cache and result (hit or miss)",
+    ["cache", "result"]
+)
+
+COALESCED_CALLS = Counter(
+    "carmatch_coalesced_calls_total",
+    "Single-flight calls, by endpoint and role (leader ran the call, follower shared it)",
+    ["endpoint", "role"]
+)
+
+EXTRACT_PATHS = Counter(
+    "carmatch_extract_path_total",
+    "Detail extractions, by the path that answered (rules or llm)",
+    ["path"]
+)
+
+NEAR_DUP_SAVED = Counter(
+    "carmatch_near_duplicate_saved_calls_total",
+    "Cache hits, and so LLM calls saved, that only matched through a near-duplicate description",
+    ["cache"]
+)
+
+PRICE_PATHS = Counter(
+    "carmatch_price_path_total",
+    "Price estimates not served from the cache, by the path that answered (model or llm)",
+    ["path"]
+)
+
+
+ROUTER_DECISIONS = Counter(
+    "carmatch_router_decisions_total",
+    "Model tier chosen per LLM call, by task, tier and reason (budget, latency, quality or probe)",
+    ["task", "tier", "reason"]
+)
+
+ROUTER_ESCALATIONS = Counter(
+    "carmatch_router_escalations_total",
+    "LLM outputs rejected by the caller and regenerated on a larger tier",
+    ["task", "from_tier", "to_tier"]
+)
+
+TIER_SECONDS = Histogram(
+    "carmatch_llm_tier_seconds",
+    "LLM call duration per task and model tier, including retries",
+    ["task", "tier"],
+    buckets=STAGE_BUCKETS
+)
+
+@contextmanager
+def stage_timer(endpoint: str, stage: str):
+    """Observe the duration of a block in the stage histogram (and the Server-Timing of profiled requests)"""
+    if stage == "total":
+        # The request's outermost stage names its endpoint for the log context
+        set_endpoint(endpoint)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(endpoint, stage).observe(elapsed)
+        record_stage(endpoint, stage, elapsed)
+
+
+# Token usage and estimated spend per endpoint, for /health and the bulk appraisal CLI
+_usage_totals: Dict[str, Dict[str, float]] = {}
+_NO_USAGE = {"prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+
+
+def record_token_usage(endpoint: str, model: Optional[str], usage: Optional[dict]) -> None:
+    """Count prompt/completion tokens and their estimated cost.
+
+    ``cached_prompt`` tokens are the part of the prompt the provider read from
+    its prefix cache; they are included in ``prompt`` and billed at the
+    model's cached input price.
+    """
+    if not usage:
+        return
+
+    prompt_tokens = usage.get("prompt_tokens") or 0
+    completion_tokens = usage.get("completion_tokens") or 0
+    cached_tokens = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    LLM_TOKENS.labels(endpoint, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(endpoint, "cached_prompt").inc(cached_tokens)
+    LLM_TOKENS.labels(endpoint, "completion").inc(completion_tokens)
+
+    totals = _usage_totals.setdefault(endpoint, dict(_NO_USAGE))
+    totals["prompt_tokens"] += prompt_tokens
+    totals["cached_tokens"] += cached_tokens
+    totals["completion_tokens"] += completion_tokens
+
+    pricing = LLM_PRICING.get(model or "") or LLM_PRICING.get("default")
+    if pricing:
+        input_price, output_price, *cached = pricing
+        cached_price = cached[0] if cached else input_price
+        cost = ((prompt_tokens - cached_tokens) * input_price + cached_tokens * cached_price
+                + completion_tokens * output_price) / 1_000_000
+        LLM_COST.labels(endpoint).inc(cost)
+        totals["cost_usd"] += cost
+
+
+def usage_totals(endpoint: str) -> Dict[str, float]:
+    """Tokens and estimated spend recorded for an endpoint in this process"""
+    return dict(_usage_totals.get(endpoint) or _NO_USAGE)
+
+
+def prompt_cache_stats() -> dict:
+    """Share of prompt tokens served from the provider's prefix cache, per endpoint"""
+    return {
+        endpoint: {
+            "prompt_tokens": totals["prompt_tokens"],
+            "cached_tokens": totals["cached_tokens"],
+            "hit_ratio": round(totals["cached_tokens"] / totals["prompt_tokens"], 4) if totals["prompt_tokens"] else 0.0
+        }
+        for endpoint, totals in _usage_totals.items()
+    }
+
+
+def render_metrics() -> tuple:
+    """Return (body, content type) for the /metrics endpoint.
+
+    With PROMETHEUS_MULTIPROC_DIR set (several uvicorn workers) the metrics
+    of all worker processes are aggregated.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
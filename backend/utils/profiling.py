@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from backend.utils.log import current_log_seconds, current_request_id
+from backend.utils.settings import (
+    PROFILING_DIR,
+    PROFILING_HEADER_ENABLED,
+    PROFILING_INTERVAL_MS,
+    PROFILING_MAX_FILES,
+    PROFILING_SAMPLE_RATE
+)
+
+logger = logging.getLogger(__name__)
+
+# Stage durations of the current request, (endpoint, stage) -> [seconds, count];
+# None when the request is not profiled, so stage_timer only pays for a lookup
+_timings: ContextVar[Optional[Dict[Tuple[str, str], list]]] = ContextVar("carmatch_timings", default=None)
+
+# One stack sampler at a time: it samples whole threads, not a single request
+_sampler_lock = threading.Lock()
+
+_stats = {"profiled": 0, "flame_graphs": 0, "flame_busy": 0}
+
+# Request IDs come from clients; only these characters reach a file name
+_UNSAFE_NAME = re.compile(r"[^A-Za-z0-9_-]")
+
+
+def record_stage(endpoint: str, stage: str, seconds: float) -> None:
+    """Add a stage duration to the request's Server-Timing, when it is profiled"""
+    timings = _timings.get()
+    if timings is None:
+        return
+    entry = timings.get((endpoint, stage))
+    if entry is None:
+        timings[(endpoint, stage)] = [seconds, 1]
+    else:
+        entry[0] += seconds
+        entry[1] += 1
+
+
+def server_timing(timings: Dict[Tuple[str, str], list], flame_file: Optional[str] = None) -> str:
+    """Server-Timing header value: one ``endpoint.stage`` metric per stage, in milliseconds.
+
+    Stages that ran more than once (e.g. one LLM call per car) are summed,
+    with the number of runs as the description.
+    """
+    metrics = []
+    for (endpoint, stage), (seconds, count) in timings.items():
+        metric = f"{endpoint}.{stage};dur={seconds * 1000:.2f}"
+        if count > 1:
+            metric += f';desc="{count} runs"'
+        metrics.append(metric)
+    if flame_file:
+        metrics.append(f'flame;desc="{flame_file}"')
+    return ", ".join(metrics)
+
+
+# Main loops of threads that park on a work queue: AnyIO workers ("run"), the log
+# listener ("_monitor") and the cache writer ("_run")
+_WORKER_LOOPS = {"run", "_monitor", "_run"}
+
+
+def _is_idle(frame) -> bool:
+    """Whether a thread is waiting for work rather than blocked inside some"""
+    code = frame.f_code
+    if code.co_name == "_worker" and code.co_filename.endswith("thread.py"):
+        return True  # executor worker parked in its C-level queue
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == "get" and code.co_filename.endswith("queue.py"):
+            return frame.f_back is not None and frame.f_back.f_code.co_name in _WORKER_LOOPS
+        frame = frame.f_back
+    return False
+
+
+class StackSampler:
+    """Samples the stacks of every busy thread into folded stacks.
+
+    The output is the collapsed format ("frame;frame;frame count" per line)
+    that flamegraph.pl, speedscope and inferno render as flame graphs. Besides
+    the event loop, this covers blocking work in thread pools (sync FastAPI
+    dependencies, ``asyncio.to_thread`` and AnyIO worker threads); threads
+    waiting for work are left out. The event loop serves every in-flight
+    request, so the profile of a request also holds whatever else the worker
+    ran meanwhile; it is clearest under low load.
+    """
+
+    def __init__(self, loop_thread: int, interval: float):
+        self.loop_thread = loop_thread
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="carmatch-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == self._thread.ident or (ident != self.loop_thread and _is_idle(frame)):
+                continue
+            name = names.get(ident, f"thread-{ident}")
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            stack.append(name)
+            self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _prune(directory: str, keep: int) -> None:
+    """Delete all but the newest ``keep`` profiles"""
+    profiles = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith(".folded")),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in profiles[:max(len(profiles) - keep, 0)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def _save(sampler: StackSampler, path: str) -> None:
+    sampler.stop()
+    sampler.write(path)
+    _prune(os.path.dirname(path), PROFILING_MAX_FILES)
+
+
+def _requested_mode(scope) -> Optional[str]:
+    """The profiling mode of a request: "flame", "timing" or None"""
+    if PROFILING_HEADER_ENABLED:
+        value = dict(scope["headers"]).get(b"x-profile", b"").decode("latin-1").strip().lower()
+        if value == "flame":
+            return "flame"
+        if value in ("1", "true", "timing"):
+            return "timing"
+    if PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE:
+        return "flame"
+    return None
+
+
+class ProfilingMiddleware:
+    """Profiles requests that ask for it with X-Profile, and a sample of the rest.
+
+    Profiled responses get a Server-Timing header with the duration of each
+    stage recorded by ``stage_timer`` before the response started (for a
+    streamed comparison, only the stages before the first event), plus the
+    "log" stage: time spent enqueueing log records up to that point. Flame
+    profiles go to PROFILING_DIR, named after the request ID; the header
+    names the file.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        mode = _requested_mode(scope) if scope["type"] == "http" else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        _stats["profiled"] += 1
+        timings: Dict[Tuple[str, str], list] = {}
+        token = _timings.set(timings)
+        sampler, flame_file = None, None
+        if mode == "flame" and PROFILING_DIR:
+            if _sampler_lock.acquire(blocking=False):
+                sampler = StackSampler(threading.get_ident(), PROFILING_INTERVAL_MS / 1000)
+                request_id = _UNSAFE_NAME.sub("_", current_request_id() or "request")
+                flame_file = f"{time.strftime('%Y%m%dT%H%M%S')}-{request_id}.folded"
+                sampler.start()
+            else:
+                _stats["flame_busy"] += 1
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                logged = current_log_seconds()
+                if logged is not None:
+                    endpoint, seconds = logged
+                    record_stage(endpoint, "log", seconds)
+                header = server_timing(timings, flame_file)
+                if header:
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            if sampler is not None:
+                try:
+                    await asyncio.to_thread(_save, sampler, os.path.join(PROFILING_DIR, flame_file))
+                    _stats["flame_graphs"] += 1
+                except OSError as e:
+                    logger.warning("Could not write profile %s: %s", flame_file, e)
+                finally:
+                    _sampler_lock.release()
+
+
+def profiling_stats() -> dict:
+    return {
+        "header_enabled": PROFILING_HEADER_ENABLED,
+        "sample_rate": PROFILING_SAMPLE_RATE,
+        "flame_dir": PROFILING_DIR or None,
+        **_stats
+    }
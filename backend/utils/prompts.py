@@ -1,93 +1,163 @@
-CAR_COMPARISON_PROMPT = """
-You are an expert automotive analyst. Compare two cars based on the provided details and give a comprehensive analysis.
-
-Car 1 Details: {car1_details}
-Car 2 Details: {car2_details}
+# Comparison categories in prompt order: (summary key, section title)
+COMPARISON_CATEGORIES = [
+    ("performance", "Performance and Engine Specifications"),
+    ("fuel_efficiency", "Fuel Efficiency and Running Costs"),
+    ("features", "Features and Technology"),
+    ("safety", "Safety and Reliability"),
+    ("resale", "Resale Value"),
+    ("value", "Overall Value for Money"),
+]
+
+# Every template keeps its static instructions first and the per-request data
+# last, and the system prompts below are shared constants, so calls of one kind
+# start with a byte-identical prefix the provider can serve from its prompt
+# cache. Keep request data out of the leading text when editing them.
+COMPARISON_SYSTEM_PROMPT = "You are an expert automotive consultant providing detailed car comparisons."
+PRICE_SYSTEM_PROMPT = "You are a professional car appraiser with 20+ years of experience in automotive valuation."
+EXTRACTION_SYSTEM_PROMPT = "You are an expert at extracting car specifications from descriptions."
+
+# The comparison prompt is assembled from per-category fragments, so a request
+# for a few categories asks for (and pays for) only those. Sections keep their
+# numbers from COMPARISON_CATEGORIES, which is how the parsers identify them.
+CAR_COMPARISON_HEADER = """
+You are an expert automotive analyst. Compare the two cars whose details are given at the end and give a comprehensive analysis.
 
 Provide a detailed comparison in the following format. Keep points concise and use actual car names:
+"""
 
-**1. Performance and Engine Specifications**
+# Per category: (what to list for each car, what the winner line judges)
+COMPARISON_CATEGORY_FRAGMENTS = {
+    "performance": ("Brief engine specs and performance highlights (2-3 key points max)",
+                    "Which car performs better and brief reason"),
+    "fuel_efficiency": ("Key fuel economy and cost points (2-3 points max)",
+                        "Which car is more efficient and brief reason"),
+    "features": ("Notable features and tech (2-3 key points max)",
+                 "Which car has better features and brief reason"),
+    "safety": ("Safety ratings and reliability notes (2-3 points max)",
+               "Which car is safer/more reliable and brief reason"),
+    "resale": ("Resale value assessment (1-2 points max)",
+               "Which car holds value better and brief reason"),
+    "value": ("Value proposition summary (1-2 points max)",
+              "Which car offers better value and brief reason"),
+}
+
+CAR_COMPARISON_SECTION = """
+**{number}. {title}**
 
 [Car 1 Make Model Year]:
-- Brief engine specs and performance highlights (2-3 key points max)
+- {points}
 
 [Car 2 Make Model Year]:
-- Brief engine specs and performance highlights (2-3 key points max)
+- {points}
 
-Winner: [Which car performs better and brief reason]
+Winner: [{winner}]
+"""
 
-**2. Fuel Efficiency and Running Costs**
+CAR_COMPARISON_RECOMMENDATION = """
+**Final Recommendation**
 
-[Car 1 Make Model Year]:
-- Key fuel economy and cost points (2-3 points max)
+Family Use: [Car name] - [Brief reason]
+Daily Commuting: [Car name] - [Brief reason]
+Performance: [Car name] - [Brief reason]
+Budget: [Car name] - [Brief reason]
 
-[Car 2 Make Model Year]:
-- Key fuel economy and cost points (2-3 points max)
+Overall Winner: [Car name] - [One sentence explanation]
+"""
+
+CAR_COMPARISON_FOOTER = """
+IMPORTANT: 
+- Replace [Car 1 Make Model Year] with actual car name (e.g., "Toyota Camry 2023")
+- Replace [Car 2 Make Model Year] with actual car name (e.g., "Honda Accord 2023")
+- Keep each bullet point to one line
+- Be concise but informative
+- Use actual car names throughout, never "Car 1" or "Car 2"
 
-Winner: [Which car is more efficient and brief reason]
+Car 1 Details: {car1_details}
+Car 2 Details: {car2_details}
+"""
 
-**3. Features and Technology**
 
-[Car 1 Make Model Year]:
-- Notable features and tech (2-3 key points max)
+def comparison_prompt(categories=None) -> str:
+    """Comparison template for the given category keys; all of them plus the final recommendation by default"""
+    keys = set(categories or COMPARISON_CATEGORY_FRAGMENTS)
+    sections = [
+        CAR_COMPARISON_SECTION.format(
+            number=number, title=title,
+            points=COMPARISON_CATEGORY_FRAGMENTS[key][0], winner=COMPARISON_CATEGORY_FRAGMENTS[key][1]
+        )
+        for number, (key, title) in enumerate(COMPARISON_CATEGORIES, 1) if key in keys
+    ]
+    recommendation = CAR_COMPARISON_RECOMMENDATION if categories is None else ""
+    return CAR_COMPARISON_HEADER + "".join(sections) + recommendation + CAR_COMPARISON_FOOTER
 
-[Car 2 Make Model Year]:
-- Notable features and tech (2-3 key points max)
 
-Winner: [Which car has better features and brief reason]
+CAR_COMPARISON_PROMPT = comparison_prompt()
 
-**4. Safety and Reliability**
 
-[Car 1 Make Model Year]:
-- Safety ratings and reliability notes (2-3 points max)
+CAR_PROFILE_PROMPT = """
+You are an expert automotive analyst. Write a concise standalone profile of the car described at the end so it can later be compared against any rival.
 
-[Car 2 Make Model Year]:
-- Safety ratings and reliability notes (2-3 points max)
+Use exactly this format and the actual car name:
 
-Winner: [Which car is safer/more reliable and brief reason]
+Vehicle: [Make Model Year]
 
-**5. Resale Value**
+**Performance and Engine Specifications**
+- Engine specs and performance highlights (2-3 key points max)
+Score: [1-10]
 
-[Car 1 Make Model Year]:
-- Resale value assessment (1-2 points max)
+**Fuel Efficiency and Running Costs**
+- Fuel economy and running cost points (2-3 points max)
+Score: [1-10]
 
-[Car 2 Make Model Year]:
-- Resale value assessment (1-2 points max)
+**Features and Technology**
+- Notable features and tech (2-3 key points max)
+Score: [1-10]
 
-Winner: [Which car holds value better and brief reason]
+**Safety and Reliability**
+- Safety ratings and reliability notes (2-3 points max)
+Score: [1-10]
 
-**6. Overall Value for Money**
+**Resale Value**
+- Resale value assessment (1-2 points max)
+Score: [1-10]
 
-[Car 1 Make Model Year]:
+**Overall Value for Money**
 - Value proposition summary (1-2 points max)
+Score: [1-10]
+
+IMPORTANT:
+- Keep each bullet point to one line
+- Scores are absolute for the car's market segment, not relative to any other car
+- Use the actual car name, never "this car"
+
+Car Details: {car_details}
+"""
 
-[Car 2 Make Model Year]:
-- Value proposition summary (1-2 points max)
 
-Winner: [Which car offers better value and brief reason]
+CAR_COMPARISON_MERGE_PROMPT = """
+You are an expert automotive analyst. Using the two car profiles below, write ONLY the final recommendation for a buyer choosing between them.
+
+Respond in exactly this format, using actual car names:
 
 **Final Recommendation**
 
 Family Use: [Car name] - [Brief reason]
-Daily Commuting: [Car name] - [Brief reason]  
+Daily Commuting: [Car name] - [Brief reason]
 Performance: [Car name] - [Brief reason]
 Budget: [Car name] - [Brief reason]
 
 Overall Winner: [Car name] - [One sentence explanation]
 
-IMPORTANT: 
-- Replace [Car 1 Make Model Year] with actual car name (e.g., "Toyota Camry 2023")
-- Replace [Car 2 Make Model Year] with actual car name (e.g., "Honda Accord 2023")
-- Keep each bullet point to one line
-- Be concise but informative
-- Use actual car names throughout, never "Car 1" or "Car 2"
+Car 1 Profile:
+{car1_profile}
+
+Car 2 Profile:
+{car2_profile}
 """
 
 
 CAR_PRICE_ESTIMATION_PROMPT = """
-You are a professional automotive appraiser with 20+ years of international experience. Provide a comprehensive price estimate for the following vehicle:
-
-Vehicle Details: {car_details}
+You are a professional automotive appraiser with 20+ years of international experience. Provide a comprehensive price estimate for the vehicle described at the end.
 
 IMPORTANT: 
 1. Determine the appropriate currency based on the location provided. Use USD as default if location is unclear.
@@ -153,15 +223,47 @@ CRITICAL REQUIREMENTS:
 - Always include the correct currency symbol for the location
 - Provide realistic price ranges (10-20% difference between min/max)
 - Keep all bullet points concise (1-2 sentences max)
+
+Vehicle Details: {car_details}
 """
 
 
+# Compact JSON variants (LLM_OUTPUT_FORMAT=json). The provider constrains the
+# output to the schemas in backend/services/structured_output.py; the prompts
+# explain the fields. {analysis_fields} is empty unless LLM_JSON_ANALYSIS is set.
+CAR_PRICE_ESTIMATION_JSON_PROMPT = """
+You are a professional automotive appraiser with 20+ years of international experience. Estimate the market price of the vehicle described at the end.
 
+Respond with a JSON object with these fields:
+- currency: the currency symbol for the vehicle's location (see below)
+- min_price, max_price: a realistic price range as plain numbers, 10-20% apart
+- most_likely_price: the most likely sale price as a plain number
+- factors: one sentence each on mileage, condition, market_demand, location, depreciation and features
+{analysis_fields}
+Currency by location, USD when the location is unclear: Canada C$, Australia A$, USA $, Europe €, UK £, India ₹, Japan ¥. Never use a plain $ for Canada or Australia.
 
-CAR_DETAILS_EXTRACTION_PROMPT = """
-Extract structured car information from the following description:
+Vehicle Details: {car_details}
+"""
 
-Description: {description}
+PRICE_JSON_ANALYSIS_FIELDS = "- analysis: 2-3 one-sentence bullets each for market_trends, demand_supply, depreciation, location, condition and recommendations\n"
+
+
+CAR_COMPARISON_JSON_PROMPT = """
+You are an expert automotive analyst. Compare the two cars whose details are given at the end.
+
+Respond with a JSON object with these fields:
+- car1_name, car2_name: the actual car names, e.g. "Toyota Camry 2023"
+- categories: one entry per category key ({category_keys}) with the winner's car name (or "Tie") and a one-line reason
+{analysis_fields}{recommendation_field}
+Car 1 Details: {car1_details}
+Car 2 Details: {car2_details}
+"""
+
+COMPARISON_JSON_ANALYSIS_FIELDS = "- in each category, car1_points and car2_points: 1-3 one-line points per car\n"
+COMPARISON_JSON_RECOMMENDATION_FIELD = "- recommendation: family_use, daily_commuting, performance, budget and overall_winner, each as \"[Car name] - [brief reason]\"\n"
+
+CAR_DETAILS_EXTRACTION_PROMPT = """
+Extract structured car information from the description at the end.
 
 Extract and return the following information if available:
 - Make
@@ -178,4 +280,6 @@ Extract and return the following information if available:
 
 If information is not available, indicate "Not specified".
 Format the response clearly with each field on a new line.
+
+Description: {description}
 """
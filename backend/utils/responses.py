@@ -0,0 +1,64 @@
+import json
+from typing import Any, Dict, Optional, Set, Type
+
+from fastapi import HTTPException, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from backend.models.schemas import CompareResponse, PriceEstimateResponse
+from backend.utils.metrics import stage_timer
+
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse as DefaultJSONResponse
+except ImportError:  # orjson is optional; fall back to the standard encoder
+    orjson = None
+    DefaultJSONResponse = JSONResponse
+
+# Long LLM text that slim responses leave out
+BULKY_FIELDS: Dict[Type[BaseModel], Set[str]] = {
+    PriceEstimateResponse: {"market_analysis"},
+    CompareResponse: {"comparison"},
+}
+
+
+def dumps(content: Any) -> str:
+    """Encode plain JSON data, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content).decode("utf-8")
+    return json.dumps(content)
+
+
+def select_fields(model: Type[BaseModel], fields: Optional[str], slim: bool) -> Optional[Set[str]]:
+    """Top-level fields of ``model`` a client asked for, or None for all of them.
+
+    ``fields`` is a comma-separated list; ``slim`` drops the model's bulky
+    text fields. Unknown field names are rejected with a 400.
+    """
+    if fields:
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = requested - set(model.model_fields)
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(sorted(unknown))} (available: {', '.join(model.model_fields)})"
+            )
+        return requested
+    if slim:
+        return set(model.model_fields) - BULKY_FIELDS.get(model, set())
+    return None
+
+
+def json_response(content: Any, endpoint: str, status_code: int = 200, include: Any = None) -> Response:
+    """Serialize a response model or dict to JSON, timed as the endpoint's "serialize" stage.
+
+    ``include`` is passed to ``model_dump_json`` to leave fields out.
+    """
+    with stage_timer(endpoint, "serialize"):
+        if isinstance(content, BaseModel):
+            body = content.model_dump_json(include=include)
+        elif orjson is not None:
+            body = orjson.dumps(content)
+        else:
+            body = json.dumps(content)
+        return Response(content=body, status_code=status_code, media_type="application/json")
@@ -0,0 +1,201 @@
+import json
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# "openai" for the real API, "fake" for the deterministic local stand-in
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai").lower()
+
+# Fake chat model behaviour (LLM_PROVIDER=fake)
+FAKE_LLM_LATENCY_MS = _env_float("FAKE_LLM_LATENCY_MS", 800.0)
+FAKE_LLM_LATENCY_SIGMA = _env_float("FAKE_LLM_LATENCY_SIGMA", 0.5)
+FAKE_LLM_LATENCY_DISTRIBUTION = os.getenv("FAKE_LLM_LATENCY_DISTRIBUTION", "lognormal")
+FAKE_LLM_TOKENS_PER_SECOND = _env_float("FAKE_LLM_TOKENS_PER_SECOND", 80.0)
+FAKE_LLM_SEED = _env_int("FAKE_LLM_SEED", 0)
+# The fake provider simulates prefix caching like OpenAI: prompts of at least
+# this many tokens reuse the longest prefix seen recently, in 128-token steps
+FAKE_LLM_PREFIX_CACHE_MIN_TOKENS = _env_int("FAKE_LLM_PREFIX_CACHE_MIN_TOKENS", 1024)
+
+# USD per million (prompt, completion, cached prompt) tokens, used for cost
+# metrics; without a cached price, cached tokens cost as much as other prompt tokens.
+# Override with LLM_PRICING_JSON='{"gpt-4o": [2.5, 10.0, 1.25]}'.
+LLM_PRICING = {
+    "gpt-4o": (2.5, 10.0, 1.25),
+    "gpt-4o-mini": (0.15, 0.6, 0.075),
+    "default": (2.5, 10.0, 1.25),
+}
+LLM_PRICING.update({
+    model: tuple(prices) for model, prices in json.loads(os.getenv("LLM_PRICING_JSON") or "{}").items()
+})
+
+# Response compression: encodings tried in order when the client accepts them ("br"
+# needs the brotli package), for bodies of at least COMPRESSION_MIN_BYTES. Empty disables it.
+RESPONSE_COMPRESSION = [e.strip().lower() for e in os.getenv("RESPONSE_COMPRESSION", "br,gzip").split(",") if e.strip()]
+COMPRESSION_MIN_BYTES = _env_int("COMPRESSION_MIN_BYTES", 1000)
+COMPRESSION_GZIP_LEVEL = _env_int("COMPRESSION_GZIP_LEVEL", 5)
+
+# Local depreciation model for price estimates, trained from the LLM appraisals in the
+# result store (python -m backend.train_price_model). A car is priced locally when the
+# model knows its make and model and the relative half-width of the 80% prediction
+# interval is within DEPRECIATION_MAX_INTERVAL; otherwise the LLM answers. An empty
+# path or a missing file disables it.
+DEPRECIATION_MODEL_PATH = os.getenv("DEPRECIATION_MODEL_PATH", str(Path(__file__).resolve().parent.parent / ".cache" / "depreciation_model.npz"))
+DEPRECIATION_MAX_INTERVAL = _env_float("DEPRECIATION_MAX_INTERVAL", 0.12)
+DEPRECIATION_MIN_SAMPLES = _env_int("DEPRECIATION_MIN_SAMPLES", 5)
+
+# Service logs go through a bounded in-memory queue to a writer thread, as JSON
+# lines ("json") or plain text ("text"); records are dropped when the queue is full.
+# Full LLM responses are logged at DEBUG level, or for LOG_PAYLOAD_SAMPLE_RATE of requests.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = _env_int("LOG_QUEUE_SIZE", 10000)
+LOG_PAYLOAD_SAMPLE_RATE = _env_float("LOG_PAYLOAD_SAMPLE_RATE", 0.0)
+LOG_PAYLOAD_MAX_CHARS = _env_int("LOG_PAYLOAD_MAX_CHARS", 2000)
+
+# Per-request profiling, for a request with an "X-Profile: timing" or "X-Profile: flame"
+# header (when PROFILING_HEADER_ENABLED) or for PROFILING_SAMPLE_RATE of requests. Profiled
+# responses carry a Server-Timing header with the stage durations; flame requests and
+# sampled requests also write a sampled stack profile to PROFILING_DIR (empty disables it),
+# keeping the newest PROFILING_MAX_FILES.
+PROFILING_HEADER_ENABLED = os.getenv("PROFILING_HEADER_ENABLED", "true").lower() in ("1", "true", "yes")
+PROFILING_SAMPLE_RATE = _env_float("PROFILING_SAMPLE_RATE", 0.0)
+PROFILING_DIR = os.getenv("PROFILING_DIR", "")
+PROFILING_INTERVAL_MS = _env_float("PROFILING_INTERVAL_MS", 2.0)
+PROFILING_MAX_FILES = _env_int("PROFILING_MAX_FILES", 200)
+
+# When to create the API services: "lazy" on first request, "startup" before the
+# app accepts requests, or "background" in a thread right after startup
+SERVICE_PRELOAD = os.getenv("SERVICE_PRELOAD", "background").lower()
+
+# LLM invocation limits
+LLM_TIMEOUT_SECONDS = _env_float("LLM_TIMEOUT_SECONDS", 60.0)
+LLM_MAX_CONCURRENCY = _env_int("LLM_MAX_CONCURRENCY", 100)
+
+# Overall budget for one LLM request including retries and hedges; transient
+# failures are retried up to LLM_MAX_RETRIES times with jittered exponential
+# backoff between LLM_RETRY_BASE_SECONDS and LLM_RETRY_MAX_SECONDS
+LLM_DEADLINE_SECONDS = _env_float("LLM_DEADLINE_SECONDS", 90.0)
+LLM_MAX_RETRIES = _env_int("LLM_MAX_RETRIES", 2)
+LLM_RETRY_BASE_SECONDS = _env_float("LLM_RETRY_BASE_SECONDS", 0.5)
+LLM_RETRY_MAX_SECONDS = _env_float("LLM_RETRY_MAX_SECONDS", 8.0)
+
+# Hedged requests: a call still running after the endpoint's recent
+# LLM_HEDGE_PERCENTILE latency gets a duplicate, and the first answer wins.
+# At most LLM_HEDGE_MAX_RATIO of calls are hedged.
+LLM_HEDGING = os.getenv("LLM_HEDGING", "false").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = _env_float("LLM_HEDGE_PERCENTILE", 95.0)
+LLM_HEDGE_MIN_SAMPLES = _env_int("LLM_HEDGE_MIN_SAMPLES", 50)
+LLM_HEDGE_MAX_RATIO = _env_float("LLM_HEDGE_MAX_RATIO", 0.1)
+
+# Shared HTTP connection pool for the LLM provider (one per worker)
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() in ("1", "true", "yes")
+LLM_POOL_MAX_CONNECTIONS = _env_int("LLM_POOL_MAX_CONNECTIONS", 100)
+LLM_POOL_MAX_KEEPALIVE = _env_int("LLM_POOL_MAX_KEEPALIVE", 20)
+LLM_POOL_KEEPALIVE_EXPIRY = _env_float("LLM_POOL_KEEPALIVE_EXPIRY", 30.0)
+
+# Extra parameters per model: ChatOpenAI fields (e.g. "model_kwargs") plus the
+# client options "timeout" and "max_retries". Service arguments take precedence.
+# Example: LLM_MODEL_PARAMS_JSON='{"gpt-4o": {"max_retries": 3, "model_kwargs": {"top_p": 0.9}}}'
+LLM_MODEL_PARAMS = {
+    model: dict(params) for model, params in json.loads(os.getenv("LLM_MODEL_PARAMS_JSON") or "{}").items()
+}
+
+# Model tiers from cheapest to most capable. Each service call declares the
+# cheapest tier it accepts; the router moves it up a tier while the cheaper
+# one is over the call's latency budget or its output keeps being rejected.
+# Override with MODEL_TIERS_JSON='{"small": "gpt-4o-mini", "large": "gpt-4o"}'; with
+# other tier names, "small" and "large" in budgets mean the first and last tier.
+MODEL_TIERS = json.loads(os.getenv("MODEL_TIERS_JSON") or "{}") or {
+    "small": "gpt-4o-mini",
+    "large": "gpt-4o"
+}
+# Output cap per tier; a call gets the lower of its task budget and its tier's cap.
+# Override with MODEL_TIER_MAX_TOKENS_JSON='{"small": 800}' (unlisted tiers are uncapped).
+MODEL_TIER_MAX_TOKENS = json.loads(os.getenv("MODEL_TIER_MAX_TOKENS_JSON") or "{}") or {
+    "small": 2000,
+    "large": 4000
+}
+ROUTER_ESCALATION_THRESHOLD = _env_float("ROUTER_ESCALATION_THRESHOLD", 0.3)
+ROUTER_PROBE_RATIO = _env_float("ROUTER_PROBE_RATIO", 0.05)
+ROUTER_WINDOW = _env_int("ROUTER_WINDOW", 200)
+
+# Admission control per endpoint: token bucket ("rate" requests/second refilled
+# up to "burst", 0 = no rate limit), concurrent requests, waiting requests and
+# the longest wait for a slot before a 503. Override per endpoint with e.g.
+# ADMISSION_LIMITS_JSON='{"compare": {"rate": 5, "burst": 10}}'
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+ADMISSION_LIMITS = {
+    "compare": {"rate": 0.0, "burst": 1, "max_concurrency": 32, "max_queue": 64, "queue_timeout": 10.0},
+    "compare_stream": {"rate": 0.0, "burst": 1, "max_concurrency": 32, "max_queue": 32, "queue_timeout": 5.0},
+    "extract": {"rate": 0.0, "burst": 1, "max_concurrency": 64, "max_queue": 128, "queue_timeout": 5.0},
+    "price": {"rate": 0.0, "burst": 1, "max_concurrency": 64, "max_queue": 128, "queue_timeout": 10.0},
+    "price_batch": {"rate": 0.0, "burst": 1, "max_concurrency": 4, "max_queue": 8, "queue_timeout": 30.0},
+}
+for _endpoint, _limits in json.loads(os.getenv("ADMISSION_LIMITS_JSON") or "{}").items():
+    ADMISSION_LIMITS.setdefault(_endpoint, {}).update(_limits)
+
+# Price estimate response cache
+PRICE_CACHE_MAX_ENTRIES = _env_int("PRICE_CACHE_MAX_ENTRIES", 10000)
+PRICE_CACHE_TTL_SECONDS = _env_float("PRICE_CACHE_TTL_SECONDS", 6 * 3600)
+PRICE_CACHE_MILEAGE_BUCKET_KM = _env_int("PRICE_CACHE_MILEAGE_BUCKET_KM", 5000)
+
+# Descriptions of the same vehicle spec whose estimated Jaccard similarity (MinHash
+# over word bigrams) reaches NEAR_DUP_THRESHOLD share price, profile and comparison
+# cache entries. 0 or 1 disables the matching; NEAR_DUP_MAX_ENTRIES bounds the index.
+NEAR_DUP_THRESHOLD = _env_float("NEAR_DUP_THRESHOLD", 0.8)
+NEAR_DUP_PERMUTATIONS = _env_int("NEAR_DUP_PERMUTATIONS", 64)
+NEAR_DUP_MAX_ENTRIES = _env_int("NEAR_DUP_MAX_ENTRIES", 20000)
+
+# Batch price estimation
+BATCH_MAX_ITEMS = _env_int("BATCH_MAX_ITEMS", 500)
+BATCH_MAX_CONCURRENCY = _env_int("BATCH_MAX_CONCURRENCY", 8)
+
+# Response format for price estimates and full comparisons: "text" asks for the
+# markdown report, "json" for compact schema-constrained JSON that is validated in
+# one parse and rendered to the same markdown. Prose analysis in JSON mode is optional.
+LLM_OUTPUT_FORMAT = os.getenv("LLM_OUTPUT_FORMAT", "text").lower()
+LLM_JSON_ANALYSIS = os.getenv("LLM_JSON_ANALYSIS", "false").lower() in ("1", "true", "yes")
+
+# Car comparison: "full" asks the LLM for the whole pairwise analysis, "decomposed"
+# (opt-in) builds it from cached per-car profiles, with winners decided by score.
+# The final recommendation of a decomposed comparison comes from a short LLM merge
+# call ("llm") or from the scores ("local").
+COMPARISON_MODE = os.getenv("COMPARISON_MODE", "full").lower()
+COMPARISON_MERGE = os.getenv("COMPARISON_MERGE", "llm").lower()
+COMPARISON_CACHE_MAX_ENTRIES = _env_int("COMPARISON_CACHE_MAX_ENTRIES", 5000)
+COMPARISON_CACHE_TTL_SECONDS = _env_float("COMPARISON_CACHE_TTL_SECONDS", 6 * 3600)
+PROFILE_CACHE_MAX_ENTRIES = _env_int("PROFILE_CACHE_MAX_ENTRIES", 10000)
+PROFILE_CACHE_TTL_SECONDS = _env_float("PROFILE_CACHE_TTL_SECONDS", 24 * 3600)
+PROFILE_MAX_TOKENS = _env_int("PROFILE_MAX_TOKENS", 700)
+MERGE_MAX_TOKENS = _env_int("MERGE_MAX_TOKENS", 300)
+
+# Descriptions the rule-based extractor parses with at least this confidence skip
+# the LLM on /api/compare/extract-details (set above 1 to always use the LLM)
+EXTRACT_MIN_CONFIDENCE = _env_float("EXTRACT_MIN_CONFIDENCE", 0.8)
+
+# LLM extraction results, reused for identical descriptions
+EXTRACT_CACHE_MAX_ENTRIES = _env_int("EXTRACT_CACHE_MAX_ENTRIES", 10000)
+EXTRACT_CACHE_TTL_SECONDS = _env_float("EXTRACT_CACHE_TTL_SECONDS", 7 * 24 * 3600)
+
+# SQLite file shared by all workers on a host that persists cached LLM results
+# across restarts (empty disables it), with a per-cache entry bound enforced by a
+# background compaction every RESULT_CACHE_COMPACT_INTERVAL_SECONDS
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", str(Path(__file__).resolve().parent.parent / ".cache" / "results.sqlite3"))
+RESULT_CACHE_MAX_ENTRIES = _env_int("RESULT_CACHE_MAX_ENTRIES", 100000)
+RESULT_CACHE_COMPACT_INTERVAL_SECONDS = max(1.0, _env_float("RESULT_CACHE_COMPACT_INTERVAL_SECONDS", 300.0))